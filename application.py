@@ -1,4 +1,5 @@
 import asyncio
+import atexit
 from fastapi.staticfiles import StaticFiles
 import logging
 import os
@@ -15,20 +16,26 @@ from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from backend.graph import Graph
+from backend.services.briefing_cache import briefing_cache
+from backend.services.event_bus import event_bus, is_final, log_event
+from backend.services.llm_gateway import gateway
+from backend.services.llm_router import router
+from backend.services.loop_monitor import EventLoopMonitor
 from backend.services.mongodb import MongoDBService
 from backend.services.pdf_service import PDFService
+from backend.services.rate_limiter import limiter
 from backend.services.websocket_manager import WebSocketManager
+from backend.utils.logging_config import configure_logging
 
 # Load environment variables from .env file at startup
 env_path = Path(__file__).parent / '.env'
 if env_path.exists():
     load_dotenv(dotenv_path=env_path, override=True)
 
-# Configure logging
+# Configure logging (records are written by a background listener thread)
+log_listener = configure_logging()
+atexit.register(log_listener.stop)
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-console_handler = logging.StreamHandler()
-logger.addHandler(console_handler)
 
 app = FastAPI(title="Tavily Company Research API")
 
@@ -41,6 +48,7 @@ app.add_middleware(
 )
 
 manager = WebSocketManager()
+loop_monitor = EventLoopMonitor()
 pdf_service = PDFService({"pdf_output_dir": "pdfs"})
 
 job_status = defaultdict(lambda: {
@@ -52,6 +60,8 @@ job_status = defaultdict(lambda: {
     "report": None,
     "last_update": datetime.now().isoformat()
 })
+# Graphs of running jobs, for the partial report endpoint
+active_graphs = {}
 
 mongodb = None
 if mongo_uri := os.getenv("MONGODB_URI"):
@@ -61,16 +71,79 @@ if mongo_uri := os.getenv("MONGODB_URI"):
     except Exception as e:
         logger.warning(f"Échec de l'initialisation de MongoDB : {e}. Poursuite sans persistance.")
 
+# Transports of job events; nodes publish to the bus without waiting for any of them.
+# WebSocket clients get every job's events, whichever worker runs it.
+event_bus.subscribe(manager.deliver, name="websocket")
+event_bus.subscribe(log_event, name="logs", local_only=True)
+if mongodb:
+    # Final statuses only, and never dropped: a lost "completed" would leave the job running in the database
+    event_bus.subscribe(mongodb.record_event, name="mongodb", local_only=True, predicate=is_final, lossless=True)
+
 class ResearchRequest(BaseModel):
     company: str
     company_url: str | None = None
     industry: str | None = None
     hq_location: str | None = None
+    # Non-interactive job (e.g. nightly refresh): LLM calls go through provider batches
+    batch: bool = False
 
 class PDFGenerationRequest(BaseModel):
     report_content: str
     company_name: str | None = None
 
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("startup")
+async def start_event_bus():
+    await event_bus.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    await event_bus.stop()
+
+@app.on_event("shutdown")
+async def close_briefing_cache():
+    if briefing_cache:
+        briefing_cache.close()
+
+@app.get("/metrics/event-loop")
+async def event_loop_metrics():
+    """Event-loop blocking statistics for this worker."""
+    return loop_monitor.snapshot()
+
+@app.get("/metrics/llm-routes")
+async def llm_route_metrics():
+    """Rolling latency and error rates per model, and recent routing decisions."""
+    return router.snapshot()
+
+@app.get("/metrics/llm-usage")
+async def llm_usage_metrics(job_id: str | None = None):
+    """LLM calls, tokens and latency per job and stage."""
+    if job_id:
+        return gateway.job_usage(job_id)
+    return gateway.snapshot()
+
+@app.get("/metrics/rate-limits")
+async def rate_limit_metrics():
+    """Provider quotas and the time this worker spent waiting for them."""
+    return limiter.snapshot()
+
+@app.get("/metrics/websockets")
+async def websocket_metrics():
+    """Send queue depth, coalesced and dropped events per WebSocket client."""
+    return manager.snapshot()
+
+@app.get("/metrics/events")
+async def event_bus_metrics():
+    """Events published per status and delivery counters per transport."""
+    return event_bus.snapshot()
+
 @app.options("/research")
 async def preflight():
     response = JSONResponse(content=None, status_code=200)
@@ -105,19 +178,21 @@ async def process_research(job_id: str, data: ResearchRequest):
     try:
         if mongodb:
             mongodb.create_job(job_id, data.dict())
-        await asyncio.sleep(1)  # Allow WebSocket connection
-
-        await manager.send_status_update(job_id, status="processing", message="Starting research")
+        event_bus.publish_status(job_id, status="processing", message="Starting research")
 
         graph = Graph(
             company=data.company,
             url=data.company_url,
             industry=data.industry,
             hq_location=data.hq_location,
-            websocket_manager=manager,
+            event_bus=event_bus,
             job_id=job_id
         )
 
+        active_graphs[job_id] = graph
+        if data.batch:
+            gateway.batch_jobs.add(job_id)
+
         state = {}
         async for s in graph.run(thread={}):
             state.update(s)
@@ -132,10 +207,7 @@ async def process_research(job_id: str, data: ResearchRequest):
                 "company": data.company,
                 "last_update": datetime.now().isoformat()
             })
-            if mongodb:
-                mongodb.update_job(job_id=job_id, status="completed")
-                mongodb.store_report(job_id=job_id, report_data={"report": report_content})
-            await manager.send_status_update(
+            event_bus.publish_status(
                 job_id=job_id,
                 status="completed",
                 message="Recherche terminée avec succès",
@@ -148,12 +220,12 @@ async def process_research(job_id: str, data: ResearchRequest):
             logger.error(f"Research completed without finding report. State keys: {list(state.keys())}")
             logger.error(f"Editor state: {state.get('editor', {})}")
             
-            # Check if there was a specific error in the state
+            # Check if there was a specific error in the state (node updates are keyed by node name)
             error_message = "Aucun rapport trouvé"
-            if error := state.get('error'):
+            if error := state.get('error') or (state.get('grounding') or {}).get('error'):
                 error_message = f"Erreur : {error}"
             
-            await manager.send_status_update(
+            event_bus.publish_status(
                 job_id=job_id,
                 status="failed",
                 message="La recherche s'est terminée mais aucun rapport n'a été généré",
@@ -162,32 +234,15 @@ async def process_research(job_id: str, data: ResearchRequest):
 
     except Exception as e:
         logger.error(f"La recherche a échoué : {str(e)}")
-        await manager.send_status_update(
+        event_bus.publish_status(
             job_id=job_id,
             status="failed",
             message=f"La recherche a échoué : {str(e)}",
             error=str(e)
         )
-        if mongodb:
-            mongodb.update_job(job_id=job_id, status="failed", error=str(e))
-app.mount("/assets", StaticFiles(directory="ui/dist/assets"), name="assets")
-
-@app.get("/{full_path:path}")
-async def serve_static(full_path: str, request: Request):
-    # Skip API routes
-    if full_path.startswith("research/"):
-        raise HTTPException(status_code=404)
-        
-    if full_path == "":
-        # Serve index.html for root path
-        return FileResponse("ui/dist/index.html")
-    else:
-        # For any other path, try to serve from the dist directory
-        file_path = f"ui/dist/{full_path}"
-        if os.path.exists(file_path):
-            return FileResponse(file_path)
-        # If file doesn't exist, return index.html for client-side routing
-        return FileResponse("ui/dist/index.html")
+    finally:
+        active_graphs.pop(job_id, None)
+        gateway.batch_jobs.discard(job_id)
 
 @app.get("/research/pdf/{filename}")
 async def get_pdf(filename: str):
@@ -197,20 +252,11 @@ async def get_pdf(filename: str):
     return FileResponse(pdf_path, media_type='application/pdf', filename=filename)
 
 @app.websocket("/research/ws/{job_id}")
-async def websocket_endpoint(websocket: WebSocket, job_id: str):
+async def websocket_endpoint(websocket: WebSocket, job_id: str, last_seq: int = 0):
     try:
         await websocket.accept()
-        await manager.connect(websocket, job_id)
-
-        if job_id in job_status:
-            status = job_status[job_id]
-            await manager.send_status_update(
-                job_id,
-                status=status["status"],
-                message="Connected to status stream",
-                error=status["error"],
-                result=status["result"]
-            )
+        # Events after last_seq are replayed first, then live events, without gap or duplicate
+        await manager.connect(websocket, job_id, event_bus.replay(job_id, last_seq))
 
         while True:
             try:
@@ -239,6 +285,9 @@ async def get_research_report(job_id: str):
             result = job_status[job_id]
             if report := result.get("report"):
                 return {"report": report}
+        # The job may have run in another worker
+        if event := await event_bus.last_status(job_id, "completed"):
+            return {"report": event.data["result"]["report"]}
         raise HTTPException(status_code=404, detail="Report not found")
     
     report = mongodb.get_report(job_id)
@@ -246,6 +295,18 @@ async def get_research_report(job_id: str):
         raise HTTPException(status_code=404, detail="Research report not found")
     return report
 
+@app.get("/research/{job_id}/report/partial")
+async def get_partial_research_report(job_id: str):
+    """Report sections compiled so far (progressive editor mode), or the final report."""
+    if job_id in job_status and job_status[job_id].get("report"):
+        return {"report": job_status[job_id]["report"], "sections": {}, "complete": True}
+    graph = active_graphs.get(job_id)
+    if not graph:
+        if event := await event_bus.last_status(job_id, "completed"):
+            return {"report": event.data["result"]["report"], "sections": {}, "complete": True}
+        raise HTTPException(status_code=404, detail="Research job not found")
+    return {**graph.editor.partial_report(), "complete": False}
+
 @app.post("/generate-pdf")
 async def generate_pdf(data: PDFGenerationRequest):
     """Generate a PDF from markdown content and stream it to the client."""
@@ -265,11 +326,16 @@ async def generate_pdf(data: PDFGenerationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Mount static files from the UI build directory
+# Mount static files from the UI build directory (last, so the catch-all route
+# does not shadow the API routes above)
 app.mount("/assets", StaticFiles(directory="ui/dist/assets"), name="assets")
 
 @app.get("/{full_path:path}")
 async def serve_static(full_path: str, request: Request):
+    # Skip API routes
+    if full_path.startswith("research/"):
+        raise HTTPException(status_code=404)
+
     if full_path == "":
         # Serve index.html for root path
         return FileResponse("ui/dist/index.html")
@@ -1,5 +1,31 @@
-from typing import TypedDict, NotRequired, Required, Dict, List, Any
-from backend.services.websocket_manager import WebSocketManager
+from typing import Annotated, Protocol, TypedDict, NotRequired, Required, Dict, List, Any
+
+from langgraph.graph.message import add_messages
+
+
+class EventPublisher(Protocol):
+    """What nodes need from the event bus (services.event_bus.EventBus)."""
+
+    def publish(self, job_id: str, type: str, data: Dict[str, Any]) -> Any: ...
+
+    def publish_status(
+        self, job_id: str, status: str, message: str = None, error: str = None, result: dict = None
+    ) -> Any: ...
+
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer merging dict updates written by parallel nodes."""
+    return {**(left or {}), **(right or {})}
+
+
+def merge_url_categories(left: Dict[str, List[str]], right: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Reducer tracking which research categories found each canonical URL."""
+    merged = {url: list(categories) for url, categories in (left or {}).items()}
+    for url, categories in (right or {}).items():
+        existing = merged.setdefault(url, [])
+        existing.extend(category for category in categories if category not in existing)
+    return merged
+
 
 #Define the input state
 class InputState(TypedDict, total=False):
@@ -7,16 +33,20 @@ class InputState(TypedDict, total=False):
     company_url: NotRequired[str]
     hq_location: NotRequired[str]
     industry: NotRequired[str]
-    websocket_manager: NotRequired[WebSocketManager]
+    # Event bus the nodes publish progress to (WebSocket clients are one of its transports)
+    event_bus: NotRequired[EventPublisher]
     job_id: NotRequired[str]
 
-class ResearchState(InputState):
+class ResearchState(InputState, total=False):
     site_scrape: Dict[str, Any]
-    messages: List[Any]
+    messages: Annotated[List[Any], add_messages]
     financial_data: Dict[str, Any]
     news_data: Dict[str, Any]
     industry_data: Dict[str, Any]
     company_data: Dict[str, Any]
+    # Filled incrementally as each analyst finishes
+    doc_counts: Annotated[Dict[str, int], merge_dicts]
+    url_categories: Annotated[Dict[str, List[str]], merge_url_categories]
     curated_financial_data: Dict[str, Any]
     curated_news_data: Dict[str, Any]
     curated_industry_data: Dict[str, Any]
@@ -26,5 +56,9 @@ class ResearchState(InputState):
     industry_briefing: str
     company_briefing: str
     references: List[str]
+    reference_titles: Dict[str, str]
+    reference_info: Dict[str, Dict[str, Any]]
     briefings: Dict[str, Any]
-    report: str
\ No newline at end of file
+    report: str
+    status: str
+    error: str
@@ -4,7 +4,7 @@ from typing import Any, AsyncIterator, Dict
 from langchain_core.messages import SystemMessage
 from langgraph.graph import StateGraph
 
-from .classes.state import InputState
+from .classes.state import InputState, ResearchState
 from .nodes import GroundingNode
 from .nodes.briefing import Briefing
 from .nodes.collector import Collector
@@ -22,8 +22,8 @@ logger = logging.getLogger(__name__)
 
 class Graph:
     def __init__(self, company=None, url=None, hq_location=None, industry=None,
-                 websocket_manager=None, job_id=None):
-        self.websocket_manager = websocket_manager
+                 event_bus=None, job_id=None):
+        self.event_bus = event_bus
         self.job_id = job_id
         
         # Initialize InputState
@@ -32,14 +32,14 @@ class Graph:
             company_url=url,
             hq_location=hq_location,
             industry=industry,
-            websocket_manager=websocket_manager,
+            event_bus=event_bus,
             job_id=job_id,
             messages=[
                 SystemMessage(content="Expert researcher starting investigation")
             ]
         )
 
-        # Initialize nodes with WebSocket manager and job ID
+        # Initialize nodes with the event bus and job ID
         self._init_nodes()
         self._build_workflow()
 
@@ -55,10 +55,14 @@ class Graph:
         self.enricher = Enricher()
         self.briefing = Briefing()
         self.editor = Editor()
+        if self.editor.mode == "progressive":
+            self.briefing.completion_listeners.append(self.editor.section_ready)
 
     def _build_workflow(self):
         """Configure the state graph workflow"""
-        self.workflow = StateGraph(InputState)
+        # Nodes return only the keys they change; list and dict keys written by
+        # the parallel analysts are merged by the reducers declared on ResearchState.
+        self.workflow = StateGraph(ResearchState)
         
         # Add nodes with their respective processing functions
         self.workflow.add_node("grounding", self.ground.run)
@@ -102,23 +106,20 @@ class Graph:
             self.input_state,
             thread
         ):
-            if self.websocket_manager and self.job_id:
-                await self._handle_ws_update(state)
+            if self.event_bus and self.job_id:
+                self._publish_state_update(state)
             yield state
 
-    async def _handle_ws_update(self, state: Dict[str, Any]):
-        """Handle WebSocket updates based on state changes"""
-        update = {
-            "type": "state_update",
-            "data": {
+    def _publish_state_update(self, state: Dict[str, Any]):
+        """Publish a state update event based on state changes"""
+        self.event_bus.publish(
+            self.job_id,
+            "state_update",
+            {
                 "current_node": state.get("current_node", "unknown"),
                 "progress": state.get("progress", 0),
                 "keys": list(state.keys())
             }
-        }
-        await self.websocket_manager.broadcast_to_job(
-            self.job_id,
-            update
         )
     
     def compile(self):
@@ -1,26 +1,86 @@
 import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Union
-
-import google.generativeai as genai
+import time
+from typing import Any, Callable, Dict, List, Union
 
 from ..classes import ResearchState
+from ..services.briefing_cache import BriefingCache, briefing_cache
+from ..services.llm_gateway import gateway
+from ..services.llm_router import router
+from ..utils.packing import (
+    DEFAULT_TOKEN_BUDGET,
+    PackItem,
+    chunk_entries,
+    estimate_tokens,
+    pack_documents,
+)
+from ..utils.text import dedupe_sentences, summarize_extractive, tokenize
 
 logger = logging.getLogger(__name__)
 
+# Vocabulary (French and English) used to decide which category a shared fact belongs to
+CATEGORY_KEYWORDS = {
+    'company': {
+        'product', 'products', 'service', 'services', 'platform', 'founded', 'founder', 'ceo', 'team',
+        'customers', 'pricing', 'produit', 'produits', 'plateforme', 'fondée', 'fondateur', 'équipe',
+        'clients', 'tarification', 'dirigeant', 'solution', 'solutions',
+    },
+    'industry': {
+        'market', 'industry', 'sector', 'competitors', 'competition', 'trends', 'growth', 'cagr',
+        'marché', 'secteur', 'industrie', 'concurrents', 'concurrence', 'tendances', 'croissance',
+    },
+    'financial': {
+        'funding', 'raised', 'raises', 'round', 'series', 'investors', 'valuation', 'revenue', 'million',
+        'billion', 'ipo', 'financement', 'levée', 'lève', 'investisseurs', 'valorisation',
+        'chiffre', 'affaires', 'millions', 'milliards', 'tour', 'série',
+    },
+    'news': {
+        'announced', 'announces', 'launch', 'launched', 'launches', 'partnership', 'partners', 'award',
+        'acquires', 'acquisition', 'annonce', 'annoncé', 'lancement', 'lance', 'partenariat',
+        'prix', 'rachat', 'acquiert',
+    },
+}
+
+# Bump when the category prompts change so cached briefings are not reused
+BRIEFING_PROMPT_VERSION = "1"
+
 class Briefing:
     """Creates briefings for each research category and updates the ResearchState."""
     
     def __init__(self) -> None:
         self.max_doc_length = 8000  # Maximum document content length
+        # Token budget for the documents of one briefing prompt, and per document
+        self.token_budget = int(os.getenv("BRIEFING_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+        self.max_doc_tokens = int(os.getenv("BRIEFING_MAX_DOC_TOKENS", self.max_doc_length // 4))
+        # Seconds before a Gemini briefing call is abandoned, and concurrent calls per job
+        self.briefing_timeout = float(os.getenv("BRIEFING_TIMEOUT", "120"))
+        self.briefing_concurrency = int(os.getenv("BRIEFING_CONCURRENCY", "2"))
+        # Remove sentences repeated across categories before building the prompts
+        self.sentence_dedup = os.getenv("BRIEFING_SENTENCE_DEDUP", "true").lower() == "true"
+        # Extractive pre-summary: documents longer than the minimum keep this share of their text
+        self.summary_ratio = float(os.getenv("BRIEFING_SUMMARY_RATIO", "0.5"))
+        self.summary_min_chars = int(os.getenv("BRIEFING_SUMMARY_MIN_CHARS", "2000"))
+        # Map-reduce mode: above this many document tokens (0 disables), chunks are first
+        # condensed into bullet facts in parallel, then the category prompt runs on the facts
+        self.map_reduce_tokens = int(os.getenv("BRIEFING_MAP_REDUCE_TOKENS", "0"))
+        self.map_reduce_budget = int(os.getenv("BRIEFING_MAP_REDUCE_BUDGET", self.token_budget * 4))
+        self.map_chunk_tokens = int(os.getenv("BRIEFING_MAP_CHUNK_TOKENS", "8000"))
+        self.map_concurrency = int(os.getenv("BRIEFING_MAP_CONCURRENCY", "4"))
+        # Stream briefings, sending a briefing_chunk event once enough text or time has accumulated
+        self.stream_briefings = os.getenv("BRIEFING_STREAM", "true").lower() == "true"
+        self.chunk_min_chars = int(os.getenv("BRIEFING_CHUNK_MIN_CHARS", "200"))
+        self.chunk_interval = float(os.getenv("BRIEFING_CHUNK_INTERVAL", "0.5"))
+        # Text generated so far per category, and categories whose briefing is final
+        self.partial_briefings: Dict[str, str] = {}
+        self.completed_briefings: Dict[str, str] = {}
+        # Called with (category, briefing, context) as soon as a category briefing is final
+        self.completion_listeners: List[Callable[[str, str, Dict[str, Any]], None]] = []
+        # Briefings already generated from the same packed documents are reused (None when disabled)
+        self.cache = briefing_cache
         self.gemini_key = os.getenv("GEMINI_API_KEY")
         if not self.gemini_key:
             raise ValueError("La variable d'environnement GEMINI_API_KEY n'est pas définie")
-        
-        # Configure Gemini
-        genai.configure(api_key=self.gemini_key)
-        self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
 
     async def generate_category_briefing(
         self, docs: Union[Dict[str, Any], List[Dict[str, Any]]], 
@@ -32,9 +92,9 @@ class Briefing:
         logger.info(f"Generating {category} briefing for {company} using {len(docs)} documents")
 
         # Send category start status
-        if websocket_manager := context.get('websocket_manager'):
+        if event_bus := context.get('event_bus'):
             if job_id := context.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="briefing_start",
                     message=f"Génération du briefing {category}",
@@ -164,64 +224,242 @@ class Briefing:
             reverse=True
         )
         
-        doc_texts = []
-        total_length = 0
-        for _ , doc in sorted_items:
-            title = doc.get('title', '')
-            content = doc.get('raw_content') or doc.get('content', '')
-            if len(content) > self.max_doc_length:
-                content = content[:self.max_doc_length] + "... [content truncated]"
-            doc_entry = f"Title: {title}\n\nContent: {content}"
-            if total_length + len(doc_entry) < 120000:  # Keep under limit
-                doc_texts.append(doc_entry)
-                total_length += len(doc_entry)
-            else:
-                break
-        
-        separator = "\n" + "-" * 40 + "\n"
-        prompt = f"""{prompts.get(category, "Rédigez un briefing ciblé, informatif et pertinent sur l'entreprise : {company} dans le secteur {industry} en vous basant sur les documents fournis.")}
-
-Analysez les documents suivants et extrayez les informations clés. Fournissez uniquement le briefing, sans explication ni commentaire :
-
-{separator}{separator.join(doc_texts)}{separator}
+        pack_items = [
+            PackItem(
+                doc.get('title', ''),
+                doc.get('raw_content') or doc.get('content', ''),
+                float(doc.get('evaluation', {}).get('overall_score', '0'))
+            )
+            for _, doc in sorted_items
+        ]
+        if self.summary_ratio < 1:
+            pack_items = await asyncio.to_thread(self.summarize_documents, pack_items, category, company)
+        total_tokens = sum(estimate_tokens(item.content[:self.max_doc_tokens * 4]) for item in pack_items)
+        map_reduce = bool(self.map_reduce_tokens) and total_tokens > self.map_reduce_tokens
+
+        # Pack documents by value per token within the model's prompt budget
+        doc_texts = pack_documents(
+            pack_items,
+            budget_tokens=self.map_reduce_budget if map_reduce else self.token_budget,
+            max_doc_tokens=self.max_doc_tokens
+        )
+        logger.debug(
+            "Briefing %s : %d/%d documents retenus (~%d tokens)",
+            category, len(doc_texts), len(sorted_items), sum(estimate_tokens(text) for text in doc_texts)
+        )
 
-"""
+        cache_version = f"{BRIEFING_PROMPT_VERSION}:{'map_reduce' if map_reduce else 'single'}"
+        cache_inputs = [company, industry, hq_location, *doc_texts]
+        cached = None
+        if self.cache:
+            try:
+                cached = await asyncio.to_thread(self.cache_lookup, category, cache_version, cache_inputs)
+            except Exception as e:
+                logger.warning("Lecture du cache des briefings impossible : %s", e)
+        # Model that actually wrote the briefing, which may be a failover route
+        served: Dict[str, str] = {}
 
         try:
-            logger.info("Envoi du prompt au modèle LLM")
-            response = self.gemini_model.generate_content(prompt)
-            content = response.text.strip()
+            if cached:
+                logger.info("Briefing %s repris du cache", category)
+                content = cached
+            else:
+                content = await self.generate_briefing(
+                    doc_texts, pack_items, map_reduce, prompts, category, context,
+                    on_route=lambda provider, model: served.update(model=model)
+                )
             if not content:
                 logger.error(f"Réponse vide du LLM pour le briefing {category}")
                 return {'content': ''}
+            self.partial_briefings[category] = content
+            self.completed_briefings[category] = content
+            for listener in self.completion_listeners:
+                listener(category, content, context)
+            if self.cache and not cached and served:
+                cache_key = BriefingCache.make_key(category, cache_version, served['model'], cache_inputs)
+                try:
+                    await asyncio.to_thread(self.cache.put, cache_key, content)
+                except Exception as e:
+                    logger.warning("Écriture du cache des briefings impossible : %s", e)
 
             # Send completion status
-            if websocket_manager := context.get('websocket_manager'):
+            if event_bus := context.get('event_bus'):
                 if job_id := context.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="briefing_complete",
                         message=f"Briefing {category} complété",
                         result={
                             "step": "Briefing",
-                            "category": category
+                            "category": category,
+                            "cached": bool(cached)
                         }
                     )
 
             return {'content': content}
+        except asyncio.TimeoutError:
+            logger.error(f"Délai dépassé ({self.briefing_timeout}s) pour le briefing {category}")
+            return {'content': ''}
         except Exception as e:
             logger.error(f"Erreur lors de la génération du briefing {category}: {e}")
             return {'content': ''}
 
-    async def create_briefings(self, state: ResearchState) -> ResearchState:
+    def cache_lookup(self, category: str, version: str, inputs: List[str]) -> str | None:
+        """Return a cached briefing written by any model of the stage, in routing order."""
+        models = list(dict.fromkeys(model for (_, model), _ in router.candidates('briefing')))
+        for model in models:
+            if content := self.cache.get(BriefingCache.make_key(category, version, model, inputs)):
+                return content
+        return None
+
+    def summarize_documents(self, pack_items: List[PackItem], category: str, company: str) -> List[PackItem]:
+        """Shrink long documents to their sentences most relevant to the category and company."""
+        keywords = CATEGORY_KEYWORDS.get(category, set()) | set(tokenize(company))
+        before = after = 0
+        summarized = []
+        for item in pack_items:
+            content = item.content
+            if len(content) > self.summary_min_chars:
+                # Only the part that could reach the prompt is worth scoring
+                content = summarize_extractive(content[:self.max_doc_length * 2], keywords, self.summary_ratio)
+            before += len(item.content)
+            after += len(content)
+            summarized.append(item._replace(content=content))
+        logger.debug("Résumé extractif %s : %d -> %d caractères", category, before, after)
+        return summarized
+
+    async def generate_briefing(
+        self, doc_texts: List[str], pack_items: List[PackItem], map_reduce: bool,
+        prompts: Dict[str, str], category: str, context: Dict[str, Any],
+        on_route: Callable[[str, str], None] | None = None
+    ) -> str:
+        """Build the category prompt from the packed documents and call Gemini."""
+        company = context.get('company', 'Unknown')
+        industry = context.get('industry', 'Unknown')
+        if map_reduce:
+            facts = await self.map_documents(doc_texts, category, company, context.get('job_id'))
+            # Fall back to a single pass within the normal budget if every chunk failed
+            doc_texts = facts or pack_documents(pack_items, budget_tokens=self.token_budget, max_doc_tokens=self.max_doc_tokens)
+
+        separator = "\n" + "-" * 40 + "\n"
+        prompt = f"""{prompts.get(category, "Rédigez un briefing ciblé, informatif et pertinent sur l'entreprise : {company} dans le secteur {industry} en vous basant sur les documents fournis.")}
+
+Analysez les documents suivants et extrayez les informations clés. Fournissez uniquement le briefing, sans explication ni commentaire :
+
+{separator}{separator.join(doc_texts)}{separator}
+
+"""
+        logger.info("Envoi du prompt au modèle LLM")
+        if self.stream_briefings:
+            return await self.stream_briefing(prompt, category, context, on_route)
+        return await self.generate(prompt, context.get('job_id'), on_route)
+
+    async def generate(
+        self, prompt: str, job_id: str | None = None, on_route: Callable[[str, str], None] | None = None
+    ) -> str:
+        """Send one prompt through the LLM gateway and return the stripped text."""
+        text = await gateway.complete(
+            'briefing',
+            [{"role": "user", "content": prompt}],
+            job_id=job_id,
+            timeout=self.briefing_timeout,
+            on_route=on_route
+        )
+        return text.strip()
+
+    async def stream_briefing(
+        self, prompt: str, category: str, context: Dict[str, Any], on_route: Callable[[str, str], None] | None = None
+    ) -> str:
+        """Stream a briefing through the LLM gateway, publishing coalesced briefing_chunk events.
+
+        The text received so far is kept in `partial_briefings[category]`.
+        """
+        event_bus = context.get('event_bus')
+        job_id = context.get('job_id')
+        self.partial_briefings[category] = ""
+        accumulated = []
+        buffer = ""
+        last_flush = time.monotonic()
+
+        async def flush() -> None:
+            nonlocal buffer, last_flush
+            if buffer and event_bus and job_id:
+                event_bus.publish_status(
+                    job_id=job_id,
+                    status="briefing_chunk",
+                    message=f"Génération du briefing {category}",
+                    result={
+                        "step": "Briefing",
+                        "category": category,
+                        "chunk": buffer
+                    }
+                )
+            buffer = ""
+            last_flush = time.monotonic()
+
+        response = gateway.stream(
+            'briefing',
+            [{"role": "user", "content": prompt}],
+            job_id=job_id,
+            timeout=self.briefing_timeout,
+            on_route=on_route
+        )
+        async for text in response:
+            if not text:
+                continue
+            accumulated.append(text)
+            self.partial_briefings[category] = "".join(accumulated)
+            buffer += text
+            if len(buffer) >= self.chunk_min_chars or time.monotonic() - last_flush >= self.chunk_interval:
+                await flush()
+        await flush()
+        return "".join(accumulated).strip()
+
+    async def map_documents(self, doc_texts: List[str], category: str, company: str, job_id: str | None = None) -> List[str]:
+        """Condense chunks of documents into bullet facts in parallel (map step).
+
+        Returns one entry per chunk that produced facts; chunks that fail or
+        time out are skipped so the reduce step still runs on the others.
+        """
+        chunks = chunk_entries(doc_texts, self.map_chunk_tokens)
+        logger.info("Briefing %s en mode map-reduce : %d documents en %d lots", category, len(doc_texts), len(chunks))
+        separator = "\n" + "-" * 40 + "\n"
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def map_chunk(index: int, chunk: List[str]) -> str:
+            prompt = f"""Extrayez des documents suivants les faits utiles à un briefing {category} sur l'entreprise {company}.
+
+1. Une puce par fait, en français, avec les chiffres, dates et noms exacts
+2. Uniquement des faits présents dans les documents, sans interprétation
+3. Ignorez ce qui ne concerne pas {company} ou la catégorie {category}
+4. Fournissez uniquement la liste à puces, sans introduction ni commentaire
+
+{separator}{separator.join(chunk)}{separator}
+"""
+            async with semaphore:
+                try:
+                    return await self.generate(prompt, job_id)
+                except asyncio.TimeoutError:
+                    logger.warning("Délai dépassé pour le lot %d du briefing %s", index, category)
+                except Exception as e:
+                    logger.warning("Échec du lot %d du briefing %s : %s", index, category, e)
+                return ""
+
+        results = await asyncio.gather(*[map_chunk(i, chunk) for i, chunk in enumerate(chunks)])
+        return [
+            f"Title: Faits extraits (lot {i + 1}/{len(chunks)})\n\nContent: {facts}"
+            for i, facts in enumerate(results) if facts
+        ]
+
+    async def create_briefings(self, state: ResearchState) -> Dict[str, Any]:
         """Create briefings for all categories in parallel."""
         company = state.get('company', 'Unknown Company')
-        websocket_manager = state.get('websocket_manager')
+        event_bus = state.get('event_bus')
         job_id = state.get('job_id')
         
         # Send initial briefing status
-        if websocket_manager and job_id:
-            await websocket_manager.send_status_update(
+        if event_bus and job_id:
+            event_bus.publish_status(
                 job_id=job_id,
                 status="processing",
                 message="Starting research briefings",
@@ -232,7 +470,7 @@ Analysez les documents suivants et extrayez les informations clés. Fournissez u
             "company": company,
             "industry": state.get('industry', 'Unknown'),
             "hq_location": state.get('hq_location', 'Unknown'),
-            "websocket_manager": websocket_manager,
+            "event_bus": event_bus,
             "job_id": job_id
         }
         logger.info(f"Creating section briefings for {company}")
@@ -246,6 +484,7 @@ Analysez les documents suivants et extrayez les informations clés. Fournissez u
         }
         
         briefings = {}
+        updates: Dict[str, Any] = {}
 
         # Create tasks for parallel processing
         briefing_tasks = []
@@ -265,12 +504,15 @@ Analysez les documents suivants et extrayez les informations clés. Fournissez u
                 })
             else:
                 logger.info(f"No data available for {data_field}")
-                state[briefing_key] = ""
+                updates[briefing_key] = ""
+
+        if self.sentence_dedup and len(briefing_tasks) > 1:
+            self.dedupe_across_categories(briefing_tasks)
 
         # Process briefings in parallel with rate limiting
         if briefing_tasks:
             # Rate limiting semaphore for LLM API
-            briefing_semaphore = asyncio.Semaphore(2)  # Limit to 2 concurrent briefings
+            briefing_semaphore = asyncio.Semaphore(self.briefing_concurrency)
             
             async def process_briefing(task: Dict[str, Any]) -> Dict[str, Any]:
                 """Process a single briefing with rate limiting."""
@@ -283,11 +525,11 @@ Analysez les documents suivants et extrayez les informations clés. Fournissez u
                     
                     if result['content']:
                         briefings[task['category']] = result['content']
-                        state[task['briefing_key']] = result['content']
+                        updates[task['briefing_key']] = result['content']
                         logger.info(f"Briefing {task['data_field']} complété ({len(result['content'])} caractères)")
                     else:
                         logger.error(f"Échec de la génération du briefing pour {task['data_field']}")
-                        state[task['briefing_key']] = ""
+                        updates[task['briefing_key']] = ""
                     
                     return {
                         'category': task['category'],
@@ -306,8 +548,37 @@ Analysez les documents suivants et extrayez les informations clés. Fournissez u
             total_length = sum(r['length'] for r in results)
             logger.info(f"Generated {successful_briefings}/{len(briefing_tasks)} briefings with total length {total_length}")
 
-        state['briefings'] = briefings
-        return state
-
-    async def run(self, state: ResearchState) -> ResearchState:
+        updates['briefings'] = briefings
+        return updates
+
+    def dedupe_across_categories(self, briefing_tasks: List[Dict[str, Any]]) -> None:
+        """Keep each fact shared by several categories in the category it fits best."""
+        ranked = {}
+        for task in briefing_tasks:
+            items = sorted(
+                task['curated_data'].items(),
+                key=lambda x: float(x[1].get('evaluation', {}).get('overall_score', '0')),
+                reverse=True
+            )
+            ranked[task['category']] = [
+                (url, (doc.get('raw_content') or doc.get('content', ''))[:self.max_doc_length * 2])
+                for url, doc in items
+            ]
+
+        deduped = dedupe_sentences(ranked, CATEGORY_KEYWORDS)
+
+        before = sum(len(text) for docs in ranked.values() for _, text in docs)
+        after = 0
+        for task in briefing_tasks:
+            texts = deduped[task['category']]
+            # Copies: documents can be shared between categories
+            task['curated_data'] = {
+                url: {**doc, 'raw_content': texts[url]}
+                for url, doc in task['curated_data'].items()
+                if texts.get(url)
+            }
+            after += sum(len(text) for text in texts.values())
+        logger.info("Déduplication des phrases entre catégories : %d -> %d caractères", before, after)
+
+    async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.create_briefings(state)
@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 from langchain_core.messages import AIMessage
 
 from ..classes import ResearchState
@@ -6,14 +8,14 @@ from ..classes import ResearchState
 class Collector:
     """Collects and organizes all research data before curation."""
 
-    async def collect(self, state: ResearchState) -> ResearchState:
-        """Collect and verify all research data is present."""
+    async def collect(self, state: ResearchState) -> Dict[str, Any]:
+        """Report the research data merged by the graph reducers as each analyst finished."""
         company = state.get('company', 'Unknown Company')
         msg = [f"📦 Collecting research data for {company}:"]
 
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message=f"Collecting research data for {company}",
@@ -28,19 +30,19 @@ class Collector:
             'company_data': '🏢 Company'
         }
         
+        # Counts and URL overlaps were accumulated by the reducers, no need to rescan documents
+        doc_counts = state.get('doc_counts', {})
         for data_field, label in research_types.items():
-            data = state.get(data_field, {})
-            if data:
-                msg.append(f"• {label}: {len(data)} documents collected")
+            if count := doc_counts.get(data_field, 0):
+                msg.append(f"• {label}: {count} documents collected")
             else:
                 msg.append(f"• {label}: No data found")
+
+        url_categories = state.get('url_categories', {})
+        if shared := sum(1 for categories in url_categories.values() if len(categories) > 1):
+            msg.append(f"• {len(url_categories)} unique URLs, {shared} found by several analysts")
         
-        # Update state with collection message
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
-        
-        return state
+        return {'messages': [AIMessage(content="\n".join(msg))]}
 
-    async def run(self, state: ResearchState) -> ResearchState:
+    async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.collect(state)
\ No newline at end of file
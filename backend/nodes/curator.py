@@ -1,25 +1,123 @@
 import logging
-from typing import Dict
-from urllib.parse import urljoin, urlparse
+import math
+import os
+from typing import Any, Dict, List, Optional
 
 from langchain_core.messages import AIMessage
 
 from ..classes import ResearchState
-from ..utils.references import process_references_from_search_results
+from ..utils.language import detect_language
+from ..utils.references import ReferenceIndex
+from ..utils.text import mmr_select, tfidf_matrix
+from ..utils.urls import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
+# Source tag of the pages crawled from the company's own site (see grounding)
+COMPANY_SITE_SOURCE = 'site_entreprise'
+
 class Curator:
     def __init__(self) -> None:
-        self.relevance_threshold = 0.4  # Fixed initialization of class attribute
-        logger.info("Curator initialized with relevance threshold: {relevance_threshhold}")
+        self.relevance_threshold = float(os.getenv("CURATION_RELEVANCE_THRESHOLD", "0.4"))
+        # "adaptive" calibrates the threshold per category, "fixed" always uses relevance_threshold
+        self.threshold_mode = os.getenv("CURATION_THRESHOLD_MODE", "adaptive").lower()
+        self.target_doc_count = int(os.getenv("CURATION_TARGET_DOCS", "30"))
+        self.min_relevance_score = float(os.getenv("CURATION_MIN_SCORE", "0.2"))
+        # Adaptive threshold: categories above the target keep this many times the target, so MMR can drop duplicates
+        self.pool_factor = max(1.0, float(os.getenv("CURATION_POOL_FACTOR", "1.25")))
+        # Weight of score versus novelty when selecting the final documents (1.0 = pure score)
+        self.mmr_relevance_weight = float(os.getenv("CURATION_MMR_WEIGHT", "0.7"))
+        # Documents with a TF-IDF cosine similarity above this to a kept one are dropped as duplicates
+        self.max_similarity = float(os.getenv("CURATION_MAX_SIMILARITY", "0.8"))
+        # Languages the report can use; other documents are dropped or down-weighted
+        self.languages = {lang.strip() for lang in os.getenv("CURATION_LANGUAGES", "fr,en").split(",") if lang.strip()}
+        self.language_policy = os.getenv("CURATION_LANGUAGE_POLICY", "downweight").lower()
+        self.language_penalty = float(os.getenv("CURATION_LANGUAGE_PENALTY", "0.5"))
+        logger.info(
+            "Curator initialized with %s relevance threshold: %s (target %d docs, min score %s)",
+            self.threshold_mode, self.relevance_threshold, self.target_doc_count, self.min_relevance_score
+        )
+
+    def calibrate_threshold(self, docs: List[Dict]) -> float:
+        """Pick a category threshold from its score distribution and the target count.
+
+        A category with no more than `target_doc_count` scored documents
+        keeps all of them above `min_relevance_score`. A larger one keeps
+        its best `target_doc_count * pool_factor` (the matching quantile of
+        its scores), still floored at `min_relevance_score`, and
+        `select_diverse` then picks the target among them. Pages of the
+        company's site are always kept and are not counted.
+        """
+        if self.threshold_mode != "adaptive":
+            return self.relevance_threshold
+
+        scores = []
+        for doc in docs:
+            if doc.get('source') == COMPANY_SITE_SOURCE:
+                continue
+            try:
+                scores.append(float(doc.get('score', 0)))
+            except (ValueError, TypeError):
+                continue
+
+        if len(scores) <= self.target_doc_count:
+            return self.min_relevance_score
+
+        pool_size = min(len(scores), math.ceil(self.target_doc_count * self.pool_factor))
+        scores.sort(reverse=True)
+        return max(self.min_relevance_score, scores[pool_size - 1])
+
+    def select_diverse(self, docs: List[Dict]) -> List[Dict]:
+        """Select up to `target_doc_count` documents trading score against redundancy (MMR).
+
+        Near-duplicates are dropped even when the category has fewer
+        documents than the target.
+        """
+        if len(docs) <= 1 or self.mmr_relevance_weight >= 1:
+            return docs[:self.target_doc_count]
+
+        texts = [f"{doc.get('title', '')} {doc.get('content') or doc.get('raw_content', '')}" for doc in docs]
+        scores = [float(doc['evaluation']['overall_score']) for doc in docs]
+        selected = mmr_select(
+            scores, tfidf_matrix(texts), self.target_doc_count, self.mmr_relevance_weight, self.max_similarity
+        )
+        # Keep score order for downstream stages
+        return [docs[i] for i in sorted(selected)]
 
-    async def evaluate_documents(self, state: ResearchState, docs: list, context: Dict[str, str]) -> list:
+    def apply_language_policy(self, docs: List[Dict]) -> List[Dict]:
+        """Tag each document with its language and drop or down-weight the ones outside `languages`."""
+        if self.language_policy == "off":
+            return docs
+
+        kept = []
+        for doc in docs:
+            if 'language' not in doc:
+                text = f"{doc.get('title', '')}\n{doc.get('content') or doc.get('raw_content', '')}"
+                doc['language'] = detect_language(text)[0]
+            if doc['language'] == 'und' or doc['language'] in self.languages:
+                kept.append(doc)
+            elif self.language_policy == "drop":
+                logger.debug("Document dropped (language %s): %s", doc['language'], doc.get('url'))
+            else:
+                # Documents may be shared between categories: always penalize the original score
+                original_score = doc.setdefault('original_score', doc.get('score', 0))
+                try:
+                    doc['score'] = float(original_score) * self.language_penalty
+                except (ValueError, TypeError):
+                    pass
+                kept.append(doc)
+        return kept
+
+    async def evaluate_documents(
+        self, state: ResearchState, docs: list, context: Dict[str, str], threshold: Optional[float] = None
+    ) -> list:
         """Evaluate documents based on Tavily's scoring."""
-        if websocket_manager := state.get('websocket_manager'):
+        if threshold is None:
+            threshold = self.relevance_threshold
+
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                logger.info(f"Sending initial curation status update for job {job_id}")
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message="Evaluating documents",
@@ -31,7 +129,6 @@ class Curator:
         if not docs:
             return []
 
-        logger.info(f"Evaluating {len(docs)} documents")
         
         evaluated_docs = []
         try:
@@ -42,12 +139,14 @@ class Curator:
                     tavily_score = float(doc.get('score', 0))  # Default to 0 if no score
                     
                     # Always keep company website data regardless of score (first-party information)
-                    is_company_website = doc.get('source') == 'company_website'
+                    is_company_website = doc.get('source') == COMPANY_SITE_SOURCE
                     
                     # Keep documents with good Tavily score or company website data
-                    if tavily_score >= self.relevance_threshold or is_company_website:
-                        reason = "company website" if is_company_website else f"score {tavily_score:.4f}"
-                        logger.info(f"Document kept ({reason}) for '{doc.get('title', 'No title')}')")
+                    if tavily_score >= threshold or is_company_website:
+                        logger.debug(
+                            "Document kept (score %.4f, company website: %s) for '%s'",
+                            tavily_score, is_company_website, doc.get('title', 'No title')
+                        )
                         
                         evaluated_doc = {
                             **doc,
@@ -59,9 +158,9 @@ class Curator:
                         evaluated_docs.append(evaluated_doc)
                         
                         # Send incremental update for kept document
-                        if websocket_manager := state.get('websocket_manager'):
+                        if event_bus := state.get('event_bus'):
                             if job_id := state.get('job_id'):
-                                await websocket_manager.send_status_update(
+                                event_bus.publish_status(
                                     job_id=job_id,
                                     status="document_kept",
                                     message=f"Kept document: {doc.get('title', 'No title')}",
@@ -73,7 +172,7 @@ class Curator:
                                     }
                                 )
                     else:
-                        logger.info(f"Document below threshold with score {tavily_score:.4f} for '{doc.get('title', 'No title')}'")
+                        logger.debug("Document below threshold with score %.4f for '%s'", tavily_score, doc.get('title', 'No title'))
                 except (ValueError, TypeError) as e:
                     logger.warning(f"Error processing score for document: {e}")
                     continue
@@ -84,20 +183,20 @@ class Curator:
 
         # Sort evaluated docs by score before returning
         evaluated_docs.sort(key=lambda x: float(x['evaluation']['overall_score']), reverse=True)
-        logger.info(f"Returning {len(evaluated_docs)} evaluated documents")
+        logger.info("Kept %d of %d evaluated documents", len(evaluated_docs), len(docs))
         
         return evaluated_docs
 
-    async def curate_data(self, state: ResearchState) -> ResearchState:
+    async def curate_data(self, state: ResearchState) -> Dict[str, Any]:
         """Curate all collected data based on Tavily scores."""
         company = state.get('company', 'Unknown Company')
         logger.info(f"Starting curation for company: {company}")
         
         # Send initial status update through WebSocket
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
                 logger.info(f"Sending initial curation status update for job {job_id}")
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message=f"Starting document curation for {company}",
@@ -130,63 +229,60 @@ class Curator:
 
         # Create all evaluation tasks upfront
         curation_tasks = []
+        language_filtered = {}
         for data_field, (emoji, doc_type) in data_types.items():
             data = state.get(data_field, {})
             if not data:
                 continue
 
-            # Filter and normalize URLs
+            # Deduplicate documents on their canonical URL
             unique_docs = {}
             for url, doc in data.items():
-                try:
-                    parsed = urlparse(url)
-                    if not parsed.scheme:
-                        url = urljoin('https://', url)
-                    clean_url = parsed._replace(query='', fragment='').geturl()
-                    if clean_url not in unique_docs:
-                        doc['url'] = clean_url
-                        doc['doc_type'] = doc_type
-                        unique_docs[clean_url] = doc
-                except Exception:
-                    continue
+                clean_url = canonicalize_url(url)
+                if clean_url and clean_url not in unique_docs:
+                    # Keep the URL as found for extraction and citation
+                    doc.setdefault('url', url)
+                    doc['doc_type'] = doc_type
+                    unique_docs[clean_url] = doc
 
-            docs = list(unique_docs.values())
+            docs = self.apply_language_policy(list(unique_docs.values()))
+            language_filtered[doc_type] = len(unique_docs) - len(docs)
             curation_tasks.append((data_field, emoji, doc_type, unique_docs.keys(), docs))
 
-        # Track document counts for each type
+        # Track document counts and calibrated thresholds for each type
+        updates: Dict[str, Any] = {}
         doc_counts = {}
+        thresholds = {}
+        reference_index = ReferenceIndex()
 
         for data_field, emoji, doc_type, urls, docs in curation_tasks:
             msg.append(f"\n{emoji}: Found {len(docs)} documents")
+            threshold = self.calibrate_threshold(docs)
+            thresholds[doc_type] = threshold
 
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="category_start",
                         message=f"Processing {doc_type} documents",
                         result={
                             "step": "Curation",
                             "doc_type": doc_type,
-                            "initial_count": len(docs)
+                            "initial_count": len(docs),
+                            "threshold": threshold
                         }
                     )
 
-            evaluated_docs = await self.evaluate_documents(state, docs, context)
+            evaluated_docs = await self.evaluate_documents(state, docs, context, threshold)
 
             if not evaluated_docs:
                 msg.append("  ⚠️ No relevant documents found")
                 doc_counts[data_field] = {"initial": len(docs), "kept": 0}
                 continue
 
-            # Filter and sort by Tavily score
-            relevant_docs = {url: doc for url, doc in zip(urls, evaluated_docs)}
-            sorted_items = sorted(relevant_docs.items(), key=lambda item: item[1]['evaluation']['overall_score'], reverse=True)
-            
-            # Limit to top 30 documents per category
-            if len(sorted_items) > 30:
-                sorted_items = sorted_items[:30]
-            relevant_docs = dict(sorted_items)
+            # Limit to the target number of documents per category, skipping redundant ones
+            relevant_docs = {canonicalize_url(doc['url']): doc for doc in self.select_diverse(evaluated_docs)}
 
             doc_counts[data_field] = {
                 "initial": len(docs),
@@ -195,30 +291,29 @@ class Curator:
 
             if relevant_docs:
                 msg.append(f"  ✓ Kept {len(relevant_docs)} relevant documents")
-                logger.info(f"Kept {len(relevant_docs)} documents for {doc_type} with scores above threshold")
+                logger.info("Kept %d documents for %s with scores above threshold %.4f", len(relevant_docs), doc_type, threshold)
             else:
                 msg.append("  ⚠️ No documents met relevance threshold")
                 logger.info(f"No documents met relevance threshold for {doc_type}")
 
-            # Store curated documents in state
-            state[f'curated_{data_field}'] = relevant_docs
+            # Store curated documents in the state delta
+            updates[f'curated_{data_field}'] = relevant_docs
+            reference_index.add_documents(relevant_docs)
             
-        # Process references using the references module
-        top_reference_urls, reference_titles, reference_info = process_references_from_search_results(state)
+        # Select references from the index built during curation
+        top_reference_urls, reference_titles, reference_info = reference_index.top(10)
         logger.info(f"Selected top {len(top_reference_urls)} references for the report")
         
         # Update state with references and their titles
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
-        state['references'] = top_reference_urls
-        state['reference_titles'] = reference_titles
-        state['reference_info'] = reference_info
+        updates['messages'] = [AIMessage(content="\n".join(msg))]
+        updates['references'] = top_reference_urls
+        updates['reference_titles'] = reference_titles
+        updates['reference_info'] = reference_info
 
         # Send final curation stats
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="curation_complete",
                     message="Document curation complete",
@@ -229,11 +324,14 @@ class Curator:
                             "industry": doc_counts.get('industry_data', {"initial": 0, "kept": 0}),
                             "financial": doc_counts.get('financial_data', {"initial": 0, "kept": 0}),
                             "news": doc_counts.get('news_data', {"initial": 0, "kept": 0})
-                        }
+                        },
+                        "threshold_mode": self.threshold_mode,
+                        "thresholds": thresholds,
+                        "language_filtered": language_filtered
                     }
                 )
 
-        return state
+        return updates
 
-    async def run(self, state: ResearchState) -> ResearchState:
+    async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.curate_data(state)
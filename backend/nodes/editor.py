@@ -1,11 +1,15 @@
+import asyncio
 import logging
 import os
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Tuple
 
 from langchain_core.messages import AIMessage
-from openai import AsyncOpenAI
 
 from ..classes import ResearchState
+from ..services.llm_gateway import gateway
+from ..utils.markdown import CATEGORY_SECTIONS, normalize_report, section_body
+from ..utils.text import dedupe_sentences
+from .briefing import CATEGORY_KEYWORDS
 from ..utils.references import format_references_section
 
 logger = logging.getLogger(__name__)
@@ -17,9 +21,17 @@ class Editor:
         self.openai_key = os.getenv("OPENAI_API_KEY")
         if not self.openai_key:
             raise ValueError("La variable d’environnement OPENAI_API_KEY n’est pas définie")
-        
-        # Configuration d’OpenAI
-        self.openai_client = AsyncOpenAI(api_key=self.openai_key)
+
+        # Mode de compilation :
+        # - two_pass : compilation puis mise en forme par le LLM
+        # - single_pass : compilation en streaming puis normalisation markdown locale
+        # - sections : une compilation par section en parallèle, assemblées localement
+        # - progressive : comme sections, mais chaque section est compilée et diffusée
+        #   (report_section) dès que sa synthèse existe, puis réconciliée à la fin
+        self.mode = os.getenv("EDITOR_MODE", "two_pass").lower()
+        # Mode progressif : synthèse source et tâche de compilation par catégorie, sections prêtes
+        self.section_tasks: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self.partial_sections: Dict[str, str] = {}
         
         # Initialisation du dictionnaire de contexte utilisé dans les méthodes
         self.context = {
@@ -28,7 +40,7 @@ class Editor:
             "hq_location": "Inconnue"
         }
 
-    async def compile_briefings(self, state: ResearchState) -> ResearchState:
+    async def compile_briefings(self, state: ResearchState) -> Dict[str, Any]:
         """Compile les différentes synthèses en un rapport final."""
         company = state.get('company', 'Entreprise inconnue')
         
@@ -40,9 +52,9 @@ class Editor:
         }
         
         # Envoi du statut initial de compilation
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message=f"Démarrage de la compilation du rapport pour {company}",
@@ -69,9 +81,9 @@ class Editor:
         }
 
         # Envoi du statut de collecte des synthèses
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message="Collecte des synthèses de sections",
@@ -81,6 +93,7 @@ class Editor:
                     }
                 )
 
+        updates: Dict[str, Any] = {}
         individual_briefings = {}
         for category, key in briefing_keys.items():
             if content := state.get(key):
@@ -100,10 +113,12 @@ class Editor:
                     logger.error("Le rapport compilé est vide !")
                 else:
                     logger.info(f"Rapport compilé avec succès ({len(compiled_report)} caractères)")
+                    updates['report'] = compiled_report
+                    updates['status'] = "editor_complete"
             except Exception as e:
                 logger.error(f"Erreur lors de la compilation du rapport : {e}")
-        state.setdefault('messages', []).append(AIMessage(content="\n".join(msg)))
-        return state
+        updates['messages'] = [AIMessage(content="\n".join(msg))]
+        return updates
     
     async def edit_report(self, state: ResearchState, briefings: Dict[str, str], context: Dict[str, Any]) -> str:
         """Assemble les sections en un rapport final et met à jour l’état."""
@@ -111,9 +126,9 @@ class Editor:
             company = self.context["company"]
             
             # Étape 1 : Compilation initiale
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Compilation du rapport de recherche initial",
@@ -123,15 +138,25 @@ class Editor:
                         }
                     )
 
+            if self.mode == "single_pass":
+                compiled = await self.compile_content(state, briefings, company, stream=True)
+                # Chaque synthèse doit retrouver sa section, sinon le texte compilé est gardé tel quel
+                required = [CATEGORY_SECTIONS[category] for category in briefings if category in CATEGORY_SECTIONS]
+                final_report = normalize_report(compiled, company, self.references_section(state), required) if compiled else ""
+                return await self.finish_report(state, final_report, company)
+            if self.mode in ("sections", "progressive"):
+                final_report = await self.compile_sections(state, briefings, company)
+                return await self.finish_report(state, final_report, company)
+
             edited_report = await self.compile_content(state, briefings, company)
             if not edited_report:
                 logger.error("Échec de la compilation initiale")
                 return ""
 
             # Étape 2 : Nettoyage et déduplication
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Nettoyage et organisation du rapport",
@@ -142,9 +167,9 @@ class Editor:
                     )
 
             # Étape 3 : Mise en forme du rapport final
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Mise en forme du rapport final",
@@ -154,28 +179,24 @@ class Editor:
                         }
                     )
             final_report = await self.content_sweep(state, edited_report, company)
-            
-            final_report = final_report or ""
-            
+            return await self.finish_report(state, final_report or "", company)
+        except Exception as e:
+            logger.error(f"Erreur dans edit_report : {e}")
+            return ""
+
+    async def finish_report(self, state: ResearchState, final_report: str, company: str) -> str:
+        """Journalise et diffuse le rapport final."""
+        try:
             logger.info(f"Rapport final compilé ({len(final_report)} caractères)")
             if not final_report.strip():
                 logger.error("Le rapport final est vide !")
                 return ""
             
-            logger.info("Aperçu du rapport final :")
-            logger.info(final_report[:500])
+            logger.debug("Aperçu du rapport final : %.500s", final_report)
             
-            # Mise à jour de l’état avec le rapport final
-            state['report'] = final_report
-            state['status'] = "editor_complete"
-            if 'editor' not in state or not isinstance(state['editor'], dict):
-                state['editor'] = {}
-            state['editor']['report'] = final_report
-            logger.info(f"Taille du rapport dans l’état : {len(state.get('report', ''))}")
-            
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="editor_complete",
                         message="Rapport de recherche terminé",
@@ -193,23 +214,26 @@ class Editor:
             logger.error(f"Erreur dans edit_report : {e}")
             return ""
     
-    async def compile_content(self, state: ResearchState, briefings: Dict[str, str], company: str) -> str:
-        """Compilation initiale des sections de recherche."""
-        combined_content = "\n\n".join(content for content in briefings.values())
-        
+    def references_section(self, state: ResearchState) -> str:
+        """Section Références formatée localement, sans passer par le LLM."""
         references = state.get('references', [])
-        reference_text = ""
-        if references:
-            logger.info(f"{len(references)} références trouvées à ajouter pendant la compilation")
-            
-            reference_info = state.get('reference_info', {})
-            reference_titles = state.get('reference_titles', {})
-            
-            logger.info(f"Informations sur les références : {reference_info}")
-            logger.info(f"Titres des références : {reference_titles}")
-            
-            reference_text = format_references_section(references, reference_info, reference_titles)
-            logger.info(f"{len(references)} références ajoutées pendant la compilation")
+        if not references:
+            return ""
+        reference_info = state.get('reference_info', {})
+        reference_titles = state.get('reference_titles', {})
+        logger.debug("Informations sur les références : %.1000s", reference_info)
+
+        reference_text = format_references_section(references, reference_info, reference_titles)
+        logger.info("%d références ajoutées pendant la compilation", len(references))
+        return reference_text
+
+    async def compile_content(self, state: ResearchState, briefings: Dict[str, str], company: str, stream: bool = False) -> str:
+        """Compilation initiale des sections de recherche.
+
+        En streaming, le texte est diffusé en report_chunk et renvoyé sans les références.
+        """
+        combined_content = "\n\n".join(content for content in briefings.values())
+        reference_text = "" if stream else self.references_section(state)
         
         company = self.context["company"]
         industry = self.context["industry"]
@@ -244,9 +268,62 @@ Structure obligatoire :
 Retournez le rapport en **markdown clair**, sans explications ni commentaires."""
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
+            messages = [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un rédacteur expert chargé de compiler des synthèses de recherche en rapports d’entreprise complets."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+            if stream:
+                return await self.stream_report(
+                    state,
+                    gateway.stream('compile', messages, job_id=state.get('job_id'), temperature=0),
+                    "Rédaction du rapport final"
+                )
+            initial_report = (await gateway.complete('compile', messages, job_id=state.get('job_id'), temperature=0)).strip()
+            
+            if reference_text:
+                initial_report = f"{initial_report}\n\n{reference_text}"
+            
+            return initial_report
+        except Exception as e:
+            logger.error(f"Erreur lors de la compilation initiale : {e}")
+            if stream:
+                # Chaque synthèse devient sa section pour que la normalisation la conserve
+                return "\n\n".join(
+                    f"## {CATEGORY_SECTIONS[category]}\n{content}"
+                    for category, content in briefings.items() if category in CATEGORY_SECTIONS
+                )
+            return (combined_content or "").strip()
+        
+    async def compile_section(self, state: ResearchState, category: str, briefing: str, company: str) -> str:
+        """Rédige le corps d’une section ## à partir de sa seule synthèse."""
+        section = CATEGORY_SECTIONS[category]
+        industry = self.context["industry"]
+        hq_location = self.context["hq_location"]
+        bullets_rule = "Utilisez uniquement des puces (*), de la plus récente à la plus ancienne" if category == 'news' else "Utilisez des ### sous-sections et des puces (*)"
+
+        prompt = f"""Vous rédigez la section « {section} » d’un rapport de recherche sur {company}, une entreprise du secteur {industry} dont le siège est à {hq_location}.
+
+Synthèse de la section :
+{briefing}
+
+Règles :
+1. Intégrez toutes les informations importantes de la synthèse, sans répétition
+2. {bullets_rule}
+3. N’écrivez pas de titre # ou ## : la section sera insérée sous « ## {section} »
+4. Aucun méta-commentaire, aucun bloc de code, aucune ligne vide multiple
+
+Retournez uniquement le contenu de la section en markdown."""
+
+        try:
+            response = await gateway.complete(
+                'compile',
+                [
                     {
                         "role": "system",
                         "content": "Vous êtes un rédacteur expert chargé de compiler des synthèses de recherche en rapports d’entreprise complets."
@@ -256,19 +333,88 @@ Retournez le rapport en **markdown clair**, sans explications ni commentaires.""
                         "content": prompt
                     }
                 ],
-                temperature=0,
-                stream=False
+                job_id=state.get('job_id'),
+                temperature=0
             )
-            initial_report = response.choices[0].message.content.strip()
-            
-            if reference_text:
-                initial_report = f"{initial_report}\n\n{reference_text}"
-            
-            return initial_report
+            return response.strip()
         except Exception as e:
-            logger.error(f"Erreur lors de la compilation initiale : {e}")
-            return (combined_content or "").strip()
-        
+            logger.error(f"Erreur lors de la compilation de la section {category} : {e}")
+            return briefing.strip()
+
+    async def compile_sections(self, state: ResearchState, briefings: Dict[str, str], company: str) -> str:
+        """Compile chaque section en parallèle puis assemble et déduplique le rapport localement."""
+        categories = [category for category in CATEGORY_SECTIONS if briefings.get(category)]
+
+        async def body_for(category: str) -> str:
+            # Réutilise la section compilée en avance si sa synthèse n’a pas changé
+            if category in self.section_tasks:
+                source, task = self.section_tasks[category]
+                if source == briefings[category]:
+                    return await task
+            return await self.compile_section(state, category, briefings[category], company)
+
+        bodies = await asyncio.gather(*[body_for(category) for category in categories])
+
+        # Une phrase répétée dans plusieurs sections n’est gardée que dans celle qui lui correspond le mieux
+        deduped = dedupe_sentences(
+            {
+                category: [(category, section_body(body, CATEGORY_SECTIONS[category]))]
+                for category, body in zip(categories, bodies)
+            },
+            CATEGORY_KEYWORDS
+        )
+        stitched = "\n\n".join(
+            f"## {CATEGORY_SECTIONS[category]}\n{deduped[category][category]}"
+            for category in categories
+        )
+        required = [CATEGORY_SECTIONS[category] for category in categories if deduped[category][category].strip()]
+        return normalize_report(stitched, company, self.references_section(state), required)
+
+    def section_ready(self, category: str, briefing: str, context: Dict[str, Any]) -> None:
+        """Écouteur de Briefing : lance la compilation d’une section dès que sa synthèse est prête."""
+        if category not in CATEGORY_SECTIONS:
+            return
+        self.context = {
+            "company": context.get('company', 'Entreprise inconnue'),
+            "industry": context.get('industry', 'Secteur inconnu'),
+            "hq_location": context.get('hq_location', 'Inconnue')
+        }
+        task = asyncio.create_task(self.publish_section(category, briefing, context))
+        self.section_tasks[category] = (briefing, task)
+
+    async def publish_section(self, category: str, briefing: str, context: Dict[str, Any]) -> str:
+        """Compile une section et la diffuse au client (report_section)."""
+        company = self.context["company"]
+        body = await self.compile_section(context, category, briefing, company)
+        self.partial_sections[category] = section_body(body, CATEGORY_SECTIONS[category])
+        if event_bus := context.get('event_bus'):
+            if job_id := context.get('job_id'):
+                event_bus.publish_status(
+                    job_id=job_id,
+                    status="report_section",
+                    message=f"Section {CATEGORY_SECTIONS[category]} prête",
+                    result={
+                        "step": "Éditeur",
+                        "category": category,
+                        "section": CATEGORY_SECTIONS[category],
+                        "content": self.partial_sections[category],
+                        "sections_ready": len(self.partial_sections)
+                    }
+                )
+        return body
+
+    def partial_report(self) -> Dict[str, Any]:
+        """Rapport provisoire assemblé à partir des sections déjà compilées."""
+        sections = {
+            category: self.partial_sections[category]
+            for category in CATEGORY_SECTIONS if category in self.partial_sections
+        }
+        stitched = "\n\n".join(f"## {CATEGORY_SECTIONS[category]}\n{body}" for category, body in sections.items())
+        return {
+            "sections": sections,
+            "report": normalize_report(stitched, self.context["company"]) if sections else "",
+        }
+
     async def content_sweep(self, state: ResearchState, content: str, company: str) -> str:
         """Nettoie le contenu pour supprimer les redondances et incohérences."""
         company = self.context["company"]
@@ -305,9 +451,9 @@ Règles :
 Retournez le rapport nettoyé en markdown parfait, sans explications."""
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4.1-mini", 
-                messages=[
+            response = gateway.stream(
+                'sweep',
+                [
                     {
                         "role": "system",
                         "content": "Vous êtes un formateur markdown expert garantissant la cohérence du document."
@@ -317,59 +463,47 @@ Retournez le rapport nettoyé en markdown parfait, sans explications."""
                         "content": prompt
                     }
                 ],
-                temperature=0,
-                stream=True
+                job_id=state.get('job_id'),
+                temperature=0
             )
             
-            accumulated_text = ""
-            buffer = ""
-            
-            async for chunk in response:
-                if chunk.choices[0].finish_reason == "stop":
-                    websocket_manager = state.get('websocket_manager')
-                    if websocket_manager and buffer:
-                        job_id = state.get('job_id')
-                        if job_id:
-                            await websocket_manager.send_status_update(
-                                job_id=job_id,
-                                status="report_chunk",
-                                message="Mise en forme du rapport final",
-                                result={
-                                    "chunk": buffer,
-                                    "step": "Éditeur"
-                                }
-                            )
-                    break
-                    
-                chunk_text = chunk.choices[0].delta.content
-                if chunk_text:
-                    accumulated_text += chunk_text
-                    buffer += chunk_text
-                    
-                    if any(char in buffer for char in ['.', '!', '?', '\n']) and len(buffer) > 10:
-                        if websocket_manager := state.get('websocket_manager'):
-                            if job_id := state.get('job_id'):
-                                await websocket_manager.send_status_update(
-                                    job_id=job_id,
-                                    status="report_chunk",
-                                    message="Mise en forme du rapport final",
-                                    result={
-                                        "chunk": buffer,
-                                        "step": "Éditeur"
-                                    }
-                                )
-                        buffer = ""
-            
-            return (accumulated_text or "").strip()
+            return await self.stream_report(state, response, "Mise en forme du rapport final")
         except Exception as e:
             logger.error(f"Erreur de mise en forme : {e}")
             return (content or "").strip()
 
-    async def run(self, state: ResearchState) -> ResearchState:
-        state = await self.compile_briefings(state)
-        # S’assurer que la sortie de l’éditeur est stockée au niveau supérieur et dans “editor”
-        if 'report' in state:
-            if 'editor' not in state or not isinstance(state['editor'], dict):
-                state['editor'] = {}
-            state['editor']['report'] = state['report']
-        return state
+    async def stream_report(self, state: ResearchState, response: AsyncIterator[str], message: str) -> str:
+        """Consomme un flux de texte et le diffuse par phrases (report_chunk)."""
+        event_bus = state.get('event_bus')
+        job_id = state.get('job_id')
+        accumulated_text = ""
+        buffer = ""
+
+        async def flush() -> None:
+            nonlocal buffer
+            if event_bus and job_id and buffer:
+                event_bus.publish_status(
+                    job_id=job_id,
+                    status="report_chunk",
+                    message=message,
+                    result={
+                        "chunk": buffer,
+                        "step": "Éditeur"
+                    }
+                )
+            buffer = ""
+
+        async for chunk_text in response:
+            if chunk_text:
+                accumulated_text += chunk_text
+                buffer += chunk_text
+
+                if any(char in buffer for char in ['.', '!', '?', '\n']) and len(buffer) > 10:
+                    await flush()
+
+        await flush()
+        return accumulated_text.strip()
+
+    async def run(self, state: ResearchState) -> Dict[str, Any]:
+        # La mise à jour est diffusée sous le nom du nœud (“editor”) par graph.run
+        return await self.compile_briefings(state)
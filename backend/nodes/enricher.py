@@ -1,11 +1,13 @@
 import asyncio
 import os
-from typing import Dict, List
+from typing import Any, Dict, List
 
 from langchain_core.messages import AIMessage
 from tavily import AsyncTavilyClient
 
 from ..classes import ResearchState
+from ..services.rate_limiter import limiter
+from ..utils.urls import canonicalize_url
 
 
 class Enricher:
@@ -17,12 +19,14 @@ class Enricher:
             raise ValueError("TAVILY_API_KEY environment variable is not set")
         self.tavily_client = AsyncTavilyClient(api_key=tavily_key)
         self.batch_size = 20
+        # In-flight extractions keyed by canonical URL, shared across categories
+        self._extractions: Dict[str, asyncio.Task] = {}
 
-    async def fetch_single_content(self, url: str, websocket_manager=None, job_id=None, category=None) -> Dict[str, str]:
+    async def fetch_single_content(self, url: str, event_bus=None, job_id=None, category=None) -> Dict[str, str]:
         """Fetch raw content for a single URL."""
         try:
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="extracting",
                     message=f"Extracting content from {url}",
@@ -33,10 +37,11 @@ class Enricher:
                     }
                 )
 
+            await limiter.acquire('tavily')
             result = await self.tavily_client.extract(url)
             if result and result.get('results'):
-                if websocket_manager and job_id:
-                    await websocket_manager.send_status_update(
+                if event_bus and job_id:
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="extracted",
                         message=f"Successfully extracted content from {url}",
@@ -51,8 +56,8 @@ class Enricher:
         except Exception as e:
             print(f"Error fetching raw content for {url}: {e}")
             error_msg = str(e)
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="extraction_error",
                     message=f"Failed to extract content from {url}: {error_msg}",
@@ -67,7 +72,16 @@ class Enricher:
             return {url: '', "error": error_msg}
         return {url: ''}
 
-    async def fetch_raw_content(self, urls: List[str], websocket_manager=None, job_id=None, category=None) -> Dict[str, str]:
+    def _extract_once(self, url: str, event_bus=None, job_id=None, category=None) -> asyncio.Task:
+        """Return the extraction task for a URL, starting it only if no category already did."""
+        key = canonicalize_url(url)
+        if key not in self._extractions:
+            self._extractions[key] = asyncio.ensure_future(
+                self.fetch_single_content(url, event_bus, job_id, category)
+            )
+        return self._extractions[key]
+
+    async def fetch_raw_content(self, urls: List[str], event_bus=None, job_id=None, category=None) -> Dict[str, str]:
         """Fetch raw content for multiple URLs in parallel."""
         raw_contents = {}
         total_batches = (len(urls) + self.batch_size - 1) // self.batch_size
@@ -80,8 +94,8 @@ class Enricher:
         
         async def process_batch(batch_num: int, batch_urls: List[str]) -> Dict[str, str]:
             async with semaphore:
-                if websocket_manager and job_id:
-                    await websocket_manager.send_status_update(
+                if event_bus and job_id:
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="batch_start",
                         message=f"Processing batch {batch_num + 1}/{total_batches}",
@@ -93,14 +107,17 @@ class Enricher:
                         }
                     )
 
-                # Process URLs in batch concurrently
-                tasks = [self.fetch_single_content(url, websocket_manager, job_id, category) for url in batch_urls]
+                # Process URLs in batch concurrently, reusing extractions started by other categories
+                tasks = [self._extract_once(url, event_bus, job_id, category) for url in batch_urls]
                 results = await asyncio.gather(*tasks)
                 
                 # Combine results from batch
                 batch_contents = {}
-                for result in results:
-                    batch_contents.update(result)
+                for url, result in zip(batch_urls, results):
+                    if result.get('error'):
+                        batch_contents[url] = {'error': result['error']}
+                    else:
+                        batch_contents[url] = next(iter(result.values()), '')
                 
                 return batch_contents
 
@@ -116,14 +133,14 @@ class Enricher:
 
         return raw_contents
 
-    async def enrich_data(self, state: ResearchState) -> ResearchState:
+    async def enrich_data(self, state: ResearchState) -> Dict[str, Any]:
         """Enrich curated documents with raw content."""
         company = state.get('company', 'Unknown Company')
-        websocket_manager = state.get('websocket_manager')
+        event_bus = state.get('event_bus')
         job_id = state.get('job_id')
 
-        if websocket_manager and job_id:
-            await websocket_manager.send_status_update(
+        if event_bus and job_id:
+            event_bus.publish_status(
                 job_id=job_id,
                 status="processing",
                 message=f"Starting content enrichment for {company}",
@@ -134,6 +151,8 @@ class Enricher:
             )
 
         msg = [f"📚 Enriching curated data for {company}:"]
+        self._extractions = {}
+        updates: Dict[str, Any] = {}
 
         # Process each type of curated data
         data_types = {
@@ -163,8 +182,8 @@ class Enricher:
             
             msg.append(f"\n• Enriching {len(docs_needing_content)} {label} documents...")
 
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="category_start",
                     message=f"Processing {label} documents",
@@ -188,9 +207,11 @@ class Enricher:
         if enrichment_tasks:
             async def process_category(task):
                 try:
+                    # Extract the URL as found; documents stay keyed by canonical URL
+                    keys = {doc.get('url') or key: key for key, doc in task['docs'].items()}
                     raw_contents = await self.fetch_raw_content(
-                        list(task['docs'].keys()),
-                        websocket_manager,
+                        list(keys),
+                        event_bus,
                         job_id,
                         task['category']
                     )
@@ -204,14 +225,14 @@ class Enricher:
                             error_count += 1
                         elif content_or_error:
                             # This is a successful content
-                            task['curated_docs'][url]['raw_content'] = content_or_error
+                            task['curated_docs'][keys[url]]['raw_content'] = content_or_error
                             enriched_count += 1
 
                     # Update state with enriched documents
-                    state[task['field']] = task['curated_docs']
+                    updates[task['field']] = task['curated_docs']
                     
-                    if websocket_manager and job_id:
-                        await websocket_manager.send_status_update(
+                    if event_bus and job_id:
+                        event_bus.publish_status(
                             job_id=job_id,
                             status="category_complete",
                             message=f"Completed {task['label']} documents",
@@ -248,12 +269,12 @@ class Enricher:
             total_errors = sum(r.get('errors', 0) for r in results)
 
             # Send final status update
-            if websocket_manager and job_id:
+            if event_bus and job_id:
                 status_message = f"Content enrichment complete. Successfully enriched {total_enriched}/{total_documents} documents"
                 if total_errors > 0:
                     status_message += f". Skipped {total_errors} documents."
                 
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="enrichment_complete",
                     message=status_message,
@@ -266,17 +287,15 @@ class Enricher:
                 )
 
         # Update state with enrichment message
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
+        updates['messages'] = [AIMessage(content="\n".join(msg))]
         
-        return state
+        return updates
 
-    async def run(self, state: ResearchState) -> ResearchState:
+    async def run(self, state: ResearchState) -> Dict[str, Any]:
         try:
             return await self.enrich_data(state)
         except Exception as e:
             # Log the error but don't fail the research process
             print(f"Error in enrichment process: {e}")
-            # Return the original state without any enrichment
-            return state 
\ No newline at end of file
+            # Leave the curated documents unchanged
+            return {} 
\ No newline at end of file
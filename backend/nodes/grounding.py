@@ -5,6 +5,8 @@ from langchain_core.messages import AIMessage
 from tavily import AsyncTavilyClient
 
 from ..classes import InputState, ResearchState
+from ..services.rate_limiter import limiter
+from ..utils.urls import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
@@ -15,18 +17,18 @@ class GroundingNode:
         self.tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 
     async def initial_search(self, state: InputState) -> ResearchState:
-        # Ajouter des logs de débogage pour vérifier le gestionnaire WebSocket
-        if websocket_manager := state.get('websocket_manager'):
-            logger.info("Gestionnaire WebSocket trouvé dans l’état")
+        # Ajouter des logs de débogage pour vérifier le bus d'événements
+        if event_bus := state.get('event_bus'):
+            logger.info("Bus d'événements trouvé dans l’état")
         else:
-            logger.warning("Aucun gestionnaire WebSocket trouvé dans l’état")
+            logger.warning("Aucun bus d'événements trouvé dans l’état")
         
         company = state.get('company', 'Entreprise inconnue')
         msg = f"🎯 Démarrage de la recherche pour {company}...\n"
         
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message=f"🎯 Démarrage de la recherche pour {company}",
@@ -41,9 +43,9 @@ class GroundingNode:
             logger.info(f"Démarrage de l’analyse du site web pour {url}")
             
             # Envoi du statut initial de briefing
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Exploration du site web de l’entreprise",
@@ -52,6 +54,7 @@ class GroundingNode:
 
             try:
                 logger.info("Lancement de l’exploration Tavily")
+                await limiter.acquire('tavily')
                 site_extraction = await self.tavily_client.crawl(
                     url=url, 
                     instructions="Trouver toutes les pages permettant de comprendre les activités de l’entreprise, ses produits, services et autres informations pertinentes.",
@@ -64,7 +67,8 @@ class GroundingNode:
                 for item in site_extraction.get("results", []):
                     if item.get("raw_content"):
                         page_url = item.get("url", url)
-                        site_scrape[page_url] = {
+                        site_scrape[canonicalize_url(page_url)] = {
+                            'url': page_url,
                             'raw_content': item.get('raw_content'),
                             'source': 'site_entreprise'
                         }
@@ -72,9 +76,9 @@ class GroundingNode:
                 if site_scrape:
                     logger.info(f"Exploration réussie de {len(site_scrape)} pages du site web")
                     msg += f"\n✅ Exploration réussie de {len(site_scrape)} pages du site web"
-                    if websocket_manager := state.get('websocket_manager'):
+                    if event_bus := state.get('event_bus'):
                         if job_id := state.get('job_id'):
-                            await websocket_manager.send_status_update(
+                            event_bus.publish_status(
                                 job_id=job_id,
                                 status="processing",
                                 message=f"Exploration réussie de {len(site_scrape)} pages du site web",
@@ -83,9 +87,9 @@ class GroundingNode:
                 else:
                     logger.warning("Aucun contenu trouvé dans les résultats de l’exploration")
                     msg += "\n⚠️ Aucun contenu trouvé lors de l’exploration du site web"
-                    if websocket_manager := state.get('websocket_manager'):
+                    if event_bus := state.get('event_bus'):
                         if job_id := state.get('job_id'):
-                            await websocket_manager.send_status_update(
+                            event_bus.publish_status(
                                 job_id=job_id,
                                 status="processing",
                                 message="⚠️ Aucun contenu trouvé à l’URL fournie",
@@ -97,9 +101,9 @@ class GroundingNode:
                 error_msg = f"⚠️ Erreur lors de l’exploration du contenu du site web : {error_str}"
                 print(error_msg)
                 msg += f"\n{error_msg}"
-                if websocket_manager := state.get('websocket_manager'):
+                if event_bus := state.get('event_bus'):
                     if job_id := state.get('job_id'):
-                        await websocket_manager.send_status_update(
+                        event_bus.publish_status(
                             job_id=job_id,
                             status="website_error",
                             message=error_msg,
@@ -111,9 +115,9 @@ class GroundingNode:
                         )
         else:
             msg += "\n⏩ Aucune URL d’entreprise fournie, passage direct à la phase de recherche"
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Aucune URL d’entreprise fournie, passage direct à la phase de recherche",
@@ -129,19 +133,10 @@ class GroundingNode:
             msg += f"\n🏭 Secteur d’activité : {industry}"
             context_data["industry"] = industry
         
-        # Initialiser le ResearchState avec les informations d’entrée
+        # Ne renvoyer que les champs produits par ce nœud : les champs d’entrée restent dans l’état
         research_state = {
-            # Copier les champs d’entrée
-            "company": state.get('company'),
-            "company_url": state.get('company_url'),
-            "hq_location": state.get('hq_location'),
-            "industry": state.get('industry'),
-            # Initialiser les champs de recherche
             "messages": [AIMessage(content=msg)],
-            "site_scrape": site_scrape,
-            # Passer les informations WebSocket
-            "websocket_manager": state.get('websocket_manager'),
-            "job_id": state.get('job_id')
+            "site_scrape": site_scrape
         }
 
         # Si une erreur s’est produite lors de l’exploration initiale, la stocker dans l’état
@@ -4,11 +4,13 @@ import os
 from datetime import datetime
 from typing import Any, Dict, List
 
-from openai import AsyncOpenAI
 from tavily import AsyncTavilyClient
 
 from ...classes import ResearchState
+from ...services.llm_gateway import gateway
+from ...services.rate_limiter import limiter
 from ...utils.references import clean_title
+from ...utils.urls import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +23,6 @@ class BaseResearcher:
             raise ValueError("Missing API keys")
             
         self.tavily_client = AsyncTavilyClient(api_key=tavily_key)
-        self.openai_client = AsyncOpenAI(api_key=openai_key)
         self.analyst_type = "base_researcher"  # Default type
 
     @property
@@ -34,20 +35,25 @@ class BaseResearcher:
     def analyst_type(self, value: str):
         self._analyst_type = value
 
+    async def tavily_search(self, query: str, **search_params: Any) -> Dict[str, Any]:
+        """Tavily search within the shared provider quota."""
+        await limiter.acquire('tavily')
+        return await self.tavily_client.search(query, **search_params)
+
     async def generate_queries(self, state: Dict, prompt: str) -> List[str]:
         company = state.get("company", "Unknown Company")
         industry = state.get("industry", "Unknown Industry")
         hq = state.get("hq", "Unknown HQ")
         current_year = datetime.now().year
-        websocket_manager = state.get('websocket_manager')
+        event_bus = state.get('event_bus')
         job_id = state.get('job_id')
         
         try:
-            logger.info(f"Generating queries for {company} as {self.analyst_type}")
+            logger.info("Generating queries for %s as %s", company, self.analyst_type)
             
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
+            response = gateway.stream(
+                'queries',
+                [
                     {
                         "role": "system",
                         "content": f"You are researching {company}, a company in the {industry} industry."
@@ -58,26 +64,22 @@ class BaseResearcher:
 {self._format_query_prompt(prompt, company, hq, current_year)}"""
                     }
                 ],
+                job_id=job_id,
                 temperature=0,
-                max_tokens=4096,
-                stream=True
+                max_tokens=4096
             )
             
             queries = []
             current_query = ""
             current_query_number = 1
 
-            async for chunk in response:
-                if chunk.choices[0].finish_reason == "stop":
-                    break
-                    
-                content = chunk.choices[0].delta.content
+            async for content in response:
                 if content:
                     current_query += content
                     
                     # Stream the current state to the UI.
-                    if websocket_manager and job_id:
-                        await websocket_manager.send_status_update(
+                    if event_bus and job_id:
+                        event_bus.publish_status(
                             job_id=job_id,
                             status="query_generating",
                             message="Generating research query",
@@ -98,8 +100,8 @@ class BaseResearcher:
                             query = query.strip()
                             if query:
                                 queries.append(query)
-                                if websocket_manager and job_id:
-                                    await websocket_manager.send_status_update(
+                                if event_bus and job_id:
+                                    event_bus.publish_status(
                                         job_id=job_id,
                                         status="query_generated",
                                         message="Generated new research query",
@@ -116,8 +118,8 @@ class BaseResearcher:
             if current_query.strip():
                 query = current_query.strip()
                 queries.append(query)
-                if websocket_manager and job_id:
-                    await websocket_manager.send_status_update(
+                if event_bus and job_id:
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="query_generated",
                         message="Generated final research query",
@@ -130,21 +132,21 @@ class BaseResearcher:
                     )
                 current_query_number += 1
             
-            logger.info(f"Generated {len(queries)} queries for {self.analyst_type}: {queries}")
+            logger.debug("Generated %d queries for %s: %s", len(queries), self.analyst_type, queries)
 
             if not queries:
                 raise ValueError(f"No queries generated for {company}")
 
             # Limit to at most 4 queries.
             queries = queries[:4]
-            logger.info(f"Final queries for {self.analyst_type}: {queries}")
+            logger.info("Final queries for %s: %s", self.analyst_type, queries)
             
             return queries
             
         except Exception as e:
             logger.error(f"Error generating queries for {company}: {e}")
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="error",
                     message=f"Failed to generate research queries: {str(e)}",
@@ -152,6 +154,15 @@ class BaseResearcher:
                 )
             return []
 
+    def build_update(self, data_field: str, documents: Dict[str, Any], messages: List[Any]) -> Dict[str, Any]:
+        """State delta for an analyst: its documents, its messages and the collector counts."""
+        return {
+            data_field: documents,
+            'messages': messages,
+            'doc_counts': {data_field: len(documents)},
+            'url_categories': {url: [data_field] for url in documents}
+        }
+
     def _format_query_prompt(self, prompt, company, hq, year):
         return f"""{prompt}
 
@@ -169,14 +180,14 @@ class BaseResearcher:
             f"{company} industry analysis {year}"
         ]
 
-    async def search_single_query(self, query: str, websocket_manager=None, job_id=None) -> Dict[str, Any]:
+    async def search_single_query(self, query: str, event_bus=None, job_id=None) -> Dict[str, Any]:
         """Execute a single search query with proper error handling."""
         if not query or len(query.split()) < 3:
             return {}
 
         try:
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="query_searching",
                     message=f"Searching: {query}",
@@ -198,7 +209,7 @@ class BaseResearcher:
             elif self.analyst_type == "financial_analyst":
                 search_params["topic"] = "finance"
 
-            results = await self.tavily_client.search(
+            results = await self.tavily_search(
                 query,
                 **search_params
             )
@@ -208,7 +219,9 @@ class BaseResearcher:
                 if not result.get("content") or not result.get("url"):
                     continue
                     
-                url = result.get("url")
+                # The canonical form only deduplicates; the original URL is fetched and cited
+                url = result["url"].strip()
+                key = canonicalize_url(url)
                 title = result.get("title", "")
                 
                 # Clean up and validate the title using the references module
@@ -218,9 +231,9 @@ class BaseResearcher:
                     if title.lower() == url.lower() or not title.strip():
                         title = ""
                 
-                logger.info(f"Tavily search result for '{query}': URL={url}, Title='{title}'")
+                logger.debug("Tavily search result for '%s': URL=%s, Title='%s'", query, url, title)
                 
-                docs[url] = {
+                docs[key] = {
                     "title": title,
                     "content": result.get("content", ""),
                     "query": query,
@@ -229,8 +242,8 @@ class BaseResearcher:
                     "score": result.get("score", 0.0)
                 }
 
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="query_searched",
                     message=f"Found {len(docs)} results for: {query}",
@@ -245,8 +258,8 @@ class BaseResearcher:
             
         except Exception as e:
             logger.error(f"Error searching query '{query}': {e}")
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="query_error",
                     message=f"Search failed for: {query}",
@@ -262,7 +275,7 @@ class BaseResearcher:
         """
         Execute all Tavily searches in parallel at maximum speed
         """
-        websocket_manager = state.get('websocket_manager')
+        event_bus = state.get('event_bus')
         job_id = state.get('job_id')
 
         if not queries:
@@ -270,8 +283,8 @@ class BaseResearcher:
             return {}
 
         # Send status update for generated queries
-        if websocket_manager and job_id:
-            await websocket_manager.send_status_update(
+        if event_bus and job_id:
+            event_bus.publish_status(
                 job_id=job_id,
                 status="queries_generated",
                 message=f"Generated {len(queries)} queries for {self.analyst_type}",
@@ -295,8 +308,8 @@ class BaseResearcher:
         elif self.analyst_type == "financial_analyst":
             search_params["topic"] = "finance"
 
-        if websocket_manager and job_id:
-            await websocket_manager.send_status_update(
+        if event_bus and job_id:
+            event_bus.publish_status(
                 job_id=job_id,
                 status="search_started",
                 message=f"Using Tavily to search for {len(queries)} queries",
@@ -307,7 +320,7 @@ class BaseResearcher:
             )
         # Create all API calls upfront - direct Tavily client calls without the extra wrapper
         search_tasks = [
-            self.tavily_client.search(query, **search_params)
+            self.tavily_search(query, **search_params)
             for query in queries
         ]
 
@@ -325,7 +338,9 @@ class BaseResearcher:
                 if not item.get("content") or not item.get("url"):
                     continue
                     
-                url = item.get("url")
+                # The canonical form only deduplicates; the original URL is fetched and cited
+                url = item["url"].strip()
+                key = canonicalize_url(url)
                 title = item.get("title", "")
                 
                 if title:
@@ -333,7 +348,7 @@ class BaseResearcher:
                     if title.lower() == url.lower() or not title.strip():
                         title = ""
 
-                merged_docs[url] = {
+                merged_docs[key] = {
                     "title": title,
                     "content": item.get("content", ""),
                     "query": query,
@@ -343,8 +358,8 @@ class BaseResearcher:
                 }
 
         # Send completion status
-        if websocket_manager and job_id:
-            await websocket_manager.send_status_update(
+        if event_bus and job_id:
+            event_bus.publish_status(
                 job_id=job_id,
                 status="search_complete",
                 message=f"Search completed with {len(merged_docs)} documents found",
@@ -26,14 +26,12 @@ class CompanyAnalyzer(BaseResearcher):
 
         # Add message to show subqueries with emojis
         subqueries_msg = "🔍 Subqueries for company analysis:\n" + "\n".join([f"• {query}" for query in queries])
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content=subqueries_msg))
-        state['messages'] = messages
+        messages = [AIMessage(content=subqueries_msg)]
 
     # Send queries through WebSocket
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message="Company analysis queries generated",
@@ -62,9 +60,9 @@ class CompanyAnalyzer(BaseResearcher):
                         company_data[url] = doc
             
             msg.append(f"\n✓ Found {len(company_data)} documents")
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message=f"Used Tavily Search to find {len(company_data)} documents",
@@ -77,16 +75,9 @@ class CompanyAnalyzer(BaseResearcher):
         except Exception as e:
             msg.append(f"\n⚠️ Error during research: {str(e)}")
         
-        # Update state with our findings
-        messages = state.get('messages', [])
+        # Return only our findings; the graph reducers merge them with the other analysts
         messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
-        state['company_data'] = company_data
-        
-        return {
-            'message': msg,
-            'company_data': company_data
-        }
+        return self.build_update('company_data', company_data, messages)
 
     async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.analyze(state) 
\ No newline at end of file
@@ -14,7 +14,7 @@ class FinancialAnalyst(BaseResearcher):
         self.analyst_type = "financial_analyzer"
 
     async def analyze(self, state: ResearchState) -> Dict[str, Any]:
-        websocket_manager = state.get('websocket_manager')
+        event_bus = state.get('event_bus')
         job_id = state.get('job_id')
         
         try:
@@ -30,14 +30,12 @@ class FinancialAnalyst(BaseResearcher):
             
             # Add message to show subqueries with emojis
             subqueries_msg = "🔍 Subqueries for financial analysis:\n" + "\n".join([f"• {query}" for query in queries])
-            messages = state.get('messages', [])
-            messages.append(AIMessage(content=subqueries_msg))
-            state['messages'] = messages
+            messages = [AIMessage(content=subqueries_msg)]
 
             # Send queries through WebSocket
-            if websocket_manager:
+            if event_bus:
                 if job_id:
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message="Financial analysis queries generated",
@@ -65,9 +63,9 @@ class FinancialAnalyst(BaseResearcher):
             # Final status update
             completion_msg = f"Completed analysis with {len(financial_data)} documents"
             
-            if websocket_manager:
+            if event_bus:
                 if job_id:
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message=f"Used Tavily Search to find {len(financial_data)} documents",
@@ -78,14 +76,11 @@ class FinancialAnalyst(BaseResearcher):
                         }
                     )
             
-            # Update state
             messages.append(AIMessage(content=completion_msg))
-            state['messages'] = messages
-            state['financial_data'] = financial_data
 
             # Send completion status with final queries
-            if websocket_manager and job_id:
-                await websocket_manager.send_status_update(
+            if event_bus and job_id:
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message=completion_msg,
@@ -96,19 +91,15 @@ class FinancialAnalyst(BaseResearcher):
                     }
                 )
 
-            return {
-                'message': completion_msg,
-                'financial_data': financial_data,
-                'analyst_type': self.analyst_type,
-                'queries': queries
-            }
+            # Return only our findings; the graph reducers merge them with the other analysts
+            return self.build_update('financial_data', financial_data, messages)
 
         except Exception as e:
             error_msg = f"Financial analysis failed: {str(e)}"
             # Send error status
-            if websocket_manager:
+            if event_bus:
                 if job_id:
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="error",
                         message=error_msg,
@@ -26,14 +26,12 @@ class IndustryAnalyzer(BaseResearcher):
         """)
 
         subqueries_msg = "🔍 Subqueries for industry analysis:\n" + "\n".join([f"• {query}" for query in queries])
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content=subqueries_msg))
-        state['messages'] = messages
+        messages = [AIMessage(content=subqueries_msg)]
 
         # Send queries through WebSocket
-        if websocket_manager := state.get('websocket_manager'):
+        if event_bus := state.get('event_bus'):
             if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
+                event_bus.publish_status(
                     job_id=job_id,
                     status="processing",
                     message="Industry analysis queries generated",
@@ -62,9 +60,9 @@ class IndustryAnalyzer(BaseResearcher):
                         industry_data[url] = doc
             
             msg.append(f"\n✓ Found {len(industry_data)} documents")
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message=f"Used Tavily Search to find {len(industry_data)} documents",
@@ -77,16 +75,9 @@ class IndustryAnalyzer(BaseResearcher):
         except Exception as e:
             msg.append(f"\n⚠️ Error during research: {str(e)}")
         
-        # Update state with our findings
-        messages = state.get('messages', [])
+        # Return only our findings; the graph reducers merge them with the other analysts
         messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
-        state['industry_data'] = industry_data
-        
-        return {
-            'message': msg,
-            'industry_data': industry_data
-        }
+        return self.build_update('industry_data', industry_data, messages)
 
     async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.analyze(state) 
\ No newline at end of file
@@ -24,9 +24,7 @@ class NewsScanner(BaseResearcher):
         """)
 
         subqueries_msg = "🔍 Subqueries for news analysis:\n" + "\n".join([f"• {query}" for query in queries])
-        messages = state.get('messages', [])
-        messages.append(AIMessage(content=subqueries_msg))
-        state['messages'] = messages
+        messages = [AIMessage(content=subqueries_msg)]
         
         news_data = {}
         
@@ -46,9 +44,9 @@ class NewsScanner(BaseResearcher):
                         news_data[url] = doc
             
             msg.append(f"\n✓ Found {len(news_data)} documents")
-            if websocket_manager := state.get('websocket_manager'):
+            if event_bus := state.get('event_bus'):
                 if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
+                    event_bus.publish_status(
                         job_id=job_id,
                         status="processing",
                         message=f"Used Tavily Search to find {len(news_data)} documents",
@@ -61,16 +59,9 @@ class NewsScanner(BaseResearcher):
         except Exception as e:
             msg.append(f"\n⚠️ Error during research: {str(e)}")
         
-        # Update state with our findings
-        messages = state.get('messages', [])
+        # Return only our findings; the graph reducers merge them with the other analysts
         messages.append(AIMessage(content="\n".join(msg)))
-        state['messages'] = messages
-        state['news_data'] = news_data
-        
-        return {
-            'message': msg,
-            'news_data': news_data
-        }
+        return self.build_update('news_data', news_data, messages)
 
     async def run(self, state: ResearchState) -> Dict[str, Any]:
         return await self.analyze(state) 
\ No newline at end of file
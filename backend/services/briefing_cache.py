@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BriefingCache:
+    """SQLite store of generated briefings keyed by a hash of their inputs.
+
+    Entries are evicted least recently used first once the stored text
+    exceeds `max_bytes`. The database is opened on first use. Methods are
+    synchronous; call them from a thread (`asyncio.to_thread`) in async code.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["BriefingCache"]:
+        """The cache configured by BRIEFING_CACHE_PATH and BRIEFING_CACHE_MAX_MB, or None if BRIEFING_CACHE is off."""
+        if os.getenv("BRIEFING_CACHE", "true").lower() != "true":
+            return None
+        return cls(
+            os.getenv("BRIEFING_CACHE_PATH", os.path.join(".cache", "briefings.sqlite3")),
+            max_bytes=int(float(os.getenv("BRIEFING_CACHE_MAX_MB", "50")) * 1024 * 1024)
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if directory := os.path.dirname(self.path):
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS briefings ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(category: str, prompt_version: str, model_name: str, documents: Iterable[str]) -> str:
+        """Hash the category, prompt version, model and the ordered document contents."""
+        digest = hashlib.sha256(f"{category}\0{prompt_version}\0{model_name}".encode('utf-8'))
+        for document in documents:
+            digest.update(b"\0")
+            digest.update(hashlib.sha256(document.encode('utf-8')).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT content FROM briefings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE briefings SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key: str, content: str) -> None:
+        size = len(content.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO briefings (key, content, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now)
+            )
+            self._evict()
+            conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM briefings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM briefings ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM briefings WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug("Cache des briefings : %d entrées évincées", evicted)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared by every job of the process
+briefing_cache = BriefingCache.from_env()
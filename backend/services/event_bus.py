@@ -0,0 +1,463 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class JobEvent(NamedTuple):
+    job_id: str
+    # Position in the job's stream, from 1; clients resume after the last one they saw
+    seq: int
+    type: str
+    data: Dict[str, Any]
+    timestamp: str
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.data.get("status")
+
+    def to_message(self) -> Dict[str, Any]:
+        """The message sent to clients, as broadcast before the bus existed."""
+        return {"type": self.type, "seq": self.seq, "data": self.data, "timestamp": self.timestamp}
+
+
+EventHandler = Callable[[JobEvent], Union[None, Awaitable[None]]]
+
+FINAL_STATUSES = ("completed", "failed")
+
+
+def is_final(event: JobEvent) -> bool:
+    """Whether the event ends its job (the status persisted for it)."""
+    return event.type == "status_update" and event.status in FINAL_STATUSES
+
+
+class Subscription:
+    """A transport attached to the bus, optionally for a single job.
+
+    A plain function is called inline by `publish` and must not block
+    (e.g. an in-memory enqueue). A coroutine function gets a bounded queue
+    drained by its own task, so a slow transport only delays itself;
+    events that do not fit in the queue are dropped and counted, unless
+    the subscription is `lossless` (its queue is then unbounded, so it
+    should take few events). `predicate` filters events before they are
+    queued.
+    """
+
+    def __init__(
+        self, name: str, handler: EventHandler, job_id: Optional[str], max_queue: int, local_only: bool = False,
+        predicate: Optional[Callable[[JobEvent], bool]] = None, lossless: bool = False
+    ):
+        self.name = name
+        self.handler = handler
+        self.job_id = job_id
+        self.local_only = local_only
+        self.predicate = predicate
+        self.lossless = lossless
+        self.max_queue = max_queue
+        self.is_async = inspect.iscoroutinefunction(handler)
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_lag = 0.0
+
+    def offer(self, event: JobEvent) -> None:
+        if self.job_id is not None and event.job_id != self.job_id:
+            return
+        if self.predicate is not None and not self.predicate(event):
+            return
+        if not self.is_async:
+            self._deliver_inline(event)
+            return
+        if self.task is None or self.task.done():
+            self.queue = asyncio.Queue(0 if self.lossless else self.max_queue)
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            self.queue.put_nowait((time.perf_counter(), event))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _deliver_inline(self, event: JobEvent) -> None:
+        try:
+            self.handler(event)
+            self.delivered += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Abonné %s en échec sur l'événement %s : %s", self.name, event.status or event.type, e)
+
+    async def _run(self) -> None:
+        while True:
+            queued_at, event = await self.queue.get()
+            self.max_lag = max(self.max_lag, time.perf_counter() - queued_at)
+            try:
+                await self.handler(event)
+                self.delivered += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Abonné %s en échec sur l'événement %s : %s", self.name, event.status or event.type, e)
+            finally:
+                self.queue.task_done()
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been handled."""
+        if self.queue is not None and self.task is not None and not self.task.done():
+            await self.queue.join()
+
+    def cancel(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "job_id": self.job_id,
+            "inline": not self.is_async,
+            "lossless": self.lossless,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "max_lag": round(self.max_lag, 4),
+        }
+
+
+class JobHistory:
+    """Ring buffer of the latest events of one job."""
+
+    def __init__(self, size: int):
+        self.events: Deque[JobEvent] = deque(maxlen=size)
+
+
+class EventBackend:
+    """Carries job events between worker processes and keeps them for replay.
+
+    `publish` is called for events of jobs run by this process, which the
+    bus has already delivered locally; it must not block. Events published
+    by other processes are passed to the `deliver` callback given to
+    `start`.
+    """
+
+    async def start(self, deliver: Callable[[JobEvent], None]) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, event: JobEvent) -> None:
+        raise NotImplementedError
+
+    async def replay(self, job_id: str, last_seq: int = 0) -> List[JobEvent]:
+        raise NotImplementedError
+
+
+class InProcessBackend(EventBackend):
+    """Single worker: events stay in memory, for the `max_jobs` jobs that published most recently."""
+
+    def __init__(self, replay_size: int = 1000, max_jobs: int = 100):
+        self.replay_size = replay_size
+        self.max_jobs = max_jobs
+        self.history: "OrderedDict[str, JobHistory]" = OrderedDict()
+
+    def publish(self, event: JobEvent) -> None:
+        history = self.history.get(event.job_id)
+        if history is None:
+            history = self.history[event.job_id] = JobHistory(self.replay_size)
+            while len(self.history) > self.max_jobs:
+                self.history.popitem(last=False)
+        else:
+            self.history.move_to_end(event.job_id)
+        history.events.append(event)
+
+    async def replay(self, job_id: str, last_seq: int = 0) -> List[JobEvent]:
+        history = self.history.get(job_id)
+        return [event for event in history.events if event.seq > last_seq] if history else []
+
+
+class SQLiteBackend(EventBackend):
+    """Local broker shared by the workers of one host through a SQLite (WAL) event log.
+
+    Published events are appended in batches by a background task; each
+    worker polls the log every `poll_interval` seconds for events of other
+    workers. Replay reads the log, so any worker can serve any job. Events
+    older than `retention` seconds are deleted.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1, retention: float = 86400.0, replay_size: int = 1000):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.replay_size = replay_size
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[JobEvent, str]] = []
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._last_id = 0
+        self._last_cleanup = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if directory := os.path.dirname(self.path):
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, job_id TEXT NOT NULL, seq INTEGER NOT NULL, "
+                "type TEXT NOT NULL, data TEXT NOT NULL, timestamp TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq)")
+        return self._conn
+
+    @staticmethod
+    def _event(row: tuple) -> JobEvent:
+        job_id, seq, type, data, timestamp = row
+        return JobEvent(job_id, seq, type, json.loads(data), timestamp)
+
+    async def start(self, deliver: Callable[[JobEvent], None]) -> None:
+        def last_id() -> int:
+            with self._lock:
+                return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+        self._last_id = await asyncio.to_thread(last_id)
+        self._poller = asyncio.create_task(self._poll(deliver))
+        logger.info("Bus d'événements partagé via %s (worker %s)", self.path, self.origin)
+
+    async def stop(self) -> None:
+        if self._poller:
+            self._poller.cancel()
+            self._poller = None
+        await self._flush()
+
+    def publish(self, event: JobEvent) -> None:
+        # Serialized here so that one bad payload is skipped alone instead of failing its whole batch
+        try:
+            data = json.dumps(event.data, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(
+                "Événement %s de la tâche %s non partagé (non sérialisable) : %s", event.status or event.type, event.job_id, e
+            )
+            return
+        self._pending.append((event, data))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._flush())
+
+    def _write(self, events: List[Tuple[JobEvent, str]]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO events (origin, job_id, seq, type, data, timestamp, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (self.origin, event.job_id, event.seq, event.type, data, event.timestamp, now)
+                        for event, data in events
+                    ]
+                )
+                if now - self._last_cleanup > 60:
+                    conn.execute("DELETE FROM events WHERE created < ?", (now - self.retention,))
+                    self._last_cleanup = now
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def _flush(self) -> None:
+        """Write every pending event; callers wait for writes already in progress."""
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            while self._pending:
+                events, self._pending = self._pending, []
+                try:
+                    await asyncio.to_thread(self._write, events)
+                except Exception as e:
+                    # Local clients already got these events; only other workers miss them. The
+                    # writer keeps going so that later events are still shared.
+                    logger.warning("Bus d'événements : %d événements non partagés : %s", len(events), e)
+
+    def _read_new(self) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT id, job_id, seq, type, data, timestamp FROM events WHERE id > ? AND origin != ? ORDER BY id LIMIT 1000",
+                (self._last_id, self.origin)
+            ).fetchall()
+
+    async def _poll(self, deliver: Callable[[JobEvent], None]) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await asyncio.to_thread(self._read_new)
+            except sqlite3.Error as e:
+                logger.warning("Bus d'événements indisponible : %s", e)
+                continue
+            for row in rows:
+                self._last_id = max(self._last_id, row[0])
+                deliver(self._event(row[1:]))
+
+    async def replay(self, job_id: str, last_seq: int = 0) -> List[JobEvent]:
+        await self._flush()
+
+        def read() -> List[tuple]:
+            with self._lock:
+                return self._connection().execute(
+                    "SELECT job_id, seq, type, data, timestamp FROM events WHERE job_id = ? AND seq > ? ORDER BY seq DESC LIMIT ?",
+                    (job_id, last_seq, self.replay_size)
+                ).fetchall()
+
+        return [self._event(row) for row in reversed(await asyncio.to_thread(read))]
+
+
+class EventBus:
+    """In-memory bus between pipeline nodes and the transports that report on a job.
+
+    Nodes call `publish`/`publish_status`, which never awaits: each
+    subscriber (WebSocket clients, logs, MongoDB, ...) receives the event
+    on its own, so the pipeline does not depend on how many transports are
+    attached or how slow they are.
+
+    Events are numbered per job by the process running it and handed to a
+    backend, which keeps them for replay to clients connecting late or
+    reconnecting and, unless in-process, delivers them to the subscribers
+    of the other workers.
+    """
+
+    def __init__(self, backend: Optional[EventBackend] = None, max_queue: int = 1000, max_jobs: int = 1000):
+        self.backend = backend or InProcessBackend()
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self.subscriptions: List[Subscription] = []
+        self.published: Counter = Counter()
+        self.received = 0
+        self.sequences: "OrderedDict[str, int]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "EventBus":
+        """EVENT_BACKEND selects "memory" (default, single worker) or "sqlite" (workers of one host)."""
+        replay_size = int(os.getenv("EVENT_REPLAY_SIZE", "1000"))
+        if os.getenv("EVENT_BACKEND", "memory").lower() == "sqlite":
+            backend = SQLiteBackend(
+                os.getenv("EVENT_DB", os.path.join(".cache", "events.sqlite3")),
+                poll_interval=float(os.getenv("EVENT_POLL_INTERVAL", "0.1")),
+                retention=float(os.getenv("EVENT_RETENTION", "86400")),
+                replay_size=replay_size
+            )
+        else:
+            backend = InProcessBackend(replay_size, int(os.getenv("EVENT_REPLAY_JOBS", "100")))
+        return cls(backend, max_queue=int(os.getenv("EVENT_BUS_QUEUE_SIZE", "1000")))
+
+    async def start(self) -> None:
+        await self.backend.start(self._receive)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        # Lossless transports (persistence) finish their queue before the process exits
+        lossless = [subscription.drain() for subscription in self.subscriptions if subscription.lossless]
+        if lossless:
+            try:
+                await asyncio.wait_for(asyncio.gather(*lossless), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Événements non traités à l'arrêt du bus après %.0fs", timeout)
+        await self.backend.stop()
+
+    def subscribe(
+        self, handler: EventHandler, job_id: Optional[str] = None, name: Optional[str] = None, local_only: bool = False,
+        predicate: Optional[Callable[[JobEvent], bool]] = None, lossless: bool = False
+    ) -> Subscription:
+        """Attach a transport to every job, or to `job_id` only.
+
+        A `local_only` transport (e.g. persistence) only gets the events of
+        jobs run by this process, so that each event is handled once.
+        `predicate` and `lossless` are passed to the Subscription.
+        """
+        subscription = Subscription(
+            name or getattr(handler, "__qualname__", repr(handler)), handler, job_id, self.max_queue, local_only,
+            predicate, lossless
+        )
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+        subscription.cancel()
+
+    def _next_seq(self, job_id: str) -> int:
+        seq = self.sequences.pop(job_id, 0) + 1
+        self.sequences[job_id] = seq
+        while len(self.sequences) > self.max_jobs:
+            self.sequences.popitem(last=False)
+        return seq
+
+    def _dispatch(self, event: JobEvent, remote: bool = False) -> None:
+        for subscription in list(self.subscriptions):
+            if not (remote and subscription.local_only):
+                subscription.offer(event)
+
+    def _receive(self, event: JobEvent) -> None:
+        """Event of a job running in another worker."""
+        self.received += 1
+        self._dispatch(event, remote=True)
+
+    def publish(self, job_id: str, type: str, data: Dict[str, Any]) -> JobEvent:
+        event = JobEvent(job_id, self._next_seq(job_id), type, data, datetime.now().isoformat())
+        self.published[event.status or event.type] += 1
+        self._dispatch(event)
+        self.backend.publish(event)
+        return event
+
+    def publish_status(self, job_id: str, status: str, message: str = None, error: str = None, result: dict = None) -> JobEvent:
+        """Publish a status update, the event type every node reports progress with."""
+        return self.publish(job_id, "status_update", {
+            "status": status,
+            "message": message,
+            "error": error,
+            "result": result
+        })
+
+    async def replay(self, job_id: str, last_seq: int = 0) -> List[JobEvent]:
+        """Kept events of a job after `last_seq`, oldest first."""
+        events = await self.backend.replay(job_id, last_seq)
+        if events and events[0].seq > last_seq + 1:
+            logger.info(
+                "Relecture incomplète pour la tâche %s : événements %d à %d plus disponibles",
+                job_id, last_seq + 1, events[0].seq - 1
+            )
+        return events
+
+    async def last_status(self, job_id: str, status: str) -> Optional[JobEvent]:
+        """Latest kept status update of a job with the given status, e.g. its final report."""
+        for event in reversed(await self.replay(job_id)):
+            if event.status == status:
+                return event
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "published": dict(self.published),
+            "received": self.received,
+            "subscriptions": [subscription.snapshot() for subscription in self.subscriptions],
+        }
+
+
+def log_event(event: JobEvent) -> None:
+    """Log transport; records are written by the background logging listener."""
+    logger.debug("Événement %s pour la tâche %s : %.300s", event.status or event.type, event.job_id, event.data)
+
+
+# Shared by every job of the process
+event_bus = EventBus.from_env()
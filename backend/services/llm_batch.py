@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import uuid
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from ..utils.packing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def window_seconds(window: str) -> float:
+    """Seconds of a batch completion window such as "24h"."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return float(window[:-1]) * units[window[-1]] if window[-1:] in units else float(window)
+
+
+class BatchRequest(NamedTuple):
+    custom_id: str
+    provider: str
+    model: str
+    messages: List[Dict[str, str]]
+    params: Dict[str, Any]
+
+
+class BatchBackend:
+    """Runs a list of requests as one batch; returns a result or an exception per custom_id."""
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class LocalBatchBackend(BatchBackend):
+    """Stand-in for a provider batch API: runs the requests on the regular providers.
+
+    `providers` maps a provider name to an LLMProvider; `delay` simulates
+    the batch turnaround. Since the calls hit the interactive endpoints,
+    each one takes its share of the `limiter` quotas and is bounded by
+    `timeout`.
+    """
+
+    def __init__(
+        self, providers: Dict[str, Any], concurrency: int = 4, delay: float = 0.0,
+        timeout: float = 120.0, limiter: Optional[Any] = None
+    ):
+        self.providers = providers
+        self.concurrency = concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.limiter = limiter
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        await asyncio.sleep(self.delay)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(request: BatchRequest) -> Any:
+            async with semaphore:
+                try:
+                    if self.limiter:
+                        prompt = "\n\n".join(message.get("content", "") for message in request.messages)
+                        await self.limiter.acquire(request.provider, tokens=estimate_tokens(prompt))
+                    result = await asyncio.wait_for(
+                        self.providers[request.provider].complete(request.model, request.messages, **request.params),
+                        timeout=self.timeout
+                    )
+                    if self.limiter:
+                        await self.limiter.debit(request.provider, result.output_tokens)
+                    return result
+                except Exception as e:
+                    return e
+
+        results = await asyncio.gather(*[run_one(request) for request in requests])
+        return {request.custom_id: result for request, result in zip(requests, results)}
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API: upload a JSONL file, create the batch, poll, then read the output file.
+
+    A batch still running after `timeout` seconds (default: the completion
+    window) is cancelled, as is the batch of a cancelled run, so that no
+    remote work outlives the jobs waiting for it.
+    """
+
+    def __init__(
+        self, client: Any, poll_interval: float = 30.0, completion_window: str = "24h", timeout: Optional[float] = None
+    ):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.timeout = timeout or window_seconds(completion_window)
+
+    async def _cancel(self, batch_id: str) -> None:
+        try:
+            await self.client.batches.cancel(batch_id)
+            logger.warning("Lot OpenAI %s annulé", batch_id)
+        except Exception as e:
+            logger.warning("Annulation du lot OpenAI %s impossible : %s", batch_id, e)
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        from .llm_gateway import LLMResult
+
+        lines = [
+            json.dumps({
+                "custom_id": request.custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": request.model, "messages": request.messages, **request.params},
+            }, ensure_ascii=False)
+            for request in requests
+        ]
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        logger.info("Lot OpenAI %s soumis (%d requêtes)", batch.id, len(requests))
+        deadline = time.monotonic() + self.timeout
+        try:
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                if time.monotonic() >= deadline:
+                    await self._cancel(batch.id)
+                    error = asyncio.TimeoutError(f"Lot OpenAI {batch.id} non terminé après {self.timeout:.0f}s")
+                    return {request.custom_id: error for request in requests}
+                await asyncio.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+                batch = await self.client.batches.retrieve(batch.id)
+        except asyncio.CancelledError:
+            await self._cancel(batch.id)
+            raise
+        if batch.status != "completed" or not batch.output_file_id:
+            error = RuntimeError(f"Lot OpenAI {batch.id} terminé avec le statut {batch.status}")
+            return {request.custom_id: error for request in requests}
+
+        output = await self.client.files.content(batch.output_file_id)
+        results: Dict[str, Any] = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                results[item["custom_id"]] = RuntimeError(str(item.get("error") or response.get("body")))
+                continue
+            body = response["body"]
+            text = body["choices"][0]["message"]["content"] or ""
+            usage = body.get("usage") or {}
+            results[item["custom_id"]] = LLMResult(
+                text,
+                usage.get("prompt_tokens") or 0,
+                usage.get("completion_tokens") or estimate_tokens(text)
+            )
+        for request in requests:
+            results.setdefault(request.custom_id, RuntimeError(f"Aucun résultat pour {request.custom_id} dans le lot {batch.id}"))
+        return results
+
+
+class BatchQueue:
+    """Collects non-interactive requests from every job and submits them in batches.
+
+    A batch per provider and model (provider batch files take a single
+    model) is sent when `max_size` requests are waiting or `window` seconds
+    after the first one. Each caller awaits its own
+    future, so the result resumes the job that asked for it.
+    """
+
+    def __init__(self, backend_for: Callable[[str], BatchBackend], max_size: int = 50, window: float = 5.0):
+        self.backend_for = backend_for
+        self.max_size = max_size
+        self.window = window
+        self._pending: Dict[Tuple[str, str], List[tuple]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+
+    async def submit(self, provider: str, model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        request = BatchRequest(uuid.uuid4().hex, provider, model, messages, params)
+        group = (provider, model)
+        pending = self._pending.setdefault(group, [])
+        pending.append((request, future))
+        if len(pending) >= self.max_size:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = asyncio.create_task(self._flush_later(group))
+        return await future
+
+    async def _flush_later(self, group: Tuple[str, str]) -> None:
+        await asyncio.sleep(self.window)
+        self._timers.pop(group, None)
+        self._flush(group)
+
+    def _flush(self, group: Tuple[str, str]) -> None:
+        if timer := self._timers.pop(group, None):
+            if timer is not asyncio.current_task():
+                timer.cancel()
+        entries = self._pending.pop(group, [])
+        if entries:
+            task = asyncio.create_task(self._run(group[0], entries))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, provider: str, entries: List[tuple]) -> None:
+        self.batches_sent += 1
+        logger.info("Envoi d'un lot de %d requêtes %s", len(entries), provider)
+        try:
+            results = await self.backend_for(provider).run([request for request, _ in entries])
+        except Exception as e:
+            results = {request.custom_id: e for request, _ in entries}
+        for request, future in entries:
+            if future.done():
+                continue
+            result = results.get(request.custom_id)
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "waiting": sum(len(entries) for entries in self._pending.values()),
+            "batches_sent": self.batches_sent,
+        }
@@ -0,0 +1,455 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set
+
+from ..utils.packing import estimate_tokens
+from .llm_batch import BatchBackend, BatchQueue, LocalBatchBackend, OpenAIBatchBackend, window_seconds
+from .llm_router import LLMRouter, router as default_router
+from .rate_limiter import RateLimiter, limiter as default_limiter
+
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+
+
+class LLMResult(NamedTuple):
+    text: str
+    input_tokens: int
+    output_tokens: int
+
+
+def _prompt_text(messages: Messages) -> str:
+    return "\n\n".join(message.get("content", "") for message in messages)
+
+
+async def _close(iterator: Any) -> None:
+    if aclose := getattr(iterator, "aclose", None):
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug("Fermeture du flux impossible : %s", e)
+
+
+class LLMProvider:
+    """Interface of a model provider: one completion, or a stream of text deltas."""
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> LLMResult:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: Messages, **params: Any) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, client: Any = None, api_key: Optional[str] = None):
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key)
+        self.client = client
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> LLMResult:
+        response = await self.client.chat.completions.create(model=model, messages=messages, stream=False, **params)
+        text = response.choices[0].message.content or ""
+        usage = getattr(response, "usage", None)
+        return LLMResult(
+            text,
+            getattr(usage, "prompt_tokens", None) or estimate_tokens(_prompt_text(messages)),
+            getattr(usage, "completion_tokens", None) or estimate_tokens(text)
+        )
+
+    async def stream(self, model: str, messages: Messages, **params: Any) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].finish_reason == "stop":
+                break
+            if text := chunk.choices[0].delta.content:
+                yield text
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini models; system and user messages are sent as one prompt."""
+
+    def __init__(self, model_factory: Optional[Callable[[str], Any]] = None, api_key: Optional[str] = None):
+        if model_factory is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model_factory = genai.GenerativeModel
+        self.model_factory = model_factory
+        self._models: Dict[str, Any] = {}
+
+    def _model(self, name: str) -> Any:
+        if name not in self._models:
+            self._models[name] = self.model_factory(name)
+        return self._models[name]
+
+    @staticmethod
+    def _generation_config(params: Dict[str, Any]) -> Dict[str, Any]:
+        config = {}
+        if "temperature" in params:
+            config["temperature"] = params["temperature"]
+        if "max_tokens" in params:
+            config["max_output_tokens"] = params["max_tokens"]
+        return {"generation_config": config} if config else {}
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> LLMResult:
+        prompt = _prompt_text(messages)
+        response = await self._model(model).generate_content_async(prompt, **self._generation_config(params))
+        text = response.text
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(
+            text,
+            getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt),
+            getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+        )
+
+    async def stream(self, model: str, messages: Messages, **params: Any) -> AsyncIterator[str]:
+        response = await self._model(model).generate_content_async(
+            _prompt_text(messages), stream=True, **self._generation_config(params)
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. safety or finish metadata)
+                continue
+            if text:
+                yield text
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic local provider for tests and benchmarks.
+
+    The answer depends only on the model and the prompt, and `delay`
+    seconds of simulated latency are spread over the response.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def _answer(self, model: str, messages: Messages) -> str:
+        digest = hashlib.sha256(f"{model}\0{_prompt_text(messages)}".encode("utf-8")).hexdigest()
+        return "\n".join(f"* Fait {i + 1} ({digest[i * 8:(i + 1) * 8]})" for i in range(4))
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> LLMResult:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        text = self._answer(model, messages)
+        return LLMResult(text, estimate_tokens(_prompt_text(messages)), estimate_tokens(text))
+
+    async def stream(self, model: str, messages: Messages, **params: Any) -> AsyncIterator[str]:
+        self.calls += 1
+        lines = self._answer(model, messages).split("\n")
+        for i, line in enumerate(lines):
+            await asyncio.sleep(self.delay / len(lines))
+            yield line if i == len(lines) - 1 else line + "\n"
+
+
+class LLMGateway:
+    """Single entry point for LLM calls of every stage.
+
+    A call is routed by the LLMRouter to a provider/model of its stage,
+    retried with exponential backoff on the same route (`retries` times)
+    before the router fails over, and bounded by `timeout` per attempt
+    (for streams: until the first chunk, then between chunks). Rate-limiter
+    waits happen before the router times a route and are bounded by
+    `quota_timeout`. Calls of
+    batch jobs are bounded by `batch_timeout` as a whole. Responses
+    are cached in memory on a hash of the stage, messages and parameters,
+    and token counts and latency are accounted per job and stage.
+    """
+
+    def __init__(
+        self,
+        router: LLMRouter,
+        limiter: Optional[RateLimiter] = None,
+        cache_size: int = 256,
+        retries: int = 1,
+        backoff: float = 0.5,
+        timeout: float = 120.0,
+        quota_timeout: float = 60.0,
+        batch_timeout: float = 86400.0 + 600.0,
+        fake: bool = False,
+        max_jobs: int = 500
+    ):
+        self.router = router
+        # Shared provider quotas, consulted before every interactive call
+        self.limiter = limiter
+        self.providers: Dict[str, LLMProvider] = {}
+        self.cache_size = cache_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Longest wait for rate-limiter quota before a route is given up
+        self.quota_timeout = quota_timeout
+        # Last resort for a batch job's call (window, turnaround and calls); provider batches
+        # stop at their own deadline, cancelling the remote batch, before this one
+        self.batch_timeout = batch_timeout
+        # Send every call to the fake provider, whatever the configured routes
+        self.fake = fake
+        self.max_jobs = max_jobs
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.usage: "OrderedDict[str, Dict[str, Dict[str, float]]]" = OrderedDict()
+        # Jobs whose calls are queued into provider batches instead of sent interactively
+        self.batch_jobs: Set[str] = set()
+        self.batch_backends: Dict[str, BatchBackend] = {}
+        self.batch_queue = BatchQueue(self._batch_backend)
+
+    @classmethod
+    def from_env(cls, router: LLMRouter, limiter: Optional[RateLimiter] = None) -> "LLMGateway":
+        completion_window = os.getenv("LLM_BATCH_COMPLETION_WINDOW", "24h")
+        gateway = cls(
+            router,
+            limiter,
+            cache_size=int(os.getenv("LLM_CACHE_SIZE", "256")),
+            retries=int(os.getenv("LLM_RETRIES", "1")),
+            backoff=float(os.getenv("LLM_BACKOFF", "0.5")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+            quota_timeout=float(os.getenv("LLM_QUOTA_TIMEOUT", "60")),
+            # The completion window plus time to queue, poll and download the batch
+            batch_timeout=float(os.getenv("LLM_BATCH_TIMEOUT", window_seconds(completion_window) + 600)),
+            fake=os.getenv("LLM_FAKE", "false").lower() == "true"
+        )
+        gateway.register("fake", FakeProvider(delay=float(os.getenv("LLM_FAKE_DELAY", "0"))))
+        gateway.batch_queue.max_size = int(os.getenv("LLM_BATCH_MAX_SIZE", "50"))
+        gateway.batch_queue.window = float(os.getenv("LLM_BATCH_WINDOW", "5"))
+        if openai_key := os.getenv("OPENAI_API_KEY"):
+            gateway.register("openai", OpenAIProvider(api_key=openai_key))
+            if os.getenv("LLM_BATCH_BACKEND", "local").lower() == "openai":
+                gateway.batch_backends["openai"] = OpenAIBatchBackend(
+                    gateway.providers["openai"].client,
+                    poll_interval=float(os.getenv("LLM_BATCH_POLL_INTERVAL", "30")),
+                    completion_window=completion_window
+                )
+        if gemini_key := os.getenv("GEMINI_API_KEY"):
+            gateway.register("gemini", GeminiProvider(api_key=gemini_key))
+        return gateway
+
+    def register(self, name: str, provider: LLMProvider) -> None:
+        self.providers[name] = provider
+
+    def _provider(self, name: str) -> LLMProvider:
+        return self.providers["fake" if self.fake else name]
+
+    def _batch_backend(self, provider: str) -> BatchBackend:
+        # Providers without a batch API (and tests) use the local stand-in
+        if provider not in self.batch_backends:
+            self.batch_backends[provider] = LocalBatchBackend(
+                self.providers, timeout=self.timeout, limiter=None if self.fake else self.limiter
+            )
+        return self.batch_backends[provider]
+
+    async def _acquire(self, provider: str, messages: Messages) -> None:
+        # Prompt tokens up front; the completion is charged once known. Retries of a
+        # failed call on the same route reuse this quota.
+        if self.limiter and not self.fake:
+            await asyncio.wait_for(
+                self.limiter.acquire(provider, tokens=estimate_tokens(_prompt_text(messages))),
+                timeout=self.quota_timeout
+            )
+
+    async def _debit(self, provider: str, tokens: int) -> None:
+        if self.limiter and not self.fake:
+            await self.limiter.debit(provider, tokens)
+
+    def _allowed(self) -> Optional[List[str]]:
+        # In fake mode any configured route is served by the fake provider
+        return None if self.fake else list(self.providers)
+
+    @staticmethod
+    def _cache_key(stage: str, messages: Messages, params: Dict[str, Any]) -> str:
+        payload = json.dumps([stage, messages, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        return None
+
+    def _cache_put(self, key: str, text: str) -> None:
+        if not self.cache_size or not text:
+            return
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _account(
+        self, job_id: Optional[str], stage: str, input_tokens: int, output_tokens: int,
+        latency: float, cached: bool = False
+    ) -> None:
+        job = job_id or "-"
+        if job not in self.usage:
+            self.usage[job] = {}
+            while len(self.usage) > self.max_jobs:
+                self.usage.popitem(last=False)
+        stats = self.usage[job].setdefault(
+            stage, {"calls": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0, "latency": 0.0}
+        )
+        stats["calls"] += 1
+        stats["cached"] += int(cached)
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["latency"] = round(stats["latency"] + latency, 3)
+
+    async def _with_retries(self, stage: str, provider: str, model: str, attempt: Callable[[], Any]) -> Any:
+        for retry in range(self.retries + 1):
+            try:
+                return await attempt()
+            except Exception as e:
+                if retry == self.retries:
+                    raise
+                delay = self.backoff * (2 ** retry) * (0.5 + random.random() / 2)
+                logger.warning(
+                    "Appel %s:%s (%s) en échec, nouvel essai dans %.1fs : %s", provider, model, stage, delay, e
+                )
+                await asyncio.sleep(delay)
+
+    async def complete(
+        self, stage: str, messages: Messages, job_id: Optional[str] = None,
+        timeout: Optional[float] = None, cache: bool = True,
+        on_route: Optional[Callable[[str, str], None]] = None, **params: Any
+    ) -> str:
+        """Return the full response text for a stage.
+
+        `on_route` is called with the provider and model that served the
+        call; it is not called on cache hits.
+        """
+        started = time.perf_counter()
+        key = self._cache_key(stage, messages, params)
+        if cache and (text := self._cache_get(key)) is not None:
+            self._account(job_id, stage, 0, 0, time.perf_counter() - started, cached=True)
+            return text
+
+        async def invoke(provider: str, model: str) -> LLMResult:
+            async def attempt() -> LLMResult:
+                return await asyncio.wait_for(
+                    self._provider(provider).complete(model, messages, **params),
+                    timeout=timeout or self.timeout
+                )
+
+            result = await self._with_retries(stage, provider, model, attempt)
+            await self._debit(provider, result.output_tokens)
+            if on_route:
+                on_route(provider, model)
+            return result
+
+        if job_id in self.batch_jobs:
+            # No latency objective for batch jobs: the preferred route of the stage, a generous timeout
+            provider, model = self.router.primary(stage)
+            result = await asyncio.wait_for(
+                self.batch_queue.submit("fake" if self.fake else provider, model, messages, params),
+                timeout=self.batch_timeout
+            )
+            if on_route:
+                on_route(provider, model)
+        else:
+            result = await self.router.call(
+                stage, invoke, providers=self._allowed(), job_id=job_id,
+                acquire=lambda provider: self._acquire(provider, messages)
+            )
+        self._account(job_id, stage, result.input_tokens, result.output_tokens, time.perf_counter() - started)
+        if cache:
+            self._cache_put(key, result.text)
+        return result.text
+
+    async def stream(
+        self, stage: str, messages: Messages, job_id: Optional[str] = None,
+        timeout: Optional[float] = None, cache: bool = True,
+        on_route: Optional[Callable[[str, str], None]] = None, **params: Any
+    ) -> AsyncIterator[str]:
+        """Yield the response text of a stage as it is generated.
+
+        Routing, retries and failover apply until the first chunk arrives,
+        and `on_route` is then called as for `complete`. Batch jobs get the
+        whole text as a single chunk.
+        """
+        if job_id in self.batch_jobs:
+            yield await self.complete(
+                stage, messages, job_id=job_id, timeout=timeout, cache=cache, on_route=on_route, **params
+            )
+            return
+        started = time.perf_counter()
+        timeout = timeout or self.timeout
+        key = self._cache_key(stage, messages, params)
+        if cache and (text := self._cache_get(key)) is not None:
+            self._account(job_id, stage, 0, 0, time.perf_counter() - started, cached=True)
+            yield text
+            return
+
+        async def invoke(provider: str, model: str):
+            async def open_stream():
+                iterator = self._provider(provider).stream(model, messages, **params).__aiter__()
+                try:
+                    first = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    first = ""
+                except BaseException:
+                    await _close(iterator)
+                    raise
+                return iterator, first, provider, model
+
+            return await self._with_retries(stage, provider, model, open_stream)
+
+        iterator, first, provider, model = await self.router.call(
+            stage, invoke, providers=self._allowed(), job_id=job_id,
+            acquire=lambda provider: self._acquire(provider, messages)
+        )
+        if on_route:
+            on_route(provider, model)
+        parts = []
+        try:
+            if first:
+                parts.append(first)
+                yield first
+                while True:
+                    try:
+                        text = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    parts.append(text)
+                    yield text
+        finally:
+            # Also on a timeout or when the consumer stops early: release the provider's connection
+            await _close(iterator)
+
+        full_text = "".join(parts)
+        await self._debit(provider, estimate_tokens(full_text))
+        self._account(
+            job_id, stage, estimate_tokens(_prompt_text(messages)), estimate_tokens(full_text),
+            time.perf_counter() - started
+        )
+        if cache:
+            self._cache_put(key, full_text)
+
+    def job_usage(self, job_id: str) -> Dict[str, Any]:
+        """Token and latency totals of a job, per stage and overall."""
+        stages = self.usage.get(job_id, {})
+        total = {"calls": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0, "latency": 0.0}
+        for stats in stages.values():
+            for field in total:
+                total[field] += stats[field]
+        total["latency"] = round(total["latency"], 3)
+        return {"stages": stages, "total": total}
+
+    def snapshot(self, last_jobs: int = 20) -> Dict[str, Any]:
+        return {
+            "providers": list(self.providers),
+            "fake": self.fake,
+            "cache_entries": len(self._cache),
+            "batch": self.batch_queue.snapshot(),
+            "jobs": {job_id: self.job_usage(job_id) for job_id in list(self.usage)[-last_jobs:]},
+        }
+
+
+# Shared by every job of the process
+gateway = LLMGateway.from_env(default_router, default_limiter)
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Equivalent models per pipeline stage, in order of preference ("provider:model")
+DEFAULT_ROUTES = {
+    'queries': ["openai:gpt-4.1-mini", "openai:gpt-4o-mini"],
+    'briefing': ["gemini:gemini-2.5-flash", "gemini:gemini-2.0-flash"],
+    'compile': ["openai:gpt-4.1", "openai:gpt-4o"],
+    'sweep': ["openai:gpt-4.1-mini", "openai:gpt-4o-mini"],
+}
+
+# Latency objective (seconds) per stage
+DEFAULT_SLOS = {
+    'queries': 10.0,
+    'briefing': 60.0,
+    'compile': 90.0,
+    'sweep': 60.0,
+}
+
+Route = Tuple[str, str]
+
+
+def parse_routes(value: str) -> List[Route]:
+    """Parse "provider:model,provider:model" into (provider, model) pairs."""
+    routes = []
+    for part in value.split(","):
+        provider, _, model = part.strip().partition(":")
+        if provider and model:
+            routes.append((provider, model))
+    return routes
+
+
+class RouteStats:
+    """Rolling latency and error samples for one provider/model."""
+
+    def __init__(self, window: int, max_age: float):
+        self.samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window)
+        self.max_age = max_age
+
+    def add(self, latency: float, ok: bool) -> None:
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        # Old samples expire so that a demoted route is tried again later
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def summary(self) -> Dict[str, Any]:
+        recent = self._recent()
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+        return {
+            "samples": len(recent),
+            "error_rate": errors / len(recent) if recent else 0.0,
+            "p50": latencies[len(latencies) // 2] if latencies else None,
+            "p90": latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))] if latencies else None,
+        }
+
+
+class LLMRouter:
+    """Pick a model per stage from rolling latency and error rates, with failover.
+
+    Routes of a stage are tried in configured order, except that a route
+    whose p90 latency exceeds the stage SLO or whose error rate exceeds
+    `max_error_rate` (once it has `min_samples`) moves behind the healthy
+    ones. A failed call falls through to the next route. Every decision is
+    kept in `decisions`.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, List[Route]]] = None,
+        slos: Optional[Dict[str, float]] = None,
+        window: int = 50,
+        max_age: float = 600.0,
+        min_samples: int = 3,
+        max_error_rate: float = 0.3,
+        max_decisions: int = 500
+    ):
+        self.routes = routes or {stage: parse_routes(",".join(value)) for stage, value in DEFAULT_ROUTES.items()}
+        self.slos = slos or dict(DEFAULT_SLOS)
+        self.window = window
+        self.max_age = max_age
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.stats: Dict[Route, RouteStats] = {}
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=max_decisions)
+
+    @classmethod
+    def from_env(cls) -> "LLMRouter":
+        """Build a router, overriding stages with LLM_ROUTES_<STAGE> and LLM_SLO_<STAGE>."""
+        routes = {}
+        slos = {}
+        for stage, default in DEFAULT_ROUTES.items():
+            value = os.getenv(f"LLM_ROUTES_{stage.upper()}", ",".join(default))
+            routes[stage] = parse_routes(value)
+            if not routes[stage]:
+                raise ValueError(
+                    f"LLM_ROUTES_{stage.upper()}={value!r} ne contient aucune route "
+                    f"(format attendu : \"provider:model,provider:model\")"
+                )
+            slos[stage] = float(os.getenv(f"LLM_SLO_{stage.upper()}", DEFAULT_SLOS[stage]))
+        return cls(
+            routes=routes,
+            slos=slos,
+            window=int(os.getenv("LLM_ROUTER_WINDOW", "50")),
+            max_age=float(os.getenv("LLM_ROUTER_MAX_AGE", "600")),
+            max_error_rate=float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.3"))
+        )
+
+    def _stats(self, route: Route) -> RouteStats:
+        if route not in self.stats:
+            self.stats[route] = RouteStats(self.window, self.max_age)
+        return self.stats[route]
+
+    def record(self, provider: str, model: str, latency: float, ok: bool) -> None:
+        self._stats((provider, model)).add(latency, ok)
+
+    def primary(self, stage: str) -> Route:
+        return self.routes[stage][0]
+
+    def candidates(self, stage: str, providers: Optional[Iterable[str]] = None) -> List[Tuple[Route, str]]:
+        """Routes to try for a stage, in order, each with the reason it is placed there."""
+        allowed = set(providers) if providers else None
+        slo = self.slos.get(stage)
+        healthy, degraded = [], []
+        for route in self.routes.get(stage, []):
+            if allowed is not None and route[0] not in allowed:
+                continue
+            summary = self._stats(route).summary()
+            if summary["samples"] >= self.min_samples and summary["error_rate"] > self.max_error_rate:
+                degraded.append((summary["error_rate"], summary["p90"] or 0.0, route, "error_rate"))
+            elif slo and summary["p90"] is not None and summary["p90"] > slo:
+                degraded.append((summary["error_rate"], summary["p90"], route, "slo"))
+            else:
+                healthy.append((route, "preferred"))
+        degraded.sort(key=lambda d: (d[0], d[1]))
+        return healthy + [(route, reason) for _, _, route, reason in degraded]
+
+    async def call(
+        self,
+        stage: str,
+        invoke: Callable[[str, str], Awaitable[Any]],
+        providers: Optional[Iterable[str]] = None,
+        job_id: Optional[str] = None,
+        acquire: Optional[Callable[[str], Awaitable[Any]]] = None
+    ) -> Any:
+        """Run `invoke(provider, model)` on the best route of a stage, failing over on errors.
+
+        `acquire(provider)` (e.g. a rate-limiter wait) runs before each route
+        is timed, so that quota waits do not count as provider latency. If it
+        times out, the routes of that provider are skipped without being
+        penalized.
+        """
+        candidates = self.candidates(stage, providers)
+        if not candidates:
+            raise ValueError(f"Aucun modèle configuré pour l'étape {stage}")
+
+        last_error: Optional[BaseException] = None
+        exhausted = set()
+        for attempt, ((provider, model), reason) in enumerate(candidates):
+            if provider in exhausted:
+                continue
+            if acquire:
+                try:
+                    await acquire(provider)
+                except asyncio.TimeoutError as e:
+                    logger.warning("Quota %s indisponible pour l'étape %s, routes suivantes", provider, stage)
+                    exhausted.add(provider)
+                    last_error = e
+                    continue
+            started = time.perf_counter()
+            try:
+                result = await invoke(provider, model)
+            except Exception as e:
+                latency = time.perf_counter() - started
+                self.record(provider, model, latency, False)
+                self._decide(stage, provider, model, reason, attempt, latency, job_id, error=str(e))
+                logger.warning("Échec de %s:%s pour l'étape %s (%s), bascule", provider, model, stage, e)
+                last_error = e
+                continue
+            latency = time.perf_counter() - started
+            self.record(provider, model, latency, True)
+            self._decide(stage, provider, model, reason, attempt, latency, job_id)
+            return result
+        raise last_error
+
+    def _decide(
+        self, stage: str, provider: str, model: str, reason: str, attempt: int,
+        latency: float, job_id: Optional[str], error: Optional[str] = None
+    ) -> None:
+        decision = {
+            "time": time.time(),
+            "job_id": job_id,
+            "stage": stage,
+            "provider": provider,
+            "model": model,
+            "reason": reason if attempt == 0 else "failover",
+            "attempt": attempt,
+            "latency": round(latency, 3),
+            "ok": error is None,
+        }
+        if error:
+            decision["error"] = error[:200]
+        self.decisions.append(decision)
+        logger.info(
+            "Routage %s -> %s:%s (%s, tentative %d, %.2fs)",
+            stage, provider, model, decision["reason"], attempt, latency
+        )
+
+    def snapshot(self, last: int = 50) -> Dict[str, Any]:
+        """Current route statistics and the most recent decisions."""
+        return {
+            "routes": {
+                stage: [
+                    {"provider": provider, "model": model, **self._stats((provider, model)).summary()}
+                    for provider, model in routes
+                ]
+                for stage, routes in self.routes.items()
+            },
+            "slos": self.slos,
+            "decisions": list(self.decisions)[-last:],
+        }
+
+
+# Shared by every job of the process so statistics survive across graphs
+router = LLMRouter.from_env()
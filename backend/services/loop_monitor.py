@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopMonitor:
+    """Measure event-loop blocking as the lateness of a periodic timer.
+
+    Every `interval` seconds a task sleeps and records how much later than
+    requested it was woken up. Lag above `warn_threshold` means some
+    coroutine held the loop (e.g. a synchronous SDK call) and is logged.
+    """
+
+    def __init__(self, interval: float = 0.1, warn_threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.blocked_events = 0
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples += 1
+            self.last_lag = lag
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.warn_threshold:
+                self.blocked_events += 1
+                logger.warning("Boucle d'événements bloquée pendant %.3fs", lag)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current statistics, in seconds."""
+        return {
+            "samples": self.samples,
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "mean_lag": round(self.total_lag / self.samples, 4) if self.samples else 0.0,
+            "blocked_events": self.blocked_events,
+            "warn_threshold": self.warn_threshold,
+        }
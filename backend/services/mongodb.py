@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 from typing import Any, Dict, Optional
 
@@ -63,4 +64,13 @@ class MongoDBService:
 
     def get_report(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a report by job ID."""
-        return self.reports.find_one({"job_id": job_id}) 
\ No newline at end of file
+        return self.reports.find_one({"job_id": job_id}) 
+
+    async def record_event(self, event) -> None:
+        """Event bus transport: persist the final status of a job, and its report."""
+        if event.type != "status_update" or event.status not in ("completed", "failed"):
+            return
+        await asyncio.to_thread(self.update_job, job_id=event.job_id, status=event.status, error=event.data.get("error"))
+        report = (event.data.get("result") or {}).get("report")
+        if event.status == "completed" and report:
+            await asyncio.to_thread(self.store_report, job_id=event.job_id, report_data={"report": report})
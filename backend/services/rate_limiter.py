@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("tavily", "openai", "gemini")
+
+
+class RateLimiter:
+    """Token buckets per provider, shared by every worker process through SQLite (WAL).
+
+    `limits` maps (provider, kind) to a per-minute quota, kind being
+    "requests" or "tokens". Each bucket holds up to one minute of quota and
+    refills continuously. `acquire` takes one request and the given tokens,
+    sleeping until the buckets allow it; `debit` charges tokens known only
+    after the call (e.g. the completion), possibly going negative so that
+    later calls wait.
+    """
+
+    def __init__(self, path: str, limits: Dict[Tuple[str, str], float]):
+        self.path = path
+        self.limits = {key: per_minute for key, per_minute in limits.items() if per_minute > 0}
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Quotas come from RATE_LIMIT_<PROVIDER>_RPM and RATE_LIMIT_<PROVIDER>_TPM (0 or unset: unlimited)."""
+        limits = {}
+        for provider in PROVIDERS:
+            limits[(provider, "requests")] = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM", "0"))
+            limits[(provider, "tokens")] = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_TPM", "0"))
+        return cls(os.getenv("RATE_LIMIT_DB", os.path.join(".cache", "rate_limits.sqlite3")), limits)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if directory := os.path.dirname(self.path):
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _take(self, amounts: Dict[Tuple[str, str], float], force: bool = False) -> float:
+        """Take from several buckets atomically; return 0, or the seconds to wait before retrying."""
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = {}
+                for key in amounts:
+                    per_minute = self.limits[key]
+                    row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (":".join(key),)).fetchone()
+                    level, updated = row if row else (per_minute, now)
+                    levels[key] = min(per_minute, level + (now - updated) * per_minute / 60)
+
+                wait = 0.0
+                if not force:
+                    for key, amount in amounts.items():
+                        # A request larger than the bucket only waits for a full bucket
+                        needed = min(amount, self.limits[key])
+                        if levels[key] < needed:
+                            wait = max(wait, (needed - levels[key]) * 60 / self.limits[key])
+
+                for key, amount in amounts.items():
+                    level = levels[key] if wait else levels[key] - amount
+                    conn.execute(
+                        "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                        (":".join(key), level, now)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    def _record(self, provider: str, waited: float) -> None:
+        stats = self.metrics.setdefault(provider, {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "max_wait": 0.0})
+        stats["acquired"] += 1
+        if waited > 0:
+            stats["waited"] += 1
+            stats["wait_seconds"] = round(stats["wait_seconds"] + waited, 3)
+            stats["max_wait"] = round(max(stats["max_wait"], waited), 3)
+
+    async def acquire(self, provider: str, tokens: int = 0) -> float:
+        """Wait for one request (and `tokens`) of quota; return the seconds waited."""
+        amounts = {(provider, "requests"): 1}
+        if tokens:
+            amounts[(provider, "tokens")] = tokens
+        amounts = {key: amount for key, amount in amounts.items() if key in self.limits}
+        if not amounts:
+            return 0.0
+
+        started = time.monotonic()
+        throttled = False
+        while True:
+            try:
+                wait = await asyncio.to_thread(self._take, amounts)
+            except sqlite3.Error as e:
+                # The limiter must never stop the pipeline
+                logger.warning("Limiteur de débit indisponible : %s", e)
+                break
+            if not wait:
+                break
+            throttled = True
+            await asyncio.sleep(wait)
+        waited = time.monotonic() - started if throttled else 0.0
+        self._record(provider, waited)
+        if waited >= 1:
+            logger.info("Quota %s : attente de %.1fs", provider, waited)
+        return waited
+
+    async def debit(self, provider: str, tokens: int) -> None:
+        """Charge tokens after the fact, without waiting."""
+        key = (provider, "tokens")
+        if tokens <= 0 or key not in self.limits:
+            return
+        try:
+            await asyncio.to_thread(self._take, {key: tokens}, True)
+        except sqlite3.Error as e:
+            logger.warning("Limiteur de débit indisponible : %s", e)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limits_per_minute": {":".join(key): value for key, value in self.limits.items()},
+            "providers": self.metrics,
+        }
+
+
+# Shared by every job of the process; the buckets themselves are shared across processes
+limiter = RateLimiter.from_env()
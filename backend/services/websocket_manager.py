@@ -1,75 +1,274 @@
+import asyncio
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Set
+import os
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Set, Tuple
 
 from fastapi import WebSocket
 
+from .event_bus import JobEvent
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Streamed deltas: consecutive chunks with the same key are merged into one message
+CHUNK_STATUSES = {"briefing_chunk", "report_chunk"}
+# Progress events superseded by the next one with the same key
+SUPERSEDED_STATUSES = {"query_generating"}
+# Events a slow client may miss; everything else is kept or the client is evicted
+LOW_PRIORITY_STATUSES = CHUNK_STATUSES | SUPERSEDED_STATUSES | {"document_kept", "query_searching"}
+
+
+def _coalesce_key(message: dict) -> Optional[Tuple[Any, ...]]:
+    """Key under which a queued message can absorb the next one, if any."""
+    if message.get("type") == "state_update":
+        return ("state_update",)
+    data = message.get("data") or {}
+    status = data.get("status")
+    result = data.get("result") or {}
+    if status in CHUNK_STATUSES:
+        return (status, result.get("category"))
+    if status in SUPERSEDED_STATUSES:
+        return (status, result.get("category"), result.get("query_number"))
+    return None
+
+
+def _is_low_priority(message: dict) -> bool:
+    return message.get("type") == "state_update" or (message.get("data") or {}).get("status") in LOW_PRIORITY_STATUSES
+
+
+class ClientConnection:
+    """One WebSocket with a bounded outbound queue drained by its own writer task.
+
+    Enqueueing never waits: a message merges into the last queued one when
+    they share a coalesce key, and when the queue is full the oldest
+    low-priority message is dropped (chunk text is merged forward into a
+    later chunk of the same stream rather than lost, so that no message goes
+    out before events with a lower seq). A client whose queue is full of
+    messages that cannot be dropped, or whose send takes longer than
+    `send_timeout`, is closed.
+    """
+
+    def __init__(self, websocket: WebSocket, job_id: str, max_queue: int, send_timeout: float, on_evict):
+        self.websocket = websocket
+        self.job_id = job_id
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.on_evict = on_evict
+        self.queue: Deque[Tuple[Optional[Tuple[Any, ...]], dict, str]] = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+        # Live events are held, uncoalesced, until the replayed ones are queued in front of them
+        self.replaying = False
+        # Highest event seq queued; a replayed event can also arrive live from another worker
+        self.last_seq = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.writer = asyncio.create_task(self._write())
+
+    def enqueue(self, message: dict, message_str: str, force: bool = False) -> None:
+        """Queue a message; `force` skips the size bound (replay on connect)."""
+        if self.closed:
+            return
+        if "seq" in message and not self.replaying:
+            if message["seq"] <= self.last_seq:
+                return
+            self.last_seq = message["seq"]
+        key = _coalesce_key(message)
+        if key is not None and self.queue and self.queue[-1][0] == key and not self.replaying:
+            self.queue[-1] = self._merge(self.queue[-1], (key, message, message_str))
+            self.coalesced += 1
+            return
+
+        if len(self.queue) >= self.max_queue and not force:
+            if _is_low_priority(message):
+                if key is not None and key[0] in CHUNK_STATUSES and self._fold_into_queued((key, message, message_str)):
+                    return
+                self.dropped += 1
+                return
+            if not self._make_room():
+                self.evict(f"file d'envoi pleine ({len(self.queue)} messages)")
+                return
+
+        self.queue.append((key, message, message_str))
+        self.ready.set()
+
+    @staticmethod
+    def _merge(previous: tuple, entry: tuple) -> tuple:
+        """Merge two queued messages with the same coalesce key; chunk deltas are concatenated."""
+        key, message, message_str = entry
+        if key[0] in CHUNK_STATUSES:
+            result = message["data"]["result"]
+            chunk = previous[1]["data"]["result"]["chunk"] + result["chunk"]
+            message = {**message, "data": {**message["data"], "result": {**result, "chunk": chunk}}}
+            message_str = json.dumps(message)
+        return key, message, message_str
+
+    def _fold_into_queued(self, entry: tuple) -> bool:
+        """Take the latest queued chunk of the same stream out and queue it, merged with `entry`, at the tail.
+
+        The merged message carries the newest seq, which clients resume
+        from, so it must not be sent before the events queued after the
+        older chunk.
+        """
+        for index in range(len(self.queue) - 1, -1, -1):
+            if self.queue[index][0] == entry[0]:
+                previous = self.queue[index]
+                del self.queue[index]
+                self.queue.append(self._merge(previous, entry))
+                self.coalesced += 1
+                self.ready.set()
+                return True
+        return False
+
+    def _make_room(self) -> bool:
+        """Remove the oldest low-priority message; a chunk moves into a later one of the same stream."""
+        for index, entry in enumerate(self.queue):
+            if not _is_low_priority(entry[1]):
+                continue
+            del self.queue[index]
+            if entry[0] is not None and entry[0][0] in CHUNK_STATUSES:
+                for later, queued in enumerate(list(self.queue)[index:], index):
+                    if queued[0] == entry[0]:
+                        self.queue[later] = self._merge(entry, queued)
+                        self.coalesced += 1
+                        return True
+            self.dropped += 1
+            return True
+        return False
+
+    def replay(self, events: List[JobEvent]) -> None:
+        """Queue replayed events before the live ones received meanwhile, without duplicates."""
+        live, self.queue = self.queue, deque()
+        first_live = next((message["seq"] for _, message, _ in live if "seq" in message), None)
+        self.replaying = False
+        for event in events:
+            if first_live is None or event.seq < first_live:
+                message = event.to_message()
+                self.enqueue(message, json.dumps(message), force=True)
+        self.queue.extend(live)
+        self.last_seq = max([self.last_seq] + [message["seq"] for _, message, _ in live if "seq" in message])
+        self.ready.set()
+
+    async def _write(self) -> None:
+        while not self.closed:
+            if not self.queue or self.replaying:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            _, _, message_str = self.queue.popleft()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message_str), self.send_timeout)
+                self.sent += 1
+            except asyncio.TimeoutError:
+                self.evict(f"envoi bloqué plus de {self.send_timeout:.0f}s")
+            except Exception as e:
+                logger.warning("Erreur lors de l'envoi du message au client : %s", e)
+                self.evict("erreur d'envoi")
+
+    def evict(self, reason: str) -> None:
+        if self.closed:
+            return
+        logger.warning(
+            "Client WebSocket retiré de la tâche %s : %s (%d messages perdus)",
+            self.job_id, reason, self.dropped + len(self.queue)
+        )
+        self.on_evict(self)
+        asyncio.create_task(self._close())
+
+    async def _close(self) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        self.closed = True
+        self.queue.clear()
+        self.ready.set()
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+
 class WebSocketManager:
     def __init__(self):
         # Store active connections for each job
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        
-    async def connect(self, websocket: WebSocket, job_id: str):
-        """Connect a new client to a specific job."""
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.max_queue = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+        self.send_timeout = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+        self.evicted = 0
+
+    async def connect(self, websocket: WebSocket, job_id: str, backlog: Optional[Awaitable[List[JobEvent]]] = None):
+        """Connect a new client to a specific job.
+
+        `backlog` is awaited once the client receives live events, and its
+        events are sent first, so that none is missed in between.
+        """
         if job_id not in self.active_connections:
             self.active_connections[job_id] = set()
         self.active_connections[job_id].add(websocket)
-        logger.info(f"Nouvelle connexion WebSocket pour la tâche {job_id}")
-        logger.info(f"Connexions totales pour la tâche : {len(self.active_connections[job_id])}")
-        logger.info(f"Tâches actives : {list(self.active_connections.keys())}")
-        
+        client = self.clients[websocket] = ClientConnection(
+            websocket, job_id, self.max_queue, self.send_timeout, self._evict
+        )
+        logger.info(
+            "Nouvelle connexion WebSocket pour la tâche %s (%d connexions, %d tâches actives)",
+            job_id, len(self.active_connections[job_id]), len(self.active_connections)
+        )
+        if backlog is not None:
+            client.replaying = True
+            try:
+                events = await backlog
+            except Exception as e:
+                logger.warning("Relecture impossible pour la tâche %s : %s", job_id, e)
+                events = []
+            client.replay(events)
+
     def disconnect(self, websocket: WebSocket, job_id: str):
         """Disconnect a client from a specific job."""
+        if client := self.clients.pop(websocket, None):
+            client.stop()
         if job_id in self.active_connections:
             self.active_connections[job_id].discard(websocket)
             if not self.active_connections[job_id]:
                 del self.active_connections[job_id]
-            logger.info(f"WebSocket déconnecté pour la tâche {job_id}")
-            logger.info(f"Connexions restantes pour la tâche : {len(self.active_connections.get(job_id, set()))}")
-            logger.info(f"Tâches actives restantes : {list(self.active_connections.keys())}")
-                
-    async def broadcast_to_job(self, job_id: str, message: dict):
-        """Send a message to all clients connected to a specific job."""
-        if job_id not in self.active_connections:
-            logger.warning(f"Aucune connexion active pour la tâche {job_id}")
+            logger.info(
+                "WebSocket déconnecté pour la tâche %s (%d connexions restantes, %d tâches actives)",
+                job_id, len(self.active_connections.get(job_id, set())), len(self.active_connections)
+            )
+
+    def _evict(self, client: ClientConnection) -> None:
+        self.evicted += 1
+        self.disconnect(client.websocket, client.job_id)
+
+    def deliver(self, event: JobEvent) -> None:
+        """Event bus transport: queue a job event for the job's clients, without waiting for delivery."""
+        if event.job_id not in self.active_connections:
             return
-            
-        # Add timestamp to message
-        message["timestamp"] = datetime.now().isoformat()
-        
-        # Convert message to JSON string
+        message = event.to_message()
+        # Convert message to JSON string once for every client
         message_str = json.dumps(message)
-        logger.info(f"Contenu du message : {message_str}")
-        
-        # Send to all connected clients for this job
-        success_count = 0
-        disconnected = set()
-        for connection in self.active_connections[job_id]:
-            try:
-                await connection.send_text(message_str)
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Erreur lors de l'envoi du message au client : {str(e)}", exc_info=True)
-                disconnected.add(connection)
-        
-        # Clean up disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection, job_id)
-            
-    async def send_status_update(self, job_id: str, status: str, message: str = None, error: str = None, result: dict = None):
-        """Helper method to send formatted status updates."""
-        update = {
-            "type": "status_update",
-            "data": {
-                "status": status,
-                "message": message,
-                "error": error,
-                "result": result
-            }
+        for connection in list(self.active_connections[event.job_id]):
+            if client := self.clients.get(connection):
+                client.enqueue(message, message_str)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Connections per job with their queue depth and delivery counters."""
+        return {
+            "evicted": self.evicted,
+            "jobs": {
+                job_id: [
+                    {
+                        "queued": len(client.queue),
+                        "sent": client.sent,
+                        "coalesced": client.coalesced,
+                        "dropped": client.dropped,
+                    }
+                    for connection in connections
+                    if (client := self.clients.get(connection))
+                ]
+                for job_id, connections in self.active_connections.items()
+            },
         }
-        #logger.info(f"Status: {status}, Message: {message}")
-        await self.broadcast_to_job(job_id, update)
\ No newline at end of file
@@ -1,10 +1,12 @@
 from .utils import generate_pdf_from_md, clean_text
+from .urls import canonicalize_url
 from .references import (
     extract_domain_name, 
     extract_title_from_url_path, 
     clean_title, 
     normalize_url,
     extract_website_name_from_domain,
+    ReferenceIndex,
     process_references_from_search_results,
     format_reference_for_markdown,
     extract_link_info,
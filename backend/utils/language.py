@@ -0,0 +1,158 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Tuple
+
+# Short reference texts from which the character trigram profiles are built.
+LANGUAGE_SAMPLES = {
+    'fr': (
+        "Le présent rapport décrit les activités de l'entreprise, ses produits et ses services. "
+        "La société a été fondée en France et son siège social est situé à Paris. Elle a annoncé "
+        "une levée de fonds auprès de plusieurs investisseurs afin de développer sa plateforme et "
+        "de recruter de nouveaux collaborateurs. Selon le directeur général, le chiffre d'affaires "
+        "a progressé de manière importante cette année grâce à la croissance du marché européen. "
+        "Les clients sont des entreprises de toutes tailles qui utilisent ces solutions pour "
+        "améliorer leur productivité. Nous avons également signé un partenariat avec un groupe "
+        "industriel pour étendre notre présence dans les pays voisins."
+    ),
+    'en': (
+        "This report describes the company's business, its products and its services. The company "
+        "was founded in the United States and its headquarters are located in New York. It has "
+        "announced a funding round with several investors in order to develop its platform and "
+        "hire new employees. According to the chief executive officer, revenue grew significantly "
+        "this year thanks to the growth of the market. Customers are businesses of all sizes that "
+        "use these solutions to improve their productivity. We have also signed a partnership with "
+        "an industrial group to expand our presence in neighboring countries."
+    ),
+    'es': (
+        "Este informe describe las actividades de la empresa, sus productos y sus servicios. La "
+        "compañía fue fundada en España y su sede se encuentra en Madrid. Ha anunciado una ronda de "
+        "financiación con varios inversores para desarrollar su plataforma y contratar nuevos "
+        "empleados. Según el director general, los ingresos crecieron de manera importante este año "
+        "gracias al crecimiento del mercado. Los clientes son empresas de todos los tamaños que "
+        "utilizan estas soluciones para mejorar su productividad. También hemos firmado una alianza "
+        "con un grupo industrial para ampliar nuestra presencia en los países vecinos."
+    ),
+    'de': (
+        "Dieser Bericht beschreibt die Tätigkeiten des Unternehmens, seine Produkte und seine "
+        "Dienstleistungen. Die Firma wurde in Deutschland gegründet und hat ihren Hauptsitz in "
+        "Berlin. Sie hat eine Finanzierungsrunde mit mehreren Investoren angekündigt, um ihre "
+        "Plattform weiterzuentwickeln und neue Mitarbeiter einzustellen. Laut dem Geschäftsführer "
+        "ist der Umsatz in diesem Jahr dank des Wachstums des Marktes deutlich gestiegen. Die Kunden "
+        "sind Unternehmen jeder Größe, die diese Lösungen nutzen, um ihre Produktivität zu steigern. "
+        "Wir haben außerdem eine Partnerschaft mit einer Industriegruppe unterzeichnet."
+    ),
+    'it': (
+        "Questo rapporto descrive le attività dell'azienda, i suoi prodotti e i suoi servizi. La "
+        "società è stata fondata in Italia e la sua sede si trova a Milano. Ha annunciato un round "
+        "di finanziamento con diversi investitori per sviluppare la sua piattaforma e assumere nuovi "
+        "dipendenti. Secondo l'amministratore delegato, il fatturato è cresciuto in modo importante "
+        "quest'anno grazie alla crescita del mercato. I clienti sono imprese di tutte le dimensioni "
+        "che utilizzano queste soluzioni per migliorare la loro produttività. Abbiamo anche firmato "
+        "una partnership con un gruppo industriale per ampliare la nostra presenza nei paesi vicini."
+    ),
+    'pt': (
+        "Este relatório descreve as atividades da empresa, os seus produtos e os seus serviços. A "
+        "companhia foi fundada no Brasil e a sua sede fica em São Paulo. Anunciou uma rodada de "
+        "investimento com vários investidores para desenvolver a sua plataforma e contratar novos "
+        "funcionários. Segundo o diretor executivo, a receita cresceu de forma importante este ano "
+        "graças ao crescimento do mercado. Os clientes são empresas de todos os tamanhos que usam "
+        "essas soluções para melhorar a sua produtividade. Também assinamos uma parceria com um "
+        "grupo industrial para ampliar a nossa presença nos países vizinhos."
+    ),
+    'nl': (
+        "Dit rapport beschrijft de activiteiten van het bedrijf, zijn producten en zijn diensten. "
+        "Het bedrijf is opgericht in Nederland en het hoofdkantoor is gevestigd in Amsterdam. Het "
+        "heeft een financieringsronde met verschillende investeerders aangekondigd om zijn platform "
+        "te ontwikkelen en nieuwe medewerkers aan te nemen. Volgens de algemeen directeur is de omzet "
+        "dit jaar sterk gestegen dankzij de groei van de markt. De klanten zijn bedrijven van elke "
+        "grootte die deze oplossingen gebruiken om hun productiviteit te verbeteren. Wij hebben ook "
+        "een samenwerking getekend met een industriële groep."
+    ),
+}
+
+# Unicode script prefixes (from unicodedata names) identifying non-Latin languages.
+SCRIPT_LANGUAGES = {
+    'CJK': 'zh',
+    'HIRAGANA': 'ja',
+    'KATAKANA': 'ja',
+    'HANGUL': 'ko',
+    'CYRILLIC': 'ru',
+    'ARABIC': 'ar',
+    'HEBREW': 'he',
+    'GREEK': 'el',
+    'DEVANAGARI': 'hi',
+    'THAI': 'th',
+}
+
+NON_LETTER_RE = re.compile(r"[^\w']+|\d+|_", re.UNICODE)
+
+
+def _trigrams(text: str) -> Counter:
+    counts: Counter = Counter()
+    for word in NON_LETTER_RE.sub(" ", text.lower()).split():
+        padded = f" {word} "
+        counts.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return counts
+
+
+@lru_cache(maxsize=1)
+def _profiles() -> Dict[str, Tuple[Dict[str, float], float]]:
+    profiles = {}
+    for language, sample in LANGUAGE_SAMPLES.items():
+        counts = _trigrams(sample)
+        profiles[language] = (dict(counts), math.sqrt(sum(v * v for v in counts.values())))
+    return profiles
+
+
+def _script_language(text: str) -> str | None:
+    """Return a language for text written mostly in a non-Latin script."""
+    scripts: Counter = Counter()
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        if ord(char) < 0x250:
+            continue
+        name = unicodedata.name(char, '')
+        for prefix, language in SCRIPT_LANGUAGES.items():
+            if name.startswith(prefix):
+                scripts[language] += 1
+                break
+    if not letters or not scripts:
+        return None
+    # Japanese mixes kana with CJK ideographs
+    if scripts.get('ja'):
+        scripts['ja'] += scripts.pop('zh', 0)
+    language, count = scripts.most_common(1)[0]
+    return language if count / letters > 0.3 else None
+
+
+def detect_language(text: str, max_chars: int = 2000, min_letters: int = 40) -> Tuple[str, float]:
+    """Identify the language of a text from its character trigrams.
+
+    Returns an ISO 639-1 code and a confidence in [0, 1] (cosine similarity
+    for Latin-script languages). Texts too short to judge return ('und', 0.0).
+    """
+    text = (text or "")[:max_chars]
+    letters = sum(char.isalpha() for char in text)
+    if not letters:
+        return 'und', 0.0
+
+    # One ideograph or syllable carries more than a Latin letter, so check scripts first
+    if language := _script_language(text):
+        return language, 1.0
+    if letters < min_letters:
+        return 'und', 0.0
+
+    counts = _trigrams(text)
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    best, best_score = 'und', 0.0
+    for language, (profile, profile_norm) in _profiles().items():
+        score = sum(count * profile.get(gram, 0) for gram, count in counts.items()) / (norm * profile_norm)
+        if score > best_score:
+            best, best_score = language, score
+    return best, best_score
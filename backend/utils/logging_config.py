@@ -0,0 +1,107 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+
+DEFAULT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class SamplingFilter(logging.Filter):
+    """Let through one record out of `every` for each logging call site.
+
+    Sampling is keyed on the logger and the source line of the call, so
+    f-string messages are grouped too and the counters stay bounded by the
+    number of call sites. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, every: int = 1, max_level: int = logging.INFO) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self.max_level = max_level
+        self._counts: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > self.max_level:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class CappedFormatter(logging.Formatter):
+    """Formatter that truncates messages and can emit JSON lines."""
+
+    def __init__(self, fmt: str = DEFAULT_FORMAT, max_chars: int = 2000, as_json: bool = False) -> None:
+        super().__init__(fmt)
+        self.max_chars = max_chars
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if self.max_chars and len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} caractères tronqués]"
+
+        if self.as_json:
+            payload = {
+                "ts": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+            }
+            if job_id := getattr(record, "job_id", None):
+                payload["job_id"] = job_id
+            if record.exc_info:
+                payload["exc_info"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False)
+
+        record.message = message
+        if self.usesTime():
+            record.asctime = self.formatTime(record, self.datefmt)
+        text = self.formatMessage(record)
+        if record.exc_info:
+            text = f"{text}\n{self.formatException(record.exc_info)}"
+        return text
+
+
+def configure_logging(level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue written by a listener thread.
+
+    Settings come from the environment:
+        LOG_LEVEL        root level (default INFO)
+        LOG_SAMPLE_EVERY keep one INFO/DEBUG record out of N per logging call
+                         site, i.e. logger and source line (default 1)
+        LOG_MAX_CHARS    maximum message length (default 2000, 0 disables)
+        LOG_FORMAT       "text" (default) or "json"
+
+    The returned listener is already started; call `stop()` on shutdown to
+    flush pending records.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    sample_every = int(os.getenv("LOG_SAMPLE_EVERY", "1"))
+    max_chars = int(os.getenv("LOG_MAX_CHARS", "2000"))
+    as_json = os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_every))
+    # Formatting happens once in the caller; the listener thread only writes.
+    queue_handler.setFormatter(CappedFormatter(max_chars=max_chars, as_json=as_json))
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,190 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Required ## sections of the final report, in order, with the headings that map to each
+REPORT_SECTIONS = [
+    ("Présentation de l’entreprise", ("presentation de l entreprise", "presentation de l'entreprise", "entreprise", "company overview")),
+    ("Présentation du secteur", ("presentation du secteur", "secteur", "industry overview")),
+    ("Présentation financière", ("presentation financiere", "finances", "financial overview")),
+    ("Actualités", ("actualites", "news")),
+]
+# Word stems that identify a section when a heading is paraphrased ("Aperçu du secteur")
+SECTION_KEYWORDS = {
+    "Présentation de l’entreprise": ("entreprise", "societe", "company", "activite", "profil"),
+    "Présentation du secteur": ("secteur", "industr", "marche", "market", "concurren"),
+    "Présentation financière": ("financ", "chiffre", "revenu", "resultat", "levee"),
+    "Actualités": ("actualite", "news", "recent", "evenement", "nouvelle"),
+}
+REFERENCE_HEADINGS = ("references", "sources")
+# Briefing category of each report section
+CATEGORY_SECTIONS = {
+    'company': "Présentation de l’entreprise",
+    'industry': "Présentation du secteur",
+    'financial': "Présentation financière",
+    'news': "Actualités",
+}
+
+CODE_FENCE_RE = re.compile(r"^\s*```")
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# "1.", "2)", "1.2", "IV." or "A." before a heading title
+NUMBERING_RE = re.compile(r"^\s*(?:\d+(?:\.\d+)*[.)]?|[IVXivx]+[.)]|[A-Za-z][.)])\s+")
+BULLET_RE = re.compile(r"^(\s*)[-+•]\s+")
+
+
+def _heading_key(title: str) -> str:
+    """Lowercase a heading, without accents, punctuation or markup."""
+    text = unicodedata.normalize('NFKD', title.replace("’", "'"))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9']+", " ", text.lower()).strip()
+
+
+def _section_for(title: str) -> Optional[str]:
+    """Report section a heading stands for, matched loosely.
+
+    Numbering is ignored; a heading matches a section by name or alias,
+    then by starting with one ("Présentation financière et
+    investissements"), then by the earliest keyword it contains.
+    """
+    key = _heading_key(NUMBERING_RE.sub("", title.replace("*", "")))
+    if not key:
+        return None
+    if key in REFERENCE_HEADINGS or key.startswith(REFERENCE_HEADINGS):
+        return "Références"
+    names = [(section, (_heading_key(section),) + aliases) for section, aliases in REPORT_SECTIONS]
+    for section, candidates in names:
+        if key in candidates:
+            return section
+    for section, candidates in names:
+        if any(key.startswith(candidate + " ") for candidate in candidates if " " in candidate):
+            return section
+
+    words = key.split()
+    best: Optional[str] = None
+    best_position = len(words)
+    for section, stems in SECTION_KEYWORDS.items():
+        for position, word in enumerate(words):
+            if position < best_position and word.startswith(stems):
+                best, best_position = section, position
+                break
+    return best
+
+
+def _clean_lines(lines: List[str]) -> List[str]:
+    """Collapse blank lines, trim the ends and normalize bullets to `*`."""
+    cleaned: List[str] = []
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            if cleaned and cleaned[-1]:
+                cleaned.append("")
+            continue
+        line = BULLET_RE.sub(r"\1* ", line)
+        if HEADING_RE.match(line) and cleaned and cleaned[-1]:
+            cleaned.append("")
+        cleaned.append(line)
+    while cleaned and not cleaned[-1]:
+        cleaned.pop()
+    return cleaned
+
+
+def _has_content(lines: List[str]) -> bool:
+    return any(line.strip() and not HEADING_RE.match(line) for line in lines)
+
+
+def section_body(text: str, section: str) -> str:
+    """Make model output safe to insert under `## {section}`.
+
+    A leading heading repeating the section name is removed and any other
+    `#` or `##` heading becomes a `###` subsection.
+    """
+    lines = []
+    for line in (text or "").splitlines():
+        if CODE_FENCE_RE.match(line):
+            continue
+        match = HEADING_RE.match(line)
+        if match and len(match.group(1)) <= 2:
+            if not any(l.strip() for l in lines) and _section_for(match.group(2)) == section:
+                continue
+            line = f"### {match.group(2)}"
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _without_model_references(text: str) -> str:
+    """Compiled text without code fences or the model's own references."""
+    lines: List[str] = []
+    in_references = False
+    for line in (text or "").splitlines():
+        if CODE_FENCE_RE.match(line):
+            continue
+        match = HEADING_RE.match(line)
+        if match and len(match.group(1)) <= 2:
+            in_references = _section_for(match.group(2)) == "Références"
+            if in_references:
+                continue
+        if not in_references:
+            lines.append(line)
+    return "\n".join(_clean_lines(lines))
+
+
+def normalize_report(text: str, company: str, references_section: str = "", required: Iterable[str] = ()) -> str:
+    """Rebuild a compiled report into the required markdown structure.
+
+    - starts with `# Rapport de recherche sur {company}`
+    - puts the required `##` sections in order; other `##` headings become
+      `###` subsections of the section they appear in, or, before the first
+      section, are kept as their own sections after the required ones
+    - drops empty sections, code fences, untitled text before the first
+      section and any references the model wrote, then appends
+      `references_section`
+    - collapses repeated blank lines and writes every bullet with `*`
+
+    If a section listed in `required` ends up missing, the headings were not
+    understood: the text is returned as compiled, without fences or the
+    model's references, followed by `references_section`.
+    """
+    sections: Dict[str, List[str]] = {section: [] for section, _ in REPORT_SECTIONS}
+    extra: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    for line in (text or "").splitlines():
+        if CODE_FENCE_RE.match(line):
+            continue
+        match = HEADING_RE.match(line)
+        if match and len(match.group(1)) <= 2:
+            section = _section_for(match.group(2))
+            if section or len(match.group(1)) == 1:
+                current = section
+            elif current is None or current in extra:
+                current = match.group(2).strip()
+                extra.setdefault(current, [])
+            elif current != "Références":
+                sections[current].append(f"### {match.group(2)}")
+            continue
+        if current in extra:
+            extra[current].append(line)
+        elif current and current != "Références":
+            sections[current].append(line)
+
+    parts = [f"# Rapport de recherche sur {company}"]
+    kept = set()
+    for section, _ in REPORT_SECTIONS:
+        lines = _clean_lines(sections[section])
+        if _has_content(lines):
+            kept.add(section)
+            parts.append(f"## {section}\n" + "\n".join(lines))
+    for heading, lines in extra.items():
+        lines = _clean_lines(lines)
+        if _has_content(lines):
+            parts.append(f"## {heading}\n" + "\n".join(lines))
+
+    if missing := [section for section in required if section not in kept]:
+        logger.warning("Sections introuvables dans le rapport compilé (%s), rapport conservé tel quel", ", ".join(missing))
+        parts = [_without_model_references(text)]
+    if references_section.strip():
+        parts.append(references_section.strip())
+    return "\n\n".join(parts)
+
@@ -0,0 +1,96 @@
+import math
+import re
+from typing import List, NamedTuple
+
+# Prompt budget (tokens) for the documents of one briefing. It bounds cost and latency,
+# not the context: every configured model has a window of at least 128k tokens (gpt-4o),
+# so the budget leaves ample room for the instructions and the answer whichever route
+# serves the call. Override it with BRIEFING_TOKEN_BUDGET.
+DEFAULT_TOKEN_BUDGET = 30000
+
+SENTENCE_END_RE = re.compile(r"[.!?](?=\s)|\n")
+TRUNCATION_MARKER = "... [content truncated]"
+
+
+class PackItem(NamedTuple):
+    title: str
+    content: str
+    score: float
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: about four UTF-8 bytes per token for Latin text."""
+    if not text:
+        return 0
+    return math.ceil(len(text.encode('utf-8')) / 4)
+
+
+def trim_to_sentence(text: str, max_tokens: int) -> str:
+    """Cut text to at most `max_tokens`, ending on a sentence boundary when possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_tokens = max(1, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+    cut = text[:max_tokens * 4]
+    while estimate_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    last_end = None
+    for last_end in SENTENCE_END_RE.finditer(cut):
+        pass
+    if last_end and last_end.end() > len(cut) // 2:
+        cut = cut[:last_end.end()]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def format_entry(title: str, content: str) -> str:
+    return f"Title: {title}\n\nContent: {content}"
+
+
+def pack_documents(items: List[PackItem], budget_tokens: int, max_doc_tokens: int, min_doc_tokens: int = 150) -> List[str]:
+    """Choose and trim documents to fill a token budget, best value per token first.
+
+    Selection is a greedy knapsack on score per token: each document is
+    first capped at `max_doc_tokens`, then added if it fits. A document
+    that does not fit is trimmed to the remaining budget (at a sentence
+    boundary) rather than ending the packing, as long as at least
+    `min_doc_tokens` remain. The chosen entries are returned best score
+    first.
+    """
+    candidates = []
+    for index, item in enumerate(items):
+        content = trim_to_sentence(item.content, max_doc_tokens)
+        entry = format_entry(item.title, content)
+        tokens = estimate_tokens(entry)
+        if tokens:
+            candidates.append((max(item.score, 0.0) / tokens, index, item, entry, tokens))
+
+    remaining = budget_tokens
+    chosen = []
+    for _, index, item, entry, tokens in sorted(candidates, key=lambda c: c[0], reverse=True):
+        if tokens <= remaining:
+            chosen.append((item.score, index, entry))
+            remaining -= tokens
+        elif remaining >= min_doc_tokens:
+            overhead = estimate_tokens(format_entry(item.title, ""))
+            trimmed = format_entry(item.title, trim_to_sentence(item.content, remaining - overhead))
+            chosen.append((item.score, index, trimmed))
+            remaining -= estimate_tokens(trimmed)
+
+    chosen.sort(key=lambda c: (-c[0], c[1]))
+    return [entry for _, _, entry in chosen]
+
+
+def chunk_entries(entries: List[str], chunk_tokens: int) -> List[List[str]]:
+    """Group packed entries, in order, into chunks of at most `chunk_tokens` (one oversized entry per chunk)."""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for entry in entries:
+        tokens = estimate_tokens(entry)
+        if current and used + tokens > chunk_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(entry)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
@@ -1,8 +1,11 @@
+import heapq
 import logging
 import re
 from typing import Any, Dict, List, Tuple
 from urllib.parse import urlparse
 
+from .urls import canonicalize_url
+
 logger = logging.getLogger(__name__)
 
 def extract_domain_name(url: str) -> str:
@@ -79,32 +82,14 @@ def clean_title(title: str) -> str:
     
     # If title became empty after cleaning, return empty string
     if not title:
-        logger.warning(f"Title became empty after cleaning: '{original_title}'")
+        logger.debug("Title became empty after cleaning: '%s'", original_title)
         return ""
     
-    # Log if we made changes to the title
-    if title != original_title:
-        logger.info(f"Cleaned title from '{original_title}' to '{title}'")
-    
     return title
 
 def normalize_url(url: str) -> str:
-    """Normalize a URL by removing query parameters and fragments."""
-    try:
-        if not url:
-            return ""
-            
-        # Ensure URL has a scheme
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        parsed = urlparse(url)
-        normalized_url = parsed._replace(query='', fragment='').geturl().rstrip('/')
-        
-        return normalized_url
-    except Exception as e:
-        logger.error(f"Error normalizing URL {url}: {e}")
-        return url
+    """Normalize a URL to its canonical form (see `canonicalize_url`)."""
+    return canonicalize_url(url)
 
 def extract_website_name_from_domain(domain: str) -> str:
     """Extract a readable website name from a domain."""
@@ -123,120 +108,77 @@ def extract_website_name_from_domain(domain: str) -> str:
     
     return website_name
 
-def process_references_from_search_results(state: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], Dict[str, Dict[str, Any]]]:
-    """Process references from search results and return top references, titles, and info."""
-    all_top_references = []
-    
-    # Collect references with scores from all data types
-    data_types = ['curated_company_data', 'curated_industry_data', 'curated_financial_data', 'curated_news_data']
-    
-    # Log the start of reference processing
-    logger.info("Début du traitement des références à partir des résultats de recherche")
-    
-    for data_type in data_types:
-        if curated_data := state.get(data_type, {}):
-            for url, doc in curated_data.items():
-                try:
-                    # Ensure we have a valid score
-                    if 'evaluation' in doc and 'overall_score' in doc['evaluation']:
-                        score = float(doc['evaluation']['overall_score'])
-                    else:
-                        # Fallback to raw score if available
-                        score = float(doc.get('score', 0))
-                    
-                    logger.info(f"Référence trouvée dans {data_type} : URL={url}, Score={score:.4f}")
-                    all_top_references.append((url, score))
-                except (KeyError, ValueError, TypeError) as e:
-                    logger.warning(f"Erreur lors du traitement du score pour {url} dans {data_type} : {e}")
-                    continue
-    
-    logger.info(f"Collecté un total de {len(all_top_references)} références avant déduplication")
-    
-    # Sort references by score in descending order
-    all_top_references.sort(key=lambda x: float(x[1]), reverse=True)
-    
-    # Log top 20 references before deduplication to verify sorting
-    logger.info("Top 20 des références par score avant déduplication :")
-    for i, (url, score) in enumerate(all_top_references[:20]):
-        logger.info(f"{i+1}. Score : {score:.4f} - URL : {url}")
-    
-    # Use a set to store unique URLs, keeping only the highest scored version of each URL
-    seen_urls = set()
-    unique_references = []
-    reference_titles = {}  # Store titles for references
-    reference_info = {}  # Store additional information for MLA-style references
-    
-    for url, score in all_top_references:
-        # Skip if URL is not valid
+class ReferenceIndex:
+    """Index of candidate references keyed by normalized URL.
+
+    Built incrementally while documents are curated so the final reference
+    list can be selected without rescanning every curated category.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, url: str, score: float, title: str = "") -> None:
+        """Record a URL, keeping its best score and the title that goes with it."""
         if not url or not url.startswith(('http://', 'https://')):
-            logger.info(f"Skipping invalid URL: {url}")
-            continue
+            return
 
-        # Normalize URL
         normalized_url = normalize_url(url)
-        
-        if normalized_url not in seen_urls:
-            seen_urls.add(normalized_url)
-            unique_references.append((normalized_url, score))
-            
-            # Extract domain name for website citation
-            parsed = urlparse(url)
-            domain = parsed.netloc
-            
-            # Find and store the title and other info for this URL
-            title = None
-            website_name = None
-            
-            # Look for the document info in all data types
-            for data_type in data_types:
-                if not title and (curated_data := state.get(data_type, {})):
-                    for doc in curated_data.values():
-                        if doc.get('url') == url:
-                            title = doc.get('title', '')
-                            if title:
-                                # Clean up the title
-                                title = clean_title(title)
-                                if title and title.strip() and title != url:
-                                    reference_titles[normalized_url] = title
-                                    logger.info(f"Titre trouvé pour l'URL {url} : '{title}'")
-                                    break
-            
-            # If no title was found, log it
-            if not title:
-                logger.info(f"Aucun titre valide trouvé pour l'URL {url}")
-            
-            # Extract a better website name from the domain
-            website_name = extract_website_name_from_domain(domain)
-            
-            # Store additional information for MLA citation
-            reference_info[normalized_url] = {
-                'title': title or '',
+        title = clean_title(title) if title else ""
+        if title == url:
+            title = ""
+
+        entry = self._entries.get(normalized_url)
+        if entry is None:
+            domain = urlparse(url).netloc
+            self._entries[normalized_url] = {
+                'title': title,
                 'domain': domain,
-                'website': website_name,
-                'url': normalized_url,
+                'website': extract_website_name_from_domain(domain),
+                # Cited as found; the canonical form only identifies duplicates
+                'url': url,
                 'score': score
             }
-            logger.info(f"Informations de référence enregistrées pour {normalized_url} avec un score de {score:.4f}")
-    
-    # Sort unique references by score again to ensure proper ordering
-    unique_references.sort(key=lambda x: float(x[1]), reverse=True)
-    
-    # Log unique references by score to verify sorting
-    logger.info(f"Trouvé {len(unique_references)} références uniques après déduplication")
-    logger.info("Références uniques par score (triées) :")
-    for i, (url, score) in enumerate(unique_references):
-        logger.info(f"{i+1}. Score : {score:.4f} - URL : {url}")
-    
-    # Take exactly 10 unique references (or all if less than 10)
-    top_references = unique_references[:10]
-    top_reference_urls = [url for url, _ in top_references]
-    
-    # Log final top 10 references
-    logger.info(f"Sélection finale des {len(top_reference_urls)} meilleures références :")
-    for i, url in enumerate(top_reference_urls):
-        score = next((s for u, s in unique_references if u == url), 0)
-        logger.info(f"{i+1}. Score : {score:.4f} - URL : {url}")
-    
+        elif score > entry['score']:
+            entry['score'] = score
+            if title:
+                entry['title'] = title
+        elif title and not entry['title']:
+            entry['title'] = title
+
+    def add_documents(self, docs: Dict[str, Dict[str, Any]]) -> None:
+        """Record every document of a curated category."""
+        for url, doc in docs.items():
+            try:
+                if 'evaluation' in doc and 'overall_score' in doc['evaluation']:
+                    score = float(doc['evaluation']['overall_score'])
+                else:
+                    score = float(doc.get('score', 0))
+            except (KeyError, ValueError, TypeError) as e:
+                logger.warning(f"Erreur lors du traitement du score pour {url} : {e}")
+                continue
+            self.add(doc.get('url') or url, score, doc.get('title', ''))
+
+    def top(self, k: int = 10) -> Tuple[List[str], Dict[str, str], Dict[str, Dict[str, Any]]]:
+        """Return the top-k reference URLs with their titles and citation info."""
+        best = heapq.nlargest(k, self._entries.values(), key=lambda entry: entry['score'])
+        top_reference_urls = [entry['url'] for entry in best]
+        reference_titles = {entry['url']: entry['title'] for entry in self._entries.values() if entry['title']}
+        reference_info = {entry['url']: dict(entry) for entry in self._entries.values()}
+        return top_reference_urls, reference_titles, reference_info
+
+def process_references_from_search_results(state: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], Dict[str, Dict[str, Any]]]:
+    """Process references from search results and return top references, titles, and info."""
+    index = ReferenceIndex()
+    for data_type in ['curated_company_data', 'curated_industry_data', 'curated_financial_data', 'curated_news_data']:
+        if curated_data := state.get(data_type, {}):
+            index.add_documents(curated_data)
+
+    top_reference_urls, reference_titles, reference_info = index.top(10)
+    logger.info(f"Sélection de {len(top_reference_urls)} références parmi {len(index)} URLs uniques")
     return top_reference_urls, reference_titles, reference_info
 
 def format_reference_for_markdown(reference_entry: Dict[str, Any]) -> str:
@@ -304,8 +246,6 @@ def format_references_section(references: List[str], reference_info: Dict[str, D
     if not references:
         return ""
     
-    logger.info(f"Formatage de {len(references)} références pour le rapport")
-    
     # Create a list of reference entries with all the information needed
     reference_entries = []
     for ref in references:
@@ -317,19 +257,16 @@ def format_references_section(references: List[str], reference_info: Dict[str, D
         # If title is not in reference_info, try to get it from reference_titles
         if not title or title.strip() == "":
             title = reference_titles.get(ref, '')
-            logger.info(f"Utilisation du titre depuis reference_titles pour {ref} : '{title}'")
         
         domain = info.get('domain', '')
         
         # If we don't have a title, use the URL
         if not title or title.strip() == "" or title == ref:
             title = ref
-            logger.info(f"Aucun titre trouvé pour {ref}, utilisation de l'URL comme titre")
         
         # If we don't have a website name, extract it from the URL
         if not website or website.strip() == "":
             website = extract_domain_name(ref)
-            logger.info(f"Aucun nom de site trouvé pour {ref}, extrait : {website}")
         
         # Create a reference entry with all information
         entry = {
@@ -339,21 +276,18 @@ def format_references_section(references: List[str], reference_info: Dict[str, D
             'domain': domain,
             'score': score
         }
-        logger.info(f"Entrée de référence créée : {entry}")
         reference_entries.append(entry)
     
     # Keep references in the same order they were provided (which should be by score)
     # This preserves the top 10 scoring order from process_references_from_search_results
-    logger.info("Maintien de l'ordre des références basé sur les scores")
     
     # Format references in MLA style
     reference_lines = ["\n## Références"]
     for entry in reference_entries:
         reference_line = format_reference_for_markdown(entry)
         reference_lines.append(reference_line)
-        logger.info(f"Référence ajoutée : {reference_line}")
     
     reference_text = "\n".join(reference_lines)
-    logger.info(f"Section Références complétée avec {len(reference_entries)} entrées")
+    logger.info("Section Références complétée avec %d entrées", len(reference_entries))
     
     return reference_text 
\ No newline at end of file
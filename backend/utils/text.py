@@ -0,0 +1,204 @@
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping numbers (amounts and dates matter for redundancy)."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+def tfidf_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Return L2-normalized TF-IDF rows (sublinear tf, smoothed idf) for the given texts.
+
+    Term counts are collected sparsely per text and only expanded over the
+    shared vocabulary, which stays small for a single job's documents.
+    """
+    vocabulary: dict = {}
+    rows = []
+    for text in texts:
+        counts = Counter(tokenize(text or ""))
+        rows.append({vocabulary.setdefault(term, len(vocabulary)): count for term, count in counts.items()})
+
+    matrix = np.zeros((len(texts), max(len(vocabulary), 1)), dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row:
+            matrix[i, list(row.keys())] = list(row.values())
+
+    doc_freq = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + doc_freq)) + 1
+    matrix = np.log1p(matrix) * idf
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def mmr_select(
+    scores: Sequence[float], vectors: np.ndarray, k: int, relevance_weight: float = 0.7, max_similarity: float = 1.0
+) -> List[int]:
+    """Pick up to k indices by maximal marginal relevance.
+
+    Each step takes the candidate maximizing
+    `relevance_weight * score - (1 - relevance_weight) * max_similarity_to_selected`,
+    with scores divided by the best score. A weight of 1 reduces to plain top-k by score.
+    Candidates more similar than `max_similarity` to a selected one are never picked,
+    so fewer than k indices come back when the rest are near-duplicates.
+    """
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return []
+
+    relevance = np.asarray(scores, dtype=np.float32)
+    top = float(relevance.max())
+    relevance = relevance / top if top > 0 else np.ones(n, dtype=np.float32)
+
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+
+    while len(selected) < k and available.any():
+        mmr = relevance_weight * relevance - (1 - relevance_weight) * redundancy
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        available &= redundancy <= max_similarity
+
+    return selected
+
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+NORMALIZE_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def split_sentences(text: str) -> List[List[str]]:
+    """Split text into lines of sentences, so it can be rebuilt with its line structure."""
+    return [
+        [sentence for sentence in SENTENCE_SPLIT_RE.split(line.strip()) if sentence]
+        for line in text.splitlines()
+    ]
+
+
+def sentence_key(sentence: str) -> int:
+    """Hash of a sentence ignoring case, punctuation and spacing."""
+    return hash(NORMALIZE_RE.sub(" ", sentence.lower()).strip())
+
+
+def dedupe_sentences(
+    categories: Dict[str, List[Tuple[str, str]]],
+    keywords: Dict[str, Set[str]],
+    min_length: int = 40
+) -> Dict[str, Dict[str, str]]:
+    """Keep each repeated sentence in a single category and drop it everywhere else.
+
+    `categories` maps a category to its (url, text) pairs, best documents
+    first. A sentence seen in several categories goes to the one whose
+    keywords it matches most, then to the category where it appears in the
+    best-ranked document. Repeats inside a category keep the first
+    occurrence. Sentences shorter than `min_length` are never removed.
+
+    Returns the filtered text of every document, per category.
+    """
+    split_docs: Dict[str, List[Tuple[str, List[List[str]]]]] = {}
+    first_seen: Dict[int, Dict[str, int]] = {}
+    for category, docs in categories.items():
+        split_docs[category] = []
+        for rank, (url, text) in enumerate(docs):
+            lines = split_sentences(text or "")
+            split_docs[category].append((url, lines))
+            for line in lines:
+                for sentence in line:
+                    if len(sentence) >= min_length:
+                        first_seen.setdefault(sentence_key(sentence), {}).setdefault(category, rank)
+
+    owners: Dict[int, str] = {}
+    for key, ranks in first_seen.items():
+        if len(ranks) == 1:
+            owners[key] = next(iter(ranks))
+    category_order = list(categories)
+
+    def owner_of(key: int, sentence: str) -> str:
+        if key not in owners:
+            tokens = set(tokenize(sentence))
+            ranks = first_seen[key]
+            owners[key] = max(
+                ranks,
+                key=lambda c: (len(tokens & keywords.get(c, set())), -ranks[c], -category_order.index(c))
+            )
+        return owners[key]
+
+    deduped: Dict[str, Dict[str, str]] = {}
+    for category, docs in split_docs.items():
+        kept_keys: Set[int] = set()
+        deduped[category] = {}
+        for url, lines in docs:
+            kept_lines = []
+            for line in lines:
+                kept = []
+                for sentence in line:
+                    if len(sentence) < min_length:
+                        kept.append(sentence)
+                        continue
+                    key = sentence_key(sentence)
+                    if key in kept_keys or owner_of(key, sentence) != category:
+                        continue
+                    kept_keys.add(key)
+                    kept.append(sentence)
+                if kept:
+                    kept_lines.append(" ".join(kept))
+            deduped[category][url] = "\n".join(kept_lines)
+    return deduped
+
+
+def summarize_extractive(
+    text: str,
+    keywords: Set[str],
+    ratio: float,
+    min_sentences: int = 3,
+    keyword_weight: float = 0.5
+) -> str:
+    """Keep the most central and on-topic sentences of a text, up to `ratio` of its length.
+
+    Each sentence is scored by the cosine similarity of its TF-IDF vector to
+    the document centroid, plus `keyword_weight` times the share (capped at
+    three) of distinct `keywords` it contains. The best sentences are kept
+    in their original order and line structure.
+    """
+    lines = split_sentences(text or "")
+    sentences = [(i, sentence) for i, line in enumerate(lines) for sentence in line]
+    if ratio >= 1 or len(sentences) <= min_sentences:
+        return text
+
+    vectors = tfidf_matrix([sentence for _, sentence in sentences])
+    centroid = vectors.mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    scores = vectors @ (centroid / norm) if norm else np.zeros(len(sentences), dtype=np.float32)
+    if keywords:
+        hits = np.array(
+            [min(len(set(tokenize(sentence)) & keywords), 3) / 3 for _, sentence in sentences],
+            dtype=np.float32
+        )
+        scores = scores + keyword_weight * hits
+
+    budget = ratio * len(text)
+    kept = []
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        length = len(sentences[index][1])
+        if len(kept) >= min_sentences and used + length > budget:
+            continue
+        kept.append(int(index))
+        used += length
+
+    kept_lines: Dict[int, List[str]] = {}
+    for index in sorted(kept):
+        line, sentence = sentences[index]
+        kept_lines.setdefault(line, []).append(sentence)
+    return "\n".join(" ".join(parts) for _, parts in sorted(kept_lines.items()))
@@ -0,0 +1,87 @@
+import logging
+import re
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track the visit and never change the page content.
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gclsrc', 'msclkid', 'yclid', 'igshid', 'twclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'vero_id',
+    'ref', 'ref_src', 'ref_url', 'referrer', 'cmpid', 'ito', 'ncid',
+    'sr_share', 'smid', 'amp', 'outputtype',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_', 'oly_', 'trk_')
+
+# Host prefixes that serve a mobile or AMP copy of the same page.
+MIRROR_HOST_PREFIXES = ('www.', 'm.', 'mobile.', 'amp.')
+
+AMP_CACHE_RE = re.compile(r'^[^/]+\.cdn\.ampproject\.org$')
+AMP_PATH_SUFFIX_RE = re.compile(r'(/amp|\.amp|/amp\.html)/?$')
+
+
+def _unwrap_amp_cache(host: str, path: str) -> str | None:
+    """Return the publisher URL for Google AMP cache and viewer links."""
+    # https://example-com.cdn.ampproject.org/c/s/example.com/article
+    # https://www.google.com/amp/s/example.com/article
+    if AMP_CACHE_RE.match(host) or (host in ('google.com', 'www.google.com') and path.startswith('/amp/')):
+        parts = path.lstrip('/').split('/')
+        if parts and parts[0] in ('c', 'v', 'i', 'amp'):
+            parts = parts[1:]
+        if parts and parts[0] in ('s', 'c', 'v', 'i'):
+            parts = parts[1:]
+        if parts and '.' in parts[0]:
+            return 'https://' + '/'.join(parts)
+    return None
+
+
+@lru_cache(maxsize=8192)
+def canonicalize_url(url: str) -> str:
+    """Return the canonical form of a URL used to identify a document across stages.
+
+    - scheme forced to https, host lowercased, default port removed
+    - www., m., mobile. and amp. host prefixes removed
+    - AMP cache links unwrapped and /amp path suffixes removed
+    - tracking query parameters removed, remaining ones sorted
+    - fragment and trailing slash removed
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url.lstrip('/')
+
+    try:
+        parts = urlsplit(url)
+        # Reading the port validates it (non-numeric or out of range)
+        port = parts.port
+    except ValueError as e:
+        logger.debug("URL invalide %s : %s", url, e)
+        return url
+
+    host = (parts.hostname or '').rstrip('.')
+    path = parts.path or ''
+
+    if unwrapped := _unwrap_amp_cache(host, path):
+        return canonicalize_url(unwrapped)
+
+    for prefix in MIRROR_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+
+    netloc = host
+    if port and port not in (80, 443):
+        netloc = f"{host}:{port}"
+
+    path = re.sub(r'/{2,}', '/', path)
+    path = AMP_PATH_SUFFIX_RE.sub('', path).rstrip('/')
+
+    query_items = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(query_items))
+
+    return urlunsplit(('https', netloc, path, query, ''))
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from backend.nodes.curator import Curator
+
+
+@pytest.fixture
+def curator(monkeypatch):
+    monkeypatch.setenv("CURATION_THRESHOLD_MODE", "adaptive")
+    return Curator()
+
+
+def _docs(scores):
+    return [{"score": score, "url": f"https://example.com/{i}"} for i, score in enumerate(scores)]
+
+
+def test_category_under_the_target_keeps_every_document_above_the_floor(curator):
+    # 4 queries x 5 results, most of them relevant
+    scores = [0.9, 0.88, 0.85, 0.83, 0.8, 0.78, 0.77, 0.75, 0.74, 0.72,
+              0.7, 0.69, 0.66, 0.64, 0.6, 0.42, 0.35, 0.3, 0.25, 0.15]
+
+    threshold = curator.calibrate_threshold(_docs(scores))
+
+    assert threshold == curator.min_relevance_score
+    assert sum(score >= threshold for score in scores) == 19
+
+
+def test_category_above_the_target_keeps_a_pool_for_mmr(curator):
+    rng = random.Random(0)
+    scores = [rng.uniform(0.1, 0.95) for _ in range(60)]
+
+    threshold = curator.calibrate_threshold(_docs(scores))
+
+    kept = sum(score >= threshold for score in scores)
+    assert kept == 38  # ceil(30 * 1.25)
+    assert threshold > curator.min_relevance_score
+
+
+def test_threshold_never_goes_below_the_floor(curator):
+    scores = [0.1 + i * 0.003 for i in range(50)]
+
+    assert curator.calibrate_threshold(_docs(scores)) == curator.min_relevance_score
+
+
+def test_company_site_pages_do_not_count(curator):
+    rng = random.Random(1)
+    docs = _docs([rng.uniform(0.3, 0.9) for _ in range(40)])
+    site_pages = [{"url": f"https://acme.com/{i}", "score": 0, "source": "site_entreprise"} for i in range(20)]
+
+    assert curator.calibrate_threshold(docs + site_pages) == curator.calibrate_threshold(docs)
+
+
+def test_fixed_mode_uses_configured_threshold(monkeypatch):
+    monkeypatch.setenv("CURATION_THRESHOLD_MODE", "fixed")
+    curator = Curator()
+
+    assert curator.calibrate_threshold(_docs([0.9] * 20)) == curator.relevance_threshold
+
+
+def _evaluated(source, content, score, title=""):
+    return {"title": title, "content": content, "url": f"https://example.com/{source}",
+            "source": source, "evaluation": {"overall_score": score}}
+
+
+def test_select_diverse_drops_redundant_documents_below_target(curator):
+    title = "Acme raises $50M Series B"
+    story = "Acme raises 50 million dollars in series B funding led by Sequoia to expand in Europe"
+    docs = [
+        _evaluated("techcrunch", story, 0.95, title),
+        _evaluated("reuters", story + " next year", 0.93, title),
+        _evaluated("yahoo", story, 0.9, title),
+        _evaluated("product", "Acme launches a new analytics platform for retail customers", 0.8),
+        _evaluated("hiring", "Acme appoints a former Stripe executive as chief financial officer", 0.7),
+    ]
+    assert len(docs) < curator.target_doc_count
+
+    kept = [doc["source"] for doc in curator.select_diverse(docs)]
+
+    assert kept == ["techcrunch", "product", "hiring"]
+
+
+def test_select_diverse_keeps_distinct_documents_in_score_order(curator):
+    docs = [
+        _evaluated("funding", "Acme raises 50 million dollars in series B funding", 0.9),
+        _evaluated("product", "Acme launches a new analytics platform for retail customers", 0.85),
+        _evaluated("hiring", "Acme appoints a former Stripe executive as chief financial officer", 0.8),
+    ]
+
+    assert curator.select_diverse(docs) == docs
+
+
+def test_select_diverse_disabled_with_pure_score_weight(monkeypatch):
+    monkeypatch.setenv("CURATION_MMR_WEIGHT", "1")
+    curator = Curator()
+    docs = [_evaluated(str(i), "same text", 0.9) for i in range(3)]
+
+    assert curator.select_diverse(docs) == docs
@@ -0,0 +1,135 @@
+import asyncio
+
+from backend.services.event_bus import EventBus, InProcessBackend, SQLiteBackend, is_final
+
+
+def test_lossless_subscription_keeps_final_statuses():
+    async def scenario():
+        bus = EventBus(InProcessBackend(), max_queue=2)
+        persisted, logged = [], []
+
+        async def persist(event):
+            await asyncio.sleep(0.001)
+            persisted.append((event.job_id, event.status))
+
+        async def log(event):
+            await asyncio.sleep(0.001)
+            logged.append(event)
+
+        persistence = bus.subscribe(persist, name="db", predicate=is_final, lossless=True)
+        logs = bus.subscribe(log, name="logs")
+        await bus.start()
+        for job in ("a", "b", "c"):
+            for _ in range(20):
+                bus.publish_status(job, "processing", "en cours")
+            bus.publish_status(job, "completed", "terminé")
+        await bus.stop()
+        return persisted, persistence.snapshot(), logs.snapshot()
+
+    persisted, persistence, logs = asyncio.run(scenario())
+
+    assert persisted == [("a", "completed"), ("b", "completed"), ("c", "completed")]
+    assert persistence["dropped"] == 0
+    # A bounded subscriber still sheds load
+    assert logs["dropped"] > 0
+
+
+def test_predicate_filters_inline_subscriptions():
+    async def scenario():
+        bus = EventBus(InProcessBackend())
+        received = []
+        bus.subscribe(received.append, predicate=lambda event: event.status == "failed")
+        bus.publish_status("a", "processing", "en cours")
+        bus.publish_status("a", "failed", "échec", error="boom")
+        return received
+
+    received = asyncio.run(scenario())
+
+    assert [event.status for event in received] == ["failed"]
+    assert is_final(received[0])
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_sqlite_backend_delivers_events_across_buses(tmp_path):
+    path = str(tmp_path / "events.sqlite3")
+
+    async def scenario():
+        runner = EventBus(SQLiteBackend(path, poll_interval=0.01))
+        viewer = EventBus(SQLiteBackend(path, poll_interval=0.01))
+        on_runner, on_viewer, persisted = [], [], []
+        runner.subscribe(on_runner.append, name="websocket")
+        viewer.subscribe(on_viewer.append, name="websocket")
+        # Persistence runs once, on the worker that runs the job
+        viewer.subscribe(persisted.append, name="mongodb", local_only=True)
+        await runner.start()
+        await viewer.start()
+        try:
+            runner.publish_status("job", "processing", "recherche")
+            runner.publish("job", "state_update", {"node": "curator"})
+            runner.publish_status("job", "completed", "terminé", result={"report": "# Acme"})
+            await _wait_for(lambda: len(on_viewer) == 3)
+            replayed = await viewer.replay("job", last_seq=1)
+            final = await viewer.last_status("job", "completed")
+        finally:
+            await runner.stop()
+            await viewer.stop()
+        return on_runner, on_viewer, persisted, replayed, final, viewer.snapshot()
+
+    on_runner, on_viewer, persisted, replayed, final, snapshot = asyncio.run(scenario())
+
+    assert [event.seq for event in on_viewer] == [1, 2, 3]
+    assert on_viewer == on_runner
+    assert persisted == []
+    assert [event.seq for event in replayed] == [2, 3]
+    assert final.data["result"]["report"] == "# Acme"
+    assert snapshot["received"] == 3
+
+
+def test_in_process_replay_keeps_the_latest_events_and_jobs():
+    async def scenario():
+        bus = EventBus(InProcessBackend(replay_size=3, max_jobs=2))
+        for job in ("a", "b", "c"):
+            for step in range(5):
+                bus.publish_status(job, "processing", str(step))
+        return await bus.replay("a"), await bus.replay("c"), await bus.replay("c", last_seq=4)
+
+    evicted, latest, after = asyncio.run(scenario())
+
+    assert evicted == []
+    assert [event.seq for event in latest] == [3, 4, 5]
+    assert [event.seq for event in after] == [5]
+
+
+def test_sqlite_backend_skips_unserializable_events(tmp_path):
+    path = str(tmp_path / "events.sqlite3")
+
+    async def scenario():
+        runner = EventBus(SQLiteBackend(path, poll_interval=0.01))
+        viewer = EventBus(SQLiteBackend(path, poll_interval=0.01))
+        local, remote = [], []
+        runner.subscribe(local.append)
+        viewer.subscribe(remote.append)
+        await runner.start()
+        await viewer.start()
+        try:
+            runner.publish_status("job", "processing", "avant")
+            runner.publish_status("job", "processing", "illisible", result={"at": object()})
+            runner.publish_status("job", "completed", "après")
+            await _wait_for(lambda: len(remote) == 2)
+            await asyncio.sleep(0.05)
+        finally:
+            await runner.stop()
+            await viewer.stop()
+        return local, remote
+
+    local, remote = asyncio.run(scenario())
+
+    # Local transports got every event; other workers get the serializable ones
+    assert [event.seq for event in local] == [1, 2, 3]
+    assert [(event.seq, event.status) for event in remote] == [(1, "processing"), (3, "completed")]
@@ -0,0 +1,171 @@
+import asyncio
+
+from backend.services.llm_batch import BatchBackend, BatchQueue, BatchRequest, LocalBatchBackend, OpenAIBatchBackend
+from backend.services.llm_gateway import FakeProvider
+
+MESSAGES = [{"role": "user", "content": "Résumez Acme"}]
+
+
+class RecordingBackend(BatchBackend):
+    def __init__(self):
+        self.batches = []
+
+    async def run(self, requests):
+        self.batches.append(requests)
+        return {
+            request.custom_id: RuntimeError("refusé") if request.model == "refused"
+            else f"{request.model}:{request.messages[0]['content']}"
+            for request in requests
+        }
+
+
+def test_flush_when_the_batch_is_full():
+    backend = RecordingBackend()
+
+    async def scenario():
+        queue = BatchQueue(lambda provider: backend, max_size=3, window=60)
+        return await asyncio.wait_for(
+            asyncio.gather(*[queue.submit("openai", "m", [{"role": "user", "content": str(i)}], {}) for i in range(3)]),
+            timeout=1
+        ), queue.snapshot()
+
+    results, snapshot = asyncio.run(scenario())
+
+    assert results == ["m:0", "m:1", "m:2"]
+    assert [len(batch) for batch in backend.batches] == [3]
+    assert snapshot == {"waiting": 0, "batches_sent": 1}
+
+
+def test_flush_after_the_window():
+    backend = RecordingBackend()
+
+    async def scenario():
+        queue = BatchQueue(lambda provider: backend, max_size=50, window=0.05)
+        first = asyncio.create_task(queue.submit("openai", "m", [{"role": "user", "content": "a"}], {}))
+        second = asyncio.create_task(queue.submit("openai", "m", [{"role": "user", "content": "b"}], {}))
+        await asyncio.sleep(0.01)
+        waiting = queue.snapshot()["waiting"]
+        return waiting, await first, await second
+
+    waiting, first, second = asyncio.run(scenario())
+
+    assert waiting == 2
+    assert (first, second) == ("m:a", "m:b")
+    assert [len(batch) for batch in backend.batches] == [2]
+
+
+def test_batches_are_per_provider_and_model_and_errors_reach_their_caller():
+    backend = RecordingBackend()
+
+    async def scenario():
+        queue = BatchQueue(lambda provider: backend, max_size=50, window=0.01)
+        return await asyncio.gather(
+            queue.submit("openai", "gpt-4.1", MESSAGES, {}),
+            queue.submit("openai", "gpt-4.1-mini", MESSAGES, {}),
+            queue.submit("openai", "gpt-4.1", MESSAGES, {}),
+            queue.submit("gemini", "refused", MESSAGES, {}),
+            return_exceptions=True
+        )
+
+    *ok, error = asyncio.run(scenario())
+
+    assert ok == ["gpt-4.1:Résumez Acme", "gpt-4.1-mini:Résumez Acme", "gpt-4.1:Résumez Acme"]
+    assert isinstance(error, RuntimeError)
+    # One model per batch file, as provider batch APIs require
+    assert sorted((batch[0].provider, {r.model for r in batch}, len(batch)) for batch in backend.batches) == [
+        ("gemini", {"refused"}, 1), ("openai", {"gpt-4.1"}, 2), ("openai", {"gpt-4.1-mini"}, 1)
+    ]
+
+
+class SlowProvider(FakeProvider):
+    async def complete(self, model, messages, **params):
+        await asyncio.sleep(1)
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.calls = []
+
+    async def acquire(self, provider, tokens=0):
+        self.calls.append(("acquire", provider))
+
+    async def debit(self, provider, tokens):
+        self.calls.append(("debit", provider))
+
+
+def test_local_backend_charges_the_limiter_and_bounds_each_call():
+    limiter = RecordingLimiter()
+    backend = LocalBatchBackend({"fake": FakeProvider(), "slow": SlowProvider()}, timeout=0.05, limiter=limiter)
+    queue = BatchQueue(lambda provider: backend, max_size=50, window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(
+            queue.submit("fake", "m", MESSAGES, {}),
+            queue.submit("slow", "m", MESSAGES, {}),
+            return_exceptions=True
+        )
+
+    result, error = asyncio.run(scenario())
+
+    assert result.text
+    assert isinstance(error, asyncio.TimeoutError)
+    assert limiter.calls.count(("acquire", "fake")) == 1 and limiter.calls.count(("debit", "fake")) == 1
+    assert ("debit", "slow") not in limiter.calls
+
+
+def test_backend_failure_fails_every_request_of_the_batch():
+    class BrokenBackend(BatchBackend):
+        async def run(self, requests):
+            raise ConnectionError("fournisseur injoignable")
+
+    async def scenario():
+        queue = BatchQueue(lambda provider: BrokenBackend(), max_size=2, window=60)
+        return await asyncio.gather(
+            *[queue.submit("openai", "m", MESSAGES, {}) for _ in range(2)], return_exceptions=True
+        )
+
+    assert all(isinstance(error, ConnectionError) for error in asyncio.run(scenario()))
+
+
+class FakeBatches:
+    """OpenAI client stub whose batch never completes."""
+
+    def __init__(self):
+        self.cancelled = []
+        self.files = self
+        self.batches = self
+
+    async def create(self, **kwargs):
+        return type("Remote", (), {"id": "batch_1", "status": "in_progress", "output_file_id": None})()
+
+    async def retrieve(self, batch_id):
+        return await self.create()
+
+    async def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+
+def test_openai_batch_is_cancelled_at_its_deadline():
+    client = FakeBatches()
+    backend = OpenAIBatchBackend(client, poll_interval=0.01, timeout=0.05)
+
+    results = asyncio.run(backend.run([BatchRequest("r1", "openai", "gpt-4.1", MESSAGES, {})]))
+
+    assert isinstance(results["r1"], asyncio.TimeoutError)
+    assert client.cancelled == ["batch_1"]
+
+
+def test_openai_batch_is_cancelled_with_its_run():
+    client = FakeBatches()
+    backend = OpenAIBatchBackend(client, poll_interval=0.01)
+
+    async def scenario():
+        task = asyncio.create_task(backend.run([BatchRequest("r1", "openai", "gpt-4.1", MESSAGES, {})]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert backend.timeout == 86400
+    assert client.cancelled == ["batch_1"]
@@ -0,0 +1,350 @@
+import asyncio
+
+import pytest
+
+from backend.services.llm_gateway import FakeProvider, LLMGateway
+from backend.services.llm_router import LLMRouter
+
+MESSAGES = [{"role": "user", "content": "Résumez Acme"}]
+
+
+class FailingProvider(FakeProvider):
+    """Fails every call, or only the calls to `models`."""
+
+    def __init__(self, models=None):
+        super().__init__()
+        self.models = models
+
+    async def complete(self, model, messages, **params):
+        if self.models is None or model in self.models:
+            raise RuntimeError(f"{model} indisponible")
+        return await super().complete(model, messages, **params)
+
+    async def stream(self, model, messages, **params):
+        if self.models is None or model in self.models:
+            raise RuntimeError(f"{model} indisponible")
+        async for text in super().stream(model, messages, **params):
+            yield text
+
+
+def make_gateway(provider, **kwargs):
+    router = LLMRouter(routes={"briefing": [("test", "primary"), ("test", "fallback")]})
+    gateway = LLMGateway(router, backoff=0, **kwargs)
+    gateway.register("test", provider)
+    return gateway
+
+
+def test_on_route_reports_the_failover_model():
+    gateway = make_gateway(FailingProvider(models={"primary"}), retries=0)
+    routes = []
+
+    text = asyncio.run(gateway.complete("briefing", MESSAGES, on_route=lambda *route: routes.append(route)))
+
+    assert text
+    assert routes == [("test", "fallback")]
+
+
+def test_stream_on_route_reports_the_serving_model():
+    gateway = make_gateway(FailingProvider(models={"primary"}), retries=0)
+    routes = []
+
+    async def collect():
+        return "".join([text async for text in gateway.stream(
+            "briefing", MESSAGES, on_route=lambda *route: routes.append(route)
+        )])
+
+    assert asyncio.run(collect())
+    assert routes == [("test", "fallback")]
+
+
+def test_all_routes_failing_raises_the_last_error():
+    gateway = make_gateway(FailingProvider(), retries=0)
+
+    with pytest.raises(RuntimeError, match="fallback"):
+        asyncio.run(gateway.complete("briefing", MESSAGES))
+
+
+class FlakyProvider(FakeProvider):
+    """Fails the first `failures` calls, then answers."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    async def complete(self, model, messages, **params):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("erreur transitoire")
+        return await super().complete(model, messages, **params)
+
+
+class SlowStreamProvider(FakeProvider):
+    """Streams from `slow_models` only after `delay` seconds."""
+
+    def __init__(self, slow_models, delay):
+        super().__init__()
+        self.slow_models = slow_models
+        self.slow_delay = delay
+
+    async def stream(self, model, messages, **params):
+        if model in self.slow_models:
+            await asyncio.sleep(self.slow_delay)
+        async for text in super().stream(model, messages, **params):
+            yield text
+
+
+def test_retries_on_the_same_route_before_failing_over():
+    provider = FlakyProvider(failures=1)
+    gateway = make_gateway(provider, retries=1)
+    routes = []
+
+    asyncio.run(gateway.complete("briefing", MESSAGES, on_route=lambda *route: routes.append(route)))
+
+    assert provider.attempts == 2
+    assert routes == [("test", "primary")]
+    assert [decision["model"] for decision in gateway.router.decisions] == ["primary"]
+
+
+def test_fails_over_once_retries_are_exhausted():
+    provider = FlakyProvider(failures=2)
+    gateway = make_gateway(provider, retries=1)
+
+    asyncio.run(gateway.complete("briefing", MESSAGES))
+
+    assert provider.attempts == 3
+    decisions = [(decision["model"], decision["ok"], decision["reason"]) for decision in gateway.router.decisions]
+    assert decisions == [("primary", False, "preferred"), ("fallback", True, "failover")]
+
+
+def test_stream_times_out_before_the_first_chunk_and_fails_over():
+    gateway = make_gateway(SlowStreamProvider({"primary"}, delay=1), retries=0, timeout=0.05)
+    routes = []
+
+    async def collect():
+        return "".join([text async for text in gateway.stream(
+            "briefing", MESSAGES, on_route=lambda *route: routes.append(route)
+        )])
+
+    assert asyncio.run(collect())
+    assert routes == [("test", "fallback")]
+
+
+def test_stream_timeout_on_every_route_raises():
+    gateway = make_gateway(SlowStreamProvider({"primary", "fallback"}, delay=1), retries=0, timeout=0.05)
+
+    async def collect():
+        return [text async for text in gateway.stream("briefing", MESSAGES)]
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(collect())
+
+
+def test_cache_hit_skips_the_provider_and_is_accounted():
+    provider = FakeProvider()
+    gateway = make_gateway(provider)
+
+    async def twice():
+        first = await gateway.complete("briefing", MESSAGES, job_id="job", temperature=0)
+        second = await gateway.complete("briefing", MESSAGES, job_id="job", temperature=0)
+        # Other parameters are another cache entry
+        await gateway.complete("briefing", MESSAGES, job_id="job", temperature=1)
+        return first, second
+
+    first, second = asyncio.run(twice())
+
+    assert first == second
+    assert provider.calls == 2
+    stats = gateway.job_usage("job")["stages"]["briefing"]
+    assert stats["calls"] == 3 and stats["cached"] == 1
+
+
+def test_cache_is_bounded():
+    gateway = make_gateway(FakeProvider(), cache_size=2)
+
+    async def fill():
+        for i in range(3):
+            await gateway.complete("briefing", [{"role": "user", "content": f"prompt {i}"}])
+
+    asyncio.run(fill())
+
+    assert len(gateway._cache) == 2
+
+
+def test_usage_is_accounted_per_job_and_stage():
+    gateway = make_gateway(FakeProvider())
+
+    async def run():
+        await gateway.complete("briefing", MESSAGES, job_id="a", cache=False)
+        await gateway.complete("briefing", MESSAGES, job_id="a", cache=False)
+        return "".join([text async for text in gateway.stream("briefing", MESSAGES, job_id="b", cache=False)])
+
+    streamed = asyncio.run(run())
+
+    usage = gateway.job_usage("a")
+    assert usage["stages"]["briefing"]["calls"] == 2
+    assert usage["total"]["input_tokens"] > 0 and usage["total"]["output_tokens"] > 0
+    assert usage["total"]["cached"] == 0
+    assert gateway.job_usage("b")["total"]["calls"] == 1
+    assert gateway.job_usage("b")["total"]["output_tokens"] == gateway.job_usage("a")["stages"]["briefing"]["output_tokens"] // 2
+    assert streamed
+    assert gateway.job_usage("missing")["total"]["calls"] == 0
+
+
+def test_usage_keeps_the_latest_jobs_only():
+    gateway = make_gateway(FakeProvider(), max_jobs=2)
+
+    async def run():
+        for job in ("a", "b", "c"):
+            await gateway.complete("briefing", MESSAGES, job_id=job)
+
+    asyncio.run(run())
+
+    assert list(gateway.usage) == ["b", "c"]
+
+
+def test_batch_jobs_go_through_the_queue_within_the_batch_timeout():
+    from backend.services.llm_batch import BatchBackend
+
+    class StuckBackend(BatchBackend):
+        async def run(self, requests):
+            await asyncio.sleep(10)
+
+    gateway = make_gateway(FakeProvider(), batch_timeout=0.1)
+    gateway.batch_queue.window = 0.01
+    gateway.batch_jobs.update({"nightly", "stuck"})
+    routes = []
+
+    async def run():
+        text = await gateway.complete("briefing", MESSAGES, job_id="nightly", on_route=lambda *route: routes.append(route))
+        gateway.batch_backends["test"] = StuckBackend()
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.complete("briefing", MESSAGES, job_id="stuck", cache=False)
+        return text
+
+    assert asyncio.run(run())
+    assert routes == [("test", "primary")]
+    assert gateway.batch_queue.batches_sent == 2
+
+
+class SlowLimiter:
+    def __init__(self, delay):
+        self.delay = delay
+        self.acquired = []
+
+    async def acquire(self, provider, tokens=0):
+        await asyncio.sleep(self.delay)
+        self.acquired.append(provider)
+        return self.delay
+
+    async def debit(self, provider, tokens):
+        pass
+
+
+def test_quota_wait_is_not_recorded_as_route_latency():
+    gateway = make_gateway(FakeProvider(), limiter=SlowLimiter(0.1))
+
+    asyncio.run(gateway.complete("briefing", MESSAGES))
+
+    assert gateway.limiter.acquired == ["test"]
+    decision = gateway.router.decisions[-1]
+    assert decision["ok"] and decision["latency"] < 0.05
+
+
+def test_quota_timeout_skips_the_provider_without_penalizing_it():
+    gateway = make_gateway(FakeProvider(), limiter=SlowLimiter(1), quota_timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gateway.complete("briefing", MESSAGES))
+
+    # Both routes share the provider's bucket: one wait, no route marked as failing
+    assert len(gateway.router.decisions) == 0
+    assert all(not stats.samples for stats in gateway.router.stats.values())
+
+
+class TrackedStream:
+    """Async iterator of numbered chunks, like an SDK stream object; stalls after `stall_after` chunks."""
+
+    def __init__(self, stall_after):
+        self.sent = 0
+        self.stall_after = stall_after
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.sent == 5:
+            raise StopAsyncIteration
+        if self.sent == self.stall_after:
+            await asyncio.sleep(10)
+        self.sent += 1
+        return f"{self.sent - 1},"
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TrackedStreamProvider(FakeProvider):
+    def __init__(self, stall_after=None):
+        super().__init__()
+        self.stall_after = stall_after
+        self.streams = []
+
+    def stream(self, model, messages, **params):
+        self.streams.append(TrackedStream(self.stall_after))
+        return self.streams[-1]
+
+
+def test_stream_closes_the_provider_stream_on_a_mid_stream_timeout():
+    provider = TrackedStreamProvider(stall_after=2)
+    gateway = make_gateway(provider, timeout=0.05)
+    received = []
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            async for text in gateway.stream("briefing", MESSAGES, cache=False):
+                received.append(text)
+        return [stream.closed for stream in provider.streams]
+
+    assert asyncio.run(run()) == [True]
+    assert received == ["0,", "1,"]
+    # Not cached and not accounted as a completed call
+    assert not gateway._cache and gateway.job_usage("-")["total"]["calls"] == 0
+
+
+def test_stream_closes_the_provider_stream_on_a_first_chunk_timeout():
+    provider = TrackedStreamProvider(stall_after=0)
+    gateway = make_gateway(provider, retries=0, timeout=0.05)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in gateway.stream("briefing", MESSAGES):
+                pass
+        return [stream.closed for stream in provider.streams]
+
+    # Both routes were tried, and both streams released
+    assert asyncio.run(run()) == [True, True]
+
+
+def test_stream_closes_the_provider_stream_when_the_consumer_stops():
+    from contextlib import aclosing
+
+    provider = TrackedStreamProvider()
+    gateway = make_gateway(provider)
+
+    async def first_chunk():
+        async with aclosing(gateway.stream("briefing", MESSAGES)) as stream:
+            async for text in stream:
+                break
+        return text, [stream.closed for stream in provider.streams]
+
+    assert asyncio.run(first_chunk()) == ("0,", [True])
+    assert not gateway._cache
+
+
+def test_router_rejects_empty_route_list(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTES_BRIEFING", " , openai")
+
+    with pytest.raises(ValueError, match="LLM_ROUTES_BRIEFING"):
+        LLMRouter.from_env()
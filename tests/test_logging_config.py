@@ -0,0 +1,25 @@
+import logging
+
+from backend.utils.logging_config import SamplingFilter
+
+
+def _record(message, lineno=10, level=logging.INFO):
+    return logging.LogRecord("backend.test", level, "/app/backend/test.py", lineno, message, None, None)
+
+
+def test_sampling_groups_formatted_messages_by_call_site():
+    sampler = SamplingFilter(every=3)
+
+    kept = [sampler.filter(_record(f"Document {i} retenu")) for i in range(9)]
+
+    assert kept.count(True) == 3
+    assert len(sampler._counts) == 1
+
+
+def test_sampling_counts_call_sites_separately_and_keeps_warnings():
+    sampler = SamplingFilter(every=2)
+
+    assert sampler.filter(_record("a", lineno=1))
+    assert sampler.filter(_record("a", lineno=2))
+    assert not sampler.filter(_record("a", lineno=1))
+    assert all(sampler.filter(_record("échec", lineno=3, level=logging.WARNING)) for _ in range(4))
@@ -0,0 +1,68 @@
+from backend.utils.markdown import normalize_report, section_body
+
+ALL_SECTIONS = ["Présentation de l’entreprise", "Présentation du secteur", "Présentation financière", "Actualités"]
+
+
+def test_numbered_and_paraphrased_headings_are_recognized():
+    text = "## 1. Présentation de l’entreprise\nAcme fait X.\n## Aperçu du secteur\nMarché Y.\n## Actualités\nZ."
+
+    report = normalize_report(text, "Acme")
+
+    assert report == (
+        "# Rapport de recherche sur Acme\n\n"
+        "## Présentation de l’entreprise\nAcme fait X.\n\n"
+        "## Présentation du secteur\nMarché Y.\n\n"
+        "## Actualités\nZ."
+    )
+
+
+def test_heading_extending_a_section_name_goes_to_that_section():
+    text = (
+        "## Présentation de l’entreprise\nAcme.\n"
+        "## Présentation financière et investissements\nLevée de 50 M$.\n"
+        "## II. Actualités récentes\nLancement."
+    )
+
+    report = normalize_report(text, "Acme")
+
+    assert "## Présentation financière\nLevée de 50 M$." in report
+    assert "## Actualités\nLancement." in report
+    assert "###" not in report
+
+
+def test_unmatched_section_before_the_first_one_is_kept():
+    text = "## Synthèse\nPoints clés.\n## Présentation de l’entreprise\nAcme."
+
+    report = normalize_report(text, "Acme")
+
+    assert report.index("## Présentation de l’entreprise") < report.index("## Synthèse\nPoints clés.")
+
+
+def test_subheadings_inside_a_section_are_demoted():
+    report = normalize_report("## Entreprise\nAcme.\n## Produits\nWidgets.", "Acme")
+
+    assert report.endswith("## Présentation de l’entreprise\nAcme.\n\n### Produits\nWidgets.")
+
+
+def test_missing_required_section_keeps_compiled_text():
+    text = "Acme fait X.\n\nLe marché croît."
+
+    report = normalize_report(text, "Acme", "## Références\n* a", required=ALL_SECTIONS)
+
+    assert report == "Acme fait X.\n\nLe marché croît.\n\n## Références\n* a"
+
+    text = "```markdown\nAcme fait X.\n\n## Sources\n* faux\n```"
+    report = normalize_report(text, "Acme", "## Références\n* a", required=ALL_SECTIONS)
+
+    assert report == "Acme fait X.\n\n## Références\n* a"
+
+
+def test_model_references_are_replaced():
+    report = normalize_report("## Actualités\nZ.\n## Sources\n* faux", "Acme", "## Références\n* vrai")
+
+    assert "faux" not in report
+    assert report.endswith("## Références\n* vrai")
+
+
+def test_section_body_drops_repeated_numbered_heading():
+    assert section_body("## 3. Présentation financière\nCA en hausse.", "Présentation financière") == "CA en hausse."
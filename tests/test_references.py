@@ -0,0 +1,13 @@
+from backend.utils.references import ReferenceIndex
+
+
+def test_duplicates_are_merged_but_cited_as_found():
+    index = ReferenceIndex()
+    index.add("https://m.example.com/a/amp", 0.4, "Article")
+    index.add("https://example.com/a", 0.9)
+
+    urls, titles, info = index.top(10)
+
+    assert urls == ["https://m.example.com/a/amp"]
+    assert titles == {"https://m.example.com/a/amp": "Article"}
+    assert info["https://m.example.com/a/amp"]["score"] == 0.9
@@ -0,0 +1,14 @@
+from backend.utils.urls import canonicalize_url
+
+
+def test_canonical_form_drops_mirrors_and_tracking():
+    assert canonicalize_url("http://m.Example.com/a/amp/?utm_source=x&b=2&a=1#top") == "https://example.com/a?a=1&b=2"
+
+
+def test_invalid_port_returns_url_unchanged():
+    assert canonicalize_url("http://example.com:abc/x") == "http://example.com:abc/x"
+    assert canonicalize_url("http://example.com:99999/x") == "http://example.com:99999/x"
+
+
+def test_non_default_port_is_kept():
+    assert canonicalize_url("http://example.com:8080/x/") == "https://example.com:8080/x"
@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+from backend.services.event_bus import JobEvent
+from backend.services.websocket_manager import WebSocketManager
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = []
+        self.close_code = None
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+    def statuses(self):
+        return [message["data"]["status"] for message in self.received]
+
+
+def make_manager(max_queue=8, send_timeout=1.0):
+    manager = WebSocketManager()
+    manager.max_queue = max_queue
+    manager.send_timeout = send_timeout
+    return manager
+
+
+def status(job_id, seq, name, **result):
+    return JobEvent(job_id, seq, "status_update", {"status": name, "message": None, "error": None, "result": result}, "t")
+
+
+def test_consecutive_chunks_are_coalesced():
+    async def scenario():
+        manager = make_manager()
+        socket = FakeSocket()
+        await manager.connect(socket, "job")
+        for seq, text in enumerate(["Acme ", "lève ", "50M"], 1):
+            manager.deliver(status("job", seq, "report_chunk", chunk=text))
+        manager.deliver(status("job", 4, "processing"))
+        await asyncio.sleep(0.05)
+        return socket, manager.clients[socket]
+
+    socket, client = asyncio.run(scenario())
+
+    assert socket.statuses() == ["report_chunk", "processing"]
+    assert socket.received[0]["data"]["result"]["chunk"] == "Acme lève 50M"
+    assert client.coalesced == 2
+
+
+def test_full_queue_drops_low_priority_and_keeps_chunk_text():
+    async def scenario():
+        manager = make_manager(max_queue=3)
+        socket = FakeSocket()
+        await manager.connect(socket, "job")
+        client = manager.clients[socket]
+        seq = 0
+        # Alternate streams so that chunks cannot merge with the previous message
+        for i in range(4):
+            seq += 1
+            manager.deliver(status("job", seq, "report_chunk", category="report", chunk=f"{i},"))
+            seq += 1
+            manager.deliver(status("job", seq, "document_kept", url=f"https://example.com/{i}"))
+        seq += 1
+        manager.deliver(status("job", seq, "completed"))
+        await asyncio.sleep(0.05)
+        return socket, client
+
+    socket, client = asyncio.run(scenario())
+
+    chunks = "".join(m["data"]["result"]["chunk"] for m in socket.received if m["data"]["status"] == "report_chunk")
+    assert chunks == "0,1,2,3,"
+    assert socket.statuses()[-1] == "completed"
+    assert client.dropped > 0
+    assert socket.close_code is None
+
+
+def test_client_full_of_important_messages_is_evicted():
+    async def scenario():
+        manager = make_manager(max_queue=2, send_timeout=5)
+        socket = FakeSocket(delay=1)
+        await manager.connect(socket, "job")
+        for seq in range(1, 5):
+            manager.deliver(status("job", seq, "processing", step=seq))
+        await asyncio.sleep(0.01)
+        return socket, manager
+
+    socket, manager = asyncio.run(scenario())
+
+    assert socket.close_code == 1013
+    assert manager.evicted == 1
+    assert "job" not in manager.active_connections
+
+
+def test_client_blocked_on_send_is_evicted():
+    async def scenario():
+        manager = make_manager(send_timeout=0.05)
+        socket = FakeSocket(delay=1)
+        await manager.connect(socket, "job")
+        manager.deliver(status("job", 1, "processing"))
+        await asyncio.sleep(0.2)
+        return socket, manager
+
+    socket, manager = asyncio.run(scenario())
+
+    assert socket.close_code == 1013
+    assert manager.snapshot() == {"evicted": 1, "jobs": {}}
+
+
+def test_replay_is_sent_first_without_duplicates():
+    async def scenario():
+        manager = make_manager()
+        socket = FakeSocket()
+        backlog_ready = asyncio.Event()
+
+        async def backlog():
+            await backlog_ready.wait()
+            # The store also returns seq 3, already received live
+            return [status("job", seq, "processing", step=seq) for seq in (1, 2, 3)]
+
+        connecting = asyncio.create_task(manager.connect(socket, "job", backlog()))
+        await asyncio.sleep(0)
+        # Live events published while the backlog is being read
+        for seq in (3, 4):
+            manager.deliver(status("job", seq, "processing", step=seq))
+        backlog_ready.set()
+        await connecting
+        # Late duplicates, e.g. from another worker's poller, are ignored
+        manager.deliver(status("job", 2, "processing", step=2))
+        manager.deliver(status("job", 5, "processing", step=5))
+        await asyncio.sleep(0.05)
+        return socket
+
+    socket = asyncio.run(scenario())
+
+    assert [message["seq"] for message in socket.received] == [1, 2, 3, 4, 5]
+
+
+def test_folded_chunk_keeps_seq_order_across_a_reconnect():
+    from backend.services.event_bus import EventBus, InProcessBackend
+
+    def publish_burst(bus):
+        bus.publish_status("job", "report_chunk", result={"category": "report", "chunk": "Acme "})
+        bus.publish_status("job", "processing", "compilation")
+        bus.publish_status("job", "document_kept", result={"url": "https://example.com"})
+        # Queue full: this chunk is merged with the first one
+        bus.publish_status("job", "report_chunk", result={"category": "report", "chunk": "lève 50M"})
+
+    async def scenario():
+        bus = EventBus(InProcessBackend())
+        manager = make_manager(max_queue=3)
+        bus.subscribe(manager.deliver)
+        first = FakeSocket()
+        got_one = asyncio.Event()
+        send_text = first.send_text
+
+        async def send_once(text):
+            await send_text(text)
+            got_one.set()
+
+        first.send_text = send_once
+        await manager.connect(first, "job", bus.replay("job"))
+        publish_burst(bus)
+        queued = [message["seq"] for _, message, _ in manager.clients[first].queue]
+        # The client drops after the first message it gets
+        await got_one.wait()
+        manager.disconnect(first, "job")
+        last_seq = max(message["seq"] for message in first.received)
+        second = FakeSocket()
+        await manager.connect(second, "job", bus.replay("job", last_seq))
+        await asyncio.sleep(0.05)
+        return queued, first, second
+
+    queued, first, second = asyncio.run(scenario())
+
+    assert queued == [2, 3, 4]
+    assert [message["seq"] for message in first.received] == [2]
+    # Every status event reaches the client once, in order
+    received = first.received + second.received
+    assert [message["seq"] for message in received] == [2, 3, 4]
+    assert [message["data"]["status"] for message in received] == ["processing", "document_kept", "report_chunk"]
+
+
+def test_folded_chunk_text_is_complete_without_reconnect():
+    async def scenario():
+        manager = make_manager(max_queue=3)
+        socket = FakeSocket()
+        await manager.connect(socket, "job")
+        manager.deliver(status("job", 1, "report_chunk", category="report", chunk="Acme "))
+        manager.deliver(status("job", 2, "processing"))
+        manager.deliver(status("job", 3, "document_kept"))
+        manager.deliver(status("job", 4, "report_chunk", category="report", chunk="lève 50M"))
+        await asyncio.sleep(0.05)
+        return socket
+
+    socket = asyncio.run(scenario())
+
+    assert [message["seq"] for message in socket.received] == [2, 3, 4]
+    assert socket.received[-1]["data"]["result"]["chunk"] == "Acme lève 50M"
@@ -39,6 +39,11 @@ function App() {
   const [hasFinalReport, setHasFinalReport] = useState(false);
   const [reconnectAttempts, setReconnectAttempts] = useState(0);
   const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  // Last event sequence received, so a reconnect only replays what was missed
+  const lastSeqRef = useRef(0);
+  // Sections published before the compiled report streams in (report_section)
+  const reportSectionsRef = useRef<Record<string, string>>({});
+  const isStreamingReportRef = useRef(false);
   const maxReconnectAttempts = 3;
   const reconnectDelay = 2000; // 2 seconds
   const [researchState, setResearchState] = useState<ResearchState>({
@@ -155,9 +160,10 @@ function App() {
     console.log("Initializing WebSocket connection for job:", jobId);
     
     // Use the WS_URL directly if it's a full URL, otherwise construct it
-    const wsUrl = WS_URL.startsWith('wss://') || WS_URL.startsWith('ws://')
+    const wsUrl = (WS_URL.startsWith('wss://') || WS_URL.startsWith('ws://')
       ? `${WS_URL}/research/ws/${jobId}`
-      : `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${WS_URL}/research/ws/${jobId}`;
+      : `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${WS_URL}/research/ws/${jobId}`)
+      + `?last_seq=${lastSeqRef.current}`;
     
     console.log("Connecting to WebSocket URL:", wsUrl);
     
@@ -224,6 +230,9 @@ function App() {
 
     ws.onmessage = (event) => {
       const rawData = JSON.parse(event.data);
+      if (typeof rawData.seq === "number") {
+        lastSeqRef.current = Math.max(lastSeqRef.current, rawData.seq);
+      }
 
       if (rawData.type === "status_update") {
         const statusData = rawData.data;
@@ -519,12 +528,29 @@ function App() {
             };
           });
         }
-        // Handle report streaming
+        // Show each section as soon as it is compiled, in report order
+        else if (statusData.status === "report_section") {
+          if (!isStreamingReportRef.current) {
+            reportSectionsRef.current[statusData.result.category] =
+              `## ${statusData.result.section}\n\n${statusData.result.content}`;
+            const report = ["company", "industry", "financial", "news"]
+              .filter((category) => reportSectionsRef.current[category])
+              .map((category) => reportSectionsRef.current[category])
+              .join("\n\n");
+            setOutput({
+              summary: "Generating report...",
+              details: { report },
+            });
+          }
+        }
+        // Handle report streaming; the streamed report replaces the sections
         else if (statusData.status === "report_chunk") {
+          const isFirstChunk = !isStreamingReportRef.current;
+          isStreamingReportRef.current = true;
           setOutput((prev) => ({
             summary: "Generating report...",
             details: {
-              report: prev?.details?.report
+              report: prev?.details?.report && !isFirstChunk
                 ? prev.details.report + statusData.result.chunk
                 : statusData.result.chunk,
             },
@@ -659,6 +685,9 @@ function App() {
 
       if (data.job_id) {
         console.log("Connecting WebSocket with job_id:", data.job_id);
+        lastSeqRef.current = 0;
+        reportSectionsRef.current = {};
+        isStreamingReportRef.current = false;
         connectWebSocket(data.job_id);
       } else {
         throw new Error("No job ID received");